@@ -1,130 +1,125 @@
 import os
-import whisper
+import asyncio
+import tempfile
+import threading
 from youtube_transcript_api import YouTubeTranscriptApi
-from PyPDF2 import PdfReader
-from pytesseract import pytesseract
-import cv2
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
+from app.services.generate.llm import get_llm_client, LLMError
+from app.services.generate.summary import generate_summary
+from app.services.generate.normalize import prepare_transcript
+from app.services.jobs import job_queue, QueueFullError
+from app.services.asr_service import transcribe_file
+from app.services.pdf_service import extract_pdf
+from app.services.ocr_service import ocr_image_bytes
 
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
-# Load Whisper ASR model
-asr_model = whisper.load_model("base")
 
 # Initialize Flask app and enable CORS
 app = Flask(__name__)
 CORS(app)
 
+UPLOAD_SUFFIXES = {"video": ".mp4", "pdf": ".pdf", "image": ".jpg"}
+
 # Content processing functions
 def process_video(file_path=None, youtube_url=None):
-    transcript = ""
+    # Returns the cleaned transcript and the tokens cleaning saved
+    transcript, segments = "", None
     if file_path:
-        result = asr_model.transcribe(file_path)
-        transcript = result["text"]
+        # Chunked, parallel transcription on the shared ASR worker pool
+        result = transcribe_file(file_path)
+        transcript, segments = result["transcript"], result["segments"]
     elif youtube_url:
         video_id = youtube_url.split("v=")[-1]
-        transcript_data = YouTubeTranscriptApi.get_transcript(video_id)
-        transcript = " ".join([item["text"] for item in transcript_data])
-    return transcript
+        segments = YouTubeTranscriptApi.get_transcript(video_id)
+        transcript = " ".join([item["text"] for item in segments])
+    # Drops repeated caption lines, filler and [Music]-style noise
+    transcript, _, stats = prepare_transcript(transcript, segments)
+    return transcript, stats["tokens_saved"]
 
 def process_pdf(file_path):
-    reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
+    # Pages are extracted in parallel, scanned pages are OCR'd
+    return extract_pdf(file_path)["transcript"]
 
 def process_image(file_path):
-    image = cv2.imread(file_path)
-    text = pytesseract.image_to_string(image)
-    return text
-
-# Summarization function using Google Gemini
-def summarize_text(content):
-    prompt = """You are a summarizer.Create a detailed and concise summary of the provided transcript for display on a website. The summary should capture the key points, main ideas, and essential takeaways from the content. Ensure it is well-structured, easy to read, and optimized for web readability. Include the following elements:
-
-Introduction: Briefly introduce the topic or subject of the transcript.
+    # Tesseract location comes from TESSERACT_CMD (see ocr_service)
+    with open(file_path, "rb") as f:
+        return ocr_image_bytes(f.read())
 
-Main Points: Highlight the primary arguments, themes, or sections discussed.
+# Summarization uses the chunked map-reduce pipeline on one background event
+# loop shared by all Flask threads, so the pooled LLM client stays on one loop
+llm_loop = asyncio.new_event_loop()
+threading.Thread(target=llm_loop.run_forever, daemon=True).start()
 
-Key Takeaways: Summarize the most important insights, conclusions, or actionable information.
+def start_summary(content):
+    # Returns a future; the summary runs while the caller does other work
+    return asyncio.run_coroutine_threadsafe(generate_summary(content), llm_loop)
 
-Supporting Details: Include relevant examples, data, or quotes that reinforce the main points.
+def summary_result(future):
+    # Raises LLMError; a failure is never passed off as the summary
+    return future.result()
 
-Conclusion: Provide a brief wrap-up or final thoughts on the content.
-
-Ensure the summary is engaging, accurate, and tailored for a general audience while maintaining the original context and meaning of the transcript. Avoid jargon or overly complex language, and aim for a length of approximately 150–300 words, depending on the depth of the content. The summary has to be displayed on a separate website so remove the extra stars and while changing sections for e.g. intoduction to main idea. Make it start  from a new line. And also avoid words like 'this transcript is' instead start explaining in a more detialed amd refined manner """
-    try:
-        model = genai.GenerativeModel("gemini-pro")
-        response = model.generate_content(prompt + content)
-        return response.text
-    except Exception as e:
-        return f"Error during summarization: {e}"
+def summarize_text(content):
+    return summary_result(start_summary(content))
 
 # Function to generate questions based on content using Google Gemini
 def generate_questions(content):
-    prompt = """"Generate a set of multiple-choice questions (MCQs) based on the provided transcript to serve as an interactive learning or engagement tool for website visitors. The questions should be clear, relevant, and designed to test comprehension of the key points, main ideas, and details from the content. Follow these guidelines:
-
-Question Types:
-
-Include a mix of factual, conceptual, and application-based questions.
-
-Ensure questions cover the most important aspects of the transcript.
-
-Structure:
-
-Each question should have one correct answer and three plausible distractors (incorrect answers).
-
-Avoid ambiguous or overly complex wording.
-
-Coverage:
-
-Distribute questions evenly across the transcript to cover all major sections or themes.
-
-Include questions on key takeaways, supporting details, and any critical insights.
-
-Difficulty Level:
-
-Create a balance of easy, moderate, and challenging questions to cater to a wide audience.
-
-Give answwer key at the end.
-
-Output Format:
-
-Present the questions in a clear, numbered list.
-
-Group questions by topic or section if the transcript is lengthy.
-
-Example:
-Q1. What is the main topic discussed in the transcript?
-a) Option 1
-b) Option 2
-c) Option 3 (Correct Answer)
-d) Option 4
-
-Generate at least 6-7 high-quality MCQs that align with the transcript's content and purpose, ensuring they are engaging and educational for website visitors..
-    Each question should have the following format:
-    <Question Number>: <Question Text>
-    A) <Option A>
-    B) <Option B>
-    C) <Option C>
-    D) <Option D>
-    Here is the input text: """
+    # Kept short: the prompt is sent, and billed, with every transcript
+    prompt = """Write 7 multiple-choice questions that test comprehension of the key points of the transcript below. Cover all of it, mix factual, conceptual and application questions of varying difficulty, and give each question one correct answer and three plausible distractors. Use this format and end with an answer key:
+<Question Number>: <Question Text>
+A) <Option A>
+B) <Option B>
+C) <Option C>
+D) <Option D>
+
+Transcript:
+"""
+    # Retries, deadline and circuit breaker come from the LLM client
+    response = get_llm_client().generate_sync(prompt + content, operation="legacy")
+    questions = response.strip().split("\n")
+    return questions
+
+def run_processing_job(job, content_type, youtube_url, temp_path):
+    try:
+        job.update(stage="extract", progress=0.1)
+        result, tokens_saved = "", 0
+        if content_type == "video" and temp_path:
+            result, tokens_saved = process_video(file_path=temp_path)
+        elif youtube_url:
+            result, tokens_saved = process_video(youtube_url=youtube_url)
+        elif content_type == "pdf" and temp_path:
+            result = process_pdf(file_path=temp_path)
+        elif content_type == "image" and temp_path:
+            result = process_image(file_path=temp_path)
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    # Summary and questions are independent, so they are generated together:
+    # the summary on the LLM loop, the questions on this worker thread. A
+    # failed one is reported in errors and left empty, so the transcript and
+    # the other result are still returned.
+    job.update(stage="generate", progress=0.6)
+    errors = {}
+    summary_future = start_summary(result)
+    try:
+        questions = generate_questions(result)
+    except LLMError as e:
+        questions, errors["questions"] = [], str(e)
     try:
-        model = genai.GenerativeModel("gemini-pro")
-        response = model.generate_content(prompt + content)
-        questions = response.text.strip().split("\n")
-        return questions
-    except Exception as e:
-        return [f"Error generating questions: {e}"]
+        summary = summary_result(summary_future)
+    except LLMError as e:
+        summary, errors["summary"] = None, str(e)
 
-from flask import request
+    return {
+        "transcription": result,
+        "summary": summary,
+        "questions": questions,
+        "tokens_saved": tokens_saved,
+        "errors": errors
+    }
 
 @app.route("/process-content", methods=["POST"])
 def process_content():
@@ -132,31 +127,28 @@ def process_content():
     youtube_url = request.form.get("youtube_url")
     file = request.files.get("file")
 
-    result = ""
-    if content_type == "video" and file:
-        # Save the uploaded file to a temporary path
-        temp_path = "temp_uploaded_video.mp4"
-        file.save(temp_path)
-        result = process_video(file_path=temp_path)
-    elif youtube_url:
-        result = process_video(youtube_url=youtube_url)
-    elif content_type == "pdf" and file:
-        temp_path = "temp_uploaded_pdf.pdf"
+    # Save the uploaded file to a per-request temporary path; the job removes it
+    temp_path = None
+    if file and content_type in UPLOAD_SUFFIXES:
+        fd, temp_path = tempfile.mkstemp(suffix=UPLOAD_SUFFIXES[content_type])
+        os.close(fd)
         file.save(temp_path)
-        result = process_pdf(file_path=temp_path)
-    elif content_type == "image" and file:
-        temp_path = "temp_uploaded_image.jpg"
-        file.save(temp_path)
-        result = process_image(file_path=temp_path)
 
-    summary = summarize_text(result)
-    questions = generate_questions(result)
-    
-    return jsonify({
-        "transcription": result,
-        "summary": summary,
-        "questions": questions
-    })
+    try:
+        job = job_queue.submit("process-content", run_processing_job, content_type, youtube_url, temp_path)
+    except QueueFullError as e:
+        if temp_path:
+            os.remove(temp_path)
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify(job.to_dict()), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
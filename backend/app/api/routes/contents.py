@@ -1,24 +1,40 @@
 # backend/app/api/routes/contents.py
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, File, Form, UploadFile
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
-from app.db.database import get_db
+from app.db.database import get_db, run_db
 from app.db.crud import (
-    create_content, get_content_by_id, get_contents_by_space,
-    delete_content, get_space_by_id
+    get_content_by_id, get_content_payload, delete_content, get_space_by_id
 )
 from app.auth.security import get_current_user
-from app.services.youtube_service import extract_youtube_info
-from app.db.models import User
-import json
+from app.auth.admission import admission, admit_ingestions, ingestion_limit
+from app.services.content_service import ingest_youtube, ingest_youtube_bulk, ingest_media, ingest_pdf, ingest_images
+from app.services.ocr_service import OCR_MAX_BATCH_IMAGES
+from app.services.jobs import job_queue, load_job, QueueFullError
+from app.services.youtube_service import (
+    extract_video_id, extract_playlist_id, fetch_playlist_video_ids, YOUTUBE_BULK_MAX_ITEMS
+)
+from app.auth.user_cache import CurrentUser
+import asyncio
+import httpx
+import os
+import tempfile
 
 router = APIRouter()
 
+# Ingestion pays a flat amount from the user's token bucket
+admit_ingestion = admission("ingest")
+
 class YouTubeRequest(BaseModel):
     url: str
     space_id: str
 
+class BulkYouTubeRequest(BaseModel):
+    space_id: str
+    urls: List[str] = []
+    playlist_url: Optional[str] = None
+
 class ContentResponse(BaseModel):
     id: str
     title: str
@@ -26,59 +42,246 @@ class ContentResponse(BaseModel):
     data: dict
     space_id: str
 
-@router.post("/youtube", response_model=ContentResponse)
-async def process_youtube_content(
-    data: YouTubeRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+def _check_space(db: Session, space_id: str, user: CurrentUser):
     # Verify the space exists and belongs to the user
-    space = get_space_by_id(db, space_id=data.space_id)
+    space = get_space_by_id(db, space_id=space_id)
     if not space:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Space not found"
         )
     
-    if space.user_id != current_user.id:
+    if space.user_id != user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to add content to this space"
         )
+    return space
+
+async def _save_upload(file: UploadFile):
+    # Spool the upload to disk in chunks; the ingestion job deletes it
+    suffix = os.path.splitext(file.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(1024 * 1024):
+            out.write(chunk)
+    return path
+
+async def _submit(kind: str, fn, *args, user: CurrentUser):
+    # Submitting writes the job's state for the other workers
+    try:
+        return await asyncio.to_thread(job_queue.submit, kind, fn, *args, user_id=user.id)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+
+@router.post("/youtube", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(admit_ingestion)])
+async def process_youtube_content(
+    data: YouTubeRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    await run_db(db, _check_space, data.space_id, current_user)
     
     try:
-        # Extract YouTube info
-        youtube_data = extract_youtube_info(data.url)
-        
-        # Create content
-        content = create_content(
-            db,
-            title=youtube_data["title"],
-            type="youtube",
-            data=youtube_data,
-            space_id=data.space_id
-        )
-        
-        return {
-            "id": content.id,
-            "title": content.title,
-            "type": content.type,
-            "data": content.data,
-            "space_id": content.space_id
-        }
-    except Exception as e:
+        extract_video_id(data.url)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error processing YouTube URL: {str(e)}"
         )
+    
+    # Fetching the transcript can take a while, so it runs on the job queue
+    job = await _submit("youtube", ingest_youtube, data.url, data.space_id, user=current_user)
+    return job.to_dict()
+
+async def _playlist_urls(playlist_url: str, max_items: int):
+    try:
+        playlist_id = extract_playlist_id(playlist_url)
+        video_ids = await asyncio.to_thread(fetch_playlist_video_ids, playlist_id, max_items)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error processing YouTube playlist: {str(e)}"
+        )
+    except httpx.HTTPError as e:
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Playlist not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not list the playlist's videos"
+        )
+    return [f"https://www.youtube.com/watch?v={video_id}" for video_id in video_ids]
+
+def _unique_videos(urls: List[str]):
+    # The same video twice, in any URL form, would only be stored twice.
+    # Bad URLs are kept as they are and reported per item by the job.
+    unique = {}
+    for url in urls:
+        url = url.strip()
+        if not url:
+            continue
+        try:
+            key = extract_video_id(url)
+        except ValueError:
+            key = url
+        unique.setdefault(key, url)
+    return list(unique.values())
+
+@router.post("/youtube/bulk", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(admit_ingestion)])
+async def process_youtube_bulk(
+    data: BulkYouTubeRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    await run_db(db, _check_space, data.space_id, current_user)
+    
+    max_items = ingestion_limit(YOUTUBE_BULK_MAX_ITEMS)
+    urls = list(data.urls)
+    if data.playlist_url:
+        urls += await _playlist_urls(data.playlist_url, max_items + 1)
+    urls = _unique_videos(urls)
+    
+    if not urls:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No YouTube URLs to import"
+        )
+    
+    if len(urls) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {max_items} videos can be imported at once"
+        )
+    
+    await admit_ingestions(current_user.id, len(urls))
+    job = await _submit("youtube-bulk", ingest_youtube_bulk, urls, data.space_id, user=current_user)
+    return job.to_dict()
+
+@router.post("/media", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(admit_ingestion)])
+async def upload_media_content(
+    space_id: str = Form(...),
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    await run_db(db, _check_space, space_id, current_user)
+    
+    media_type = (file.content_type or "").split("/")[0]
+    if media_type not in ("audio", "video"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be an audio or video file"
+        )
+    
+    # Transcription runs on the ASR worker pool via the job queue
+    path = await _save_upload(file)
+    try:
+        job = await _submit("media", ingest_media, path, file.filename or "Untitled recording", space_id, user=current_user)
+    except HTTPException:
+        os.remove(path)
+        raise
+    return job.to_dict()
+
+@router.post("/document", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(admit_ingestion)])
+async def upload_document_content(
+    space_id: str = Form(...),
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    await run_db(db, _check_space, space_id, current_user)
+    
+    is_pdf = file.content_type == "application/pdf" or (file.filename or "").lower().endswith(".pdf")
+    if not is_pdf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be a PDF"
+        )
+    
+    # Pages are extracted on the PDF worker pool via the job queue
+    path = await _save_upload(file)
+    try:
+        job = await _submit("document", ingest_pdf, path, file.filename or "Untitled document", space_id, user=current_user)
+    except HTTPException:
+        os.remove(path)
+        raise
+    return job.to_dict()
+
+@router.post("/images", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(admit_ingestion)])
+async def upload_image_content(
+    space_id: str = Form(...),
+    title: Optional[str] = Form(None),
+    files: List[UploadFile] = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    await run_db(db, _check_space, space_id, current_user)
+    
+    if len(files) > OCR_MAX_BATCH_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {OCR_MAX_BATCH_IMAGES} images can be uploaded at once"
+        )
+    
+    if any(not (file.content_type or "").startswith("image/") for file in files):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Every file must be an image"
+        )
+    
+    # OCR runs on the OCR worker pool via the job queue; all images become
+    # one content
+    saved = []
+    try:
+        for file in files:
+            saved.append((await _save_upload(file), file.filename or f"image-{len(saved) + 1}"))
+        job = await _submit("images", ingest_images, saved, title or files[0].filename or "Untitled images", space_id, user=current_user)
+    except Exception:
+        for path, _ in saved:
+            os.remove(path)
+        raise
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job_status(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # This worker's own jobs are current; others' are as last saved
+    job = job_queue.get(job_id) or await run_db(db, load_job, job_id)
+    
+    # Jobs of other users are reported as missing
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return job.to_dict()
 
 @router.get("/{content_id}", response_model=ContentResponse)
 async def get_content(
     content_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    content = get_content_by_id(db, content_id=content_id)
+    content = await run_db(db, get_content_by_id, content_id=content_id)
     
     if not content:
         raise HTTPException(
@@ -97,17 +300,17 @@ async def get_content(
         "id": content.id,
         "title": content.title,
         "type": content.type,
-        "data": content.data,
+        "data": await run_db(db, get_content_payload, content),
         "space_id": content.space_id
     }
 
 @router.delete("/{content_id}")
 async def remove_content(
     content_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    content = get_content_by_id(db, content_id=content_id)
+    content = await run_db(db, get_content_by_id, content_id=content_id)
     
     if not content:
         raise HTTPException(
@@ -122,6 +325,6 @@ async def remove_content(
             detail="Not authorized to delete this content"
         )
     
-    delete_content(db, content_id=content_id)
+    await run_db(db, delete_content, content_id=content_id)
     
     return {"message": "Content deleted successfully"}
\ No newline at end of file
@@ -1,43 +1,261 @@
 # backend/app/api/routes/generate.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-from app.db.database import get_db
+from app.db.database import get_db, run_db, run_in_new_session, release_db
 from app.db.crud import (
-    get_content_by_id, create_generation, get_generations_by_content
+    get_content_by_id, get_content_payload,
+    create_chat_session, get_chat_session, get_chat_messages, add_chat_messages
 )
 from app.auth.security import get_current_user
-from app.services.generate.summary import generate_summary
-from app.services.generate.chat import generate_chat_response
-from app.services.generate.flashcard import generate_flashcards
-from app.services.generate.mindmap import generate_mindmap
-from app.services.generate.quiz import generate_quiz
-from app.db.models import User
+from app.auth.admission import admission, charge_prompt_tokens, prompt_charge
+from app.services.generate.chat import generate_chat_response, stream_chat_response
+from app.services.generate.llm import LLMError, LLMUnavailableError
+from app.services.generation_service import (
+    GENERATORS, get_or_create_generation, get_or_create_generations, get_existing_generation,
+    get_existing_generations, find_generation, find_stale_generation, stream_or_join_summary
+)
+from app.services.retrieval import retrieve_context
+from app.services.chat_service import history_for_prompt, needs_compaction, schedule_compaction
+from app.services.content_service import llm_source
+from app.services.generate.normalize import record_savings
+from app.services.generate.chunking import estimate_tokens
+from app.auth.user_cache import CurrentUser
+from datetime import datetime, timezone
+import asyncio
+import json
+import math
+import uuid
 
 router = APIRouter()
 
+# Per-user token bucket and a fair share of the in-flight slots
+admit_generation = admission("generate")
+
 class GenerationRequest(BaseModel):
     content_id: str
     prompt: Optional[str] = None
+    stream: bool = False
 
 class ChatRequest(BaseModel):
     content_id: str
     message: str
-    history: Optional[List[dict]] = None
+    session_id: Optional[str] = None
+    stream: bool = False
 
 class GenerationResponse(BaseModel):
     id: str
     type: str
     data: dict
+    # True when the LLM was unavailable and an older generation was served
+    stale: bool = False
+
+class ArtifactsRequest(BaseModel):
+    content_id: str
+    types: List[str] = list(GENERATORS)
+
+class ArtifactsResponse(BaseModel):
+    content_id: str
+    artifacts: Dict[str, GenerationResponse]
+    errors: Dict[str, str] = {}
+
+class ChatMessageResponse(BaseModel):
+    role: str
+    content: str
+    created_at: Optional[str] = None
+
+class ChatSessionResponse(BaseModel):
+    id: str
+    content_id: str
+    summary: Optional[str] = None
+    messages: List[ChatMessageResponse] = []
+
+def _sse(data: dict, event: str = None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def _event_stream(events, headers: Optional[dict] = None):
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})}
+    )
+
+async def _load_source(db: Session, content, operation: str):
+    # Transcript as sent to the LLM: cleaned, deduplicated and within the
+    # token budget. Cleaning runs off the event loop and is cached.
+    payload = await run_db(db, get_content_payload, content)
+    text, segments, stats = await asyncio.to_thread(llm_source, payload)
+    record_savings(stats, operation)
+    return text, segments, stats
+
+def _retry_after(e: LLMUnavailableError):
+    return str(max(1, math.ceil(e.retry_after)))
+
+def _llm_http_error(e: LLMError, detail: str):
+    # 503 with Retry-After while the LLM circuit breaker is open, else 502
+    if isinstance(e, LLMUnavailableError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{detail}: {str(e)}",
+            headers={"Retry-After": _retry_after(e)}
+        )
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail=f"{detail}: {str(e)}"
+    )
+
+def _error_event(e: LLMError, detail: str):
+    data = {"detail": f"{detail}: {str(e)}"}
+    if isinstance(e, LLMUnavailableError):
+        data["retry_after"] = int(_retry_after(e))
+    return _sse(data, event="error")
+
+def _token_headers(stats: dict):
+    # How much cleaning saved on this request, for clients and load tests
+    return {
+        "X-Transcript-Tokens": str(stats["tokens_after"]),
+        "X-Transcript-Tokens-Saved": str(stats["tokens_saved"])
+    }
+
+async def _summary_events(content_id: str, raw_text: str, segments: Optional[List[dict]], found: Optional[dict], charge=None):
+    if found:
+        yield _sse({"token": found["data"]["summary"]})
+        yield _sse({"id": found["id"], "type": "summary"}, event="done")
+        return
+    
+    # The summary is made in a task of its own, so it is finished and stored
+    # even if this client goes away, and concurrent requests for the content
+    # share it: the first streams its tokens, the others get the whole text
+    chunks = asyncio.Queue()
+    flight = asyncio.create_task(stream_or_join_summary(content_id, raw_text, segments, chunks.put_nowait, charge))
+    flight.add_done_callback(lambda task: task.cancelled() or task.exception())
+    
+    streamed = False
+    while not flight.done() or not chunks.empty():
+        getter = asyncio.ensure_future(chunks.get())
+        done, _ = await asyncio.wait({getter, flight}, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            streamed = True
+            yield _sse({"token": getter.result()})
+        else:
+            getter.cancel()
+    
+    try:
+        generation = flight.result()
+    except LLMUnavailableError as e:
+        # Nothing is streamed while the breaker is open; serve the last good
+        # summary of this transcript if there is one
+        stale = None if streamed else await run_in_new_session(find_stale_generation, "summary", raw_text)
+        if stale is None:
+            yield _error_event(e, "Error generating summary")
+            return
+        yield _sse({"token": stale["data"]["summary"]})
+        yield _sse({"id": stale["id"], "type": "summary", "stale": True}, event="done")
+        return
+    except LLMError as e:
+        yield _error_event(e, "Error generating summary")
+        return
+    
+    if not streamed:
+        yield _sse({"token": generation["data"]["summary"]})
+    done = {"id": generation["id"], "type": "summary"}
+    if generation.get("stale"):
+        done["stale"] = True
+    yield _sse(done, event="done")
+
+async def _save_chat_turn(db: Session, session_id: str, history: List[dict], message: str, response: str, owner: Optional[dict] = None):
+    # db None saves with a session of its own. owner (content_id, user_id)
+    # is given for a session not stored yet, which is created with this turn
+    messages = [("user", message), ("model", response)]
+    if owner:
+        fn, kwargs = create_chat_session, {"session_id": session_id, "messages": messages, **owner}
+    else:
+        fn, kwargs = add_chat_messages, {"session_id": session_id, "messages": messages}
+    if db is None:
+        await run_in_new_session(fn, **kwargs)
+    else:
+        await run_db(db, fn, **kwargs)
+    history = history + [{"role": "user", "content": message}, {"role": "model", "content": response}]
+    if needs_compaction(history):
+        schedule_compaction(session_id)
+
+async def _chat_events(
+    session_id: str,
+    conversation_summary: Optional[str],
+    context: str,
+    message: str,
+    history: List[dict],
+    sources: List[dict],
+    owner: Optional[dict] = None
+):
+    parts = []
+    try:
+        async for chunk in stream_chat_response(context, message, history, conversation_summary):
+            parts.append(chunk)
+            yield _sse({"token": chunk})
+    except LLMError as e:
+        yield _error_event(e, "Error generating chat response")
+        return
+    
+    # Saved with a session of its own, as for streamed summaries
+    await _save_chat_turn(None, session_id, history, message, "".join(parts), owner)
+    
+    yield _sse({"id": session_id, "type": "chat", "session_id": session_id, "sources": sources}, event="done")
+
+async def _generate_artifact(generation_type: str, detail: str, content_id: str, response: Response, current_user: CurrentUser, db: Session):
+    # A summary, flashcard set, mindmap or quiz for one content
+    content = await run_db(db, get_content_by_id, content_id=content_id)
+    
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+    
+    # Verify the user has access to this content
+    if content.space.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this content"
+        )
+    
+    # A stored generation is returned without loading the transcript
+    existing = await run_db(db, get_existing_generation, content_id=content.id, generation_type=generation_type)
+    if existing:
+        return existing
+    
+    # Get the cleaned text from content
+    raw_text, segments, stats = await _load_source(db, content, generation_type)
+    response.headers.update(_token_headers(stats))
+    
+    # Reuse one made from the same transcript, or generate it; only an LLM
+    # call is charged for the prompt
+    try:
+        return await get_or_create_generation(
+            db,
+            content_id=content.id,
+            generation_type=generation_type,
+            source_text=raw_text,
+            segments=segments,
+            charge=prompt_charge(current_user.id, stats["tokens_after"])
+        )
+    except LLMError as e:
+        raise _llm_http_error(e, detail)
 
-@router.post("/summary", response_model=GenerationResponse)
+@router.post("/summary", response_model=GenerationResponse, dependencies=[Depends(admit_generation)])
 async def create_summary(
     data: GenerationRequest,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    content = get_content_by_id(db, content_id=data.content_id)
+    if not data.stream:
+        return await _generate_artifact("summary", "Error generating summary", data.content_id, response, current_user, db)
+    
+    content = await run_db(db, get_content_by_id, content_id=data.content_id)
     
     if not content:
         raise HTTPException(
@@ -52,44 +270,27 @@ async def create_summary(
             detail="Not authorized to access this content"
         )
     
-    # Check if we already have a summary for this content
-    existing_summaries = get_generations_by_content(db, content_id=content.id, generation_type="summary")
-    if existing_summaries:
-        return {
-            "id": existing_summaries[0].id,
-            "type": "summary",
-            "data": existing_summaries[0].data
-        }
-    
-    # Get raw text from content
-    raw_text = ""
-    if content.type == "youtube":
-        raw_text = content.data.get("transcript", "")
+    # A stored summary is replayed without loading the transcript
+    existing = await run_db(db, get_existing_generation, content_id=content.id, generation_type="summary")
+    if existing:
+        return _event_stream(_summary_events(content.id, None, None, existing))
     
-    # Generate summary
-    summary = generate_summary(raw_text)
-    
-    # Save generation
-    generation = create_generation(
-        db,
-        type="summary",
-        data={"summary": summary},
-        content_id=content.id
-    )
+    # Get the cleaned text from content
+    raw_text, segments, stats = await _load_source(db, content, "summary")
     
-    return {
-        "id": generation.id,
-        "type": generation.type,
-        "data": generation.data
-    }
+    # Stream tokens as Server-Sent Events; the summary is saved once complete
+    found = await run_db(db, find_generation, content_id=content.id, generation_type="summary", source_text=raw_text)
+    charge = prompt_charge(current_user.id, stats["tokens_after"])
+    return _event_stream(_summary_events(content.id, raw_text, segments, found, charge), _token_headers(stats))
 
-@router.post("/chat", response_model=GenerationResponse)
+@router.post("/chat", response_model=GenerationResponse, dependencies=[Depends(admit_generation)])
 async def chat_with_content(
     data: ChatRequest,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    content = get_content_by_id(db, content_id=data.content_id)
+    content = await run_db(db, get_content_by_id, content_id=data.content_id)
     
     if not content:
         raise HTTPException(
@@ -104,34 +305,135 @@ async def chat_with_content(
             detail="Not authorized to access this content"
         )
     
-    # Get raw text from content
-    content_text = ""
-    if content.type == "youtube":
-        content_text = content.data.get("transcript", "")
+    # Continue the user's server-side session for this content, or start one;
+    # a new session is only stored once its first reply is
+    if data.session_id:
+        session = await run_db(db, get_chat_session, session_id=data.session_id)
+        if not session or session.user_id != current_user.id or session.content_id != content.id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Chat session not found"
+            )
+        session_id, conversation_summary, owner = session.id, session.summary, None
+        # Only uncompacted messages are sent; older ones live in session.summary
+        history = history_for_prompt(await run_db(db, get_chat_messages, session_id=session.id, include_compacted=False))
+    else:
+        session_id, conversation_summary, history = str(uuid.uuid4()), None, []
+        owner = {"content_id": content.id, "user_id": current_user.id}
+    
+    # Get the cleaned text from content
+    content_text, segments, stats = await _load_source(db, content, "chat")
+    response.headers.update(_token_headers(stats))
+    
+    # Send only the transcript chunks relevant to this message
+    context, sources = await retrieve_context(content_text, segments, data.message, history)
+    await charge_prompt_tokens(
+        current_user.id,
+        estimate_tokens(context) + sum(estimate_tokens(message["content"]) for message in history)
+    )
+    
+    # Nothing else is read until the reply is saved; free the connection
+    # for the duration of the LLM call
+    await release_db(db)
+    
+    if data.stream:
+        return _event_stream(_chat_events(session_id, conversation_summary, context, data.message, history, sources, owner), _token_headers(stats))
     
     # Generate chat response
-    response = generate_chat_response(content_text, data.message, data.history)
+    try:
+        reply = await generate_chat_response(context, data.message, history, conversation_summary)
+    except LLMError as e:
+        raise _llm_http_error(e, "Error generating chat response")
     
-    # We're not saving chat messages to the database in this implementation
-    # Just returning the response directly
+    await _save_chat_turn(db, session_id, history, data.message, reply, owner)
     
     return {
-        "id": "chat_response",
+        "id": session_id,
         "type": "chat",
         "data": {
+            "session_id": session_id,
             "message": data.message,
-            "response": response,
-            "timestamp": "now"
+            "response": reply,
+            "sources": sources,
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
     }
 
-@router.post("/flashcard", response_model=GenerationResponse)
+@router.get("/chat/sessions/{session_id}", response_model=ChatSessionResponse)
+async def get_chat_history(
+    session_id: str,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    session = await run_db(db, get_chat_session, session_id=session_id)
+    
+    if not session or session.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found"
+        )
+    
+    messages = await run_db(db, get_chat_messages, session_id=session.id)
+    
+    return {
+        "id": session.id,
+        "content_id": session.content_id,
+        "summary": session.summary,
+        "messages": [
+            {
+                "role": message.role,
+                "content": message.content,
+                "created_at": message.created_at.isoformat() if message.created_at else None
+            }
+            for message in messages
+        ]
+    }
+
+@router.post("/flashcard", response_model=GenerationResponse, dependencies=[Depends(admit_generation)])
 async def create_flashcards(
     data: GenerationRequest,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    content = get_content_by_id(db, content_id=data.content_id)
+    return await _generate_artifact("flashcard", "Error generating flashcards", data.content_id, response, current_user, db)
+
+@router.post("/mindmap", response_model=GenerationResponse, dependencies=[Depends(admit_generation)])
+async def create_mindmap(
+    data: GenerationRequest,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await _generate_artifact("mindmap", "Error generating mindmap", data.content_id, response, current_user, db)
+
+@router.post("/quiz", response_model=GenerationResponse, dependencies=[Depends(admit_generation)])
+async def create_quiz(
+    data: GenerationRequest,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await _generate_artifact("quiz", "Error generating quiz", data.content_id, response, current_user, db)
+
+@router.post("/artifacts", response_model=ArtifactsResponse, dependencies=[Depends(admit_generation)])
+async def create_artifacts(
+    data: ArtifactsRequest,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Summary, flashcards, mindmap and quiz in one round trip: the content is
+    # loaded and checked once and missing artifacts are generated concurrently
+    types = list(dict.fromkeys(data.types))
+    unknown = [generation_type for generation_type in types if generation_type not in GENERATORS]
+    if not types or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Artifact types must be among: {', '.join(GENERATORS)}"
+        )
+    
+    content = await run_db(db, get_content_by_id, content_id=data.content_id)
     
     if not content:
         raise HTTPException(
@@ -146,10 +448,38 @@ async def create_flashcards(
             detail="Not authorized to access this content"
         )
     
-    # # Check if we already have flashcards for this content
-    # COON WAS HERE AND YAHA ISSUE H      CLAUDE NE PURA NAHI KARKE DIA ACHE SE
-    # existing_flashcards = get_generations_by_content(db, content_id=content.id, generation_type="flashcard")
-    # if existing_flashcards:
-    #     return {
-    #         "id": existing_flashcards[0k]
-    #     }
\ No newline at end of file
+    # Stored artifacts are returned without loading the transcript
+    existing = await run_db(db, get_existing_generations, content_id=content.id, generation_types=types)
+    if len(existing) == len(types):
+        return {"content_id": content.id, "artifacts": existing, "errors": {}}
+    
+    # Get the cleaned text from content
+    raw_text, segments, stats = await _load_source(db, content, "artifacts")
+    response.headers.update(_token_headers(stats))
+    
+    # Every artifact that calls the LLM sends the transcript once
+    artifacts, errors = await get_or_create_generations(
+        db,
+        content_id=content.id,
+        generation_types=types,
+        source_text=raw_text,
+        segments=segments,
+        existing=existing,
+        charge=prompt_charge(current_user.id, stats["tokens_after"])
+    )
+    
+    # Partial results are still returned; only a total failure is an error
+    if not artifacts:
+        unavailable = [e for e in errors.values() if isinstance(e, LLMUnavailableError)]
+        if len(unavailable) == len(errors):
+            raise _llm_http_error(unavailable[0], "Error generating artifacts")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Error generating artifacts: " + "; ".join(f"{t}: {e}" for t, e in errors.items())
+        )
+    
+    return {
+        "content_id": content.id,
+        "artifacts": artifacts,
+        "errors": {generation_type: str(e) for generation_type, e in errors.items()}
+    }
@@ -0,0 +1,41 @@
+# backend/app/api/routes/metrics.py
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import METRICS_ENABLED, render, register_collector, stats_gauges
+from app.db.database import pool_stats
+from app.auth.security import password_hasher
+from app.auth.user_cache import user_cache
+from app.auth.admission import admission_controller
+from app.services.generation_service import generation_cache_stats
+from app.services.generate.llm import get_llm_client
+from app.services.generate.summary import chunk_summary_cache
+from app.services.retrieval import index_cache_stats
+from app.services.jobs import job_queue
+
+router = APIRouter()
+
+@register_collector
+def _service_stats():
+    # Point-in-time state of pools, caches and queues, read at scrape time
+    rows = []
+    for engine, stats in pool_stats().items():
+        rows += stats_gauges("db_pool", stats, "Database connection pool state", engine=engine)
+    rows += stats_gauges("password_hasher", password_hasher.stats(), "Password hashing pool state")
+    rows += stats_gauges("user_cache", user_cache.stats(), "Authenticated user cache state")
+    rows += stats_gauges("generation_cache", generation_cache_stats(), "Generation reuse cache state")
+    rows += stats_gauges("chunk_summary_cache", chunk_summary_cache.stats(), "Transcript chunk summary cache state")
+    rows += stats_gauges("retrieval_index_cache", index_cache_stats(), "Chat retrieval index cache state")
+    rows += stats_gauges("job_queue", job_queue.stats(), "Background job queue state")
+    rows += stats_gauges("admission", admission_controller.stats(), "Per-user admission control state")
+    rows += stats_gauges("llm_breaker", get_llm_client().breaker.stats(), "LLM circuit breaker state")
+    return rows
+
+@router.get("", response_class=PlainTextResponse)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Metrics are disabled"
+        )
+
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,48 @@
+# backend/app/api/routes/search.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from pydantic import BaseModel
+from app.db.database import get_db, run_db
+from app.auth.security import get_current_user
+from app.services.search_service import search_contents, SearchUnavailableError
+from app.auth.user_cache import CurrentUser
+
+router = APIRouter()
+
+class SearchHit(BaseModel):
+    kind: str  # "title", "transcript", "summary", "flashcard", "quiz", "mindmap"
+    generation_id: Optional[str] = None
+    start: Optional[float] = None  # seconds, for timed transcripts
+    page: Optional[int] = None
+    snippet: str
+
+class SearchResult(BaseModel):
+    content_id: str
+    space_id: str
+    title: str
+    type: str
+    score: float
+    hits: List[SearchHit]
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchResult]
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    space_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Only the current user's contents are searched; space_id narrows further
+    try:
+        results = await run_db(db, search_contents, current_user.id, q, limit, space_id=space_id)
+    except SearchUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e)
+        )
+    return {"query": q, "results": results}
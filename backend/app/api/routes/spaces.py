@@ -1,18 +1,23 @@
 # backend/app/api/routes/spaces.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
-from app.db.database import get_db
+from app.db.database import get_db, run_db
 from app.db.crud import (
-    create_space, get_spaces_by_user, get_space_by_id, 
-    update_space, delete_space, get_contents_by_space
+    create_space, get_spaces_page, get_space_by_id, 
+    update_space, delete_space, get_content_summaries, get_contents_page
 )
 from app.auth.security import get_current_user
-from app.db.models import User
+from app.auth.user_cache import CurrentUser
+from app.utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter()
 
+# Contents returned inline with a single space; the rest are paged through
+# GET /{space_id}/contents
+SPACE_CONTENTS_PAGE_SIZE = 50
+
 class SpaceCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -32,15 +37,51 @@ class SpaceResponse(BaseModel):
     name: str
     description: Optional[str] = None
     contents: List[ContentBase] = []
+    next_contents_cursor: Optional[str] = None
+
+class ContentPage(BaseModel):
+    contents: List[ContentBase]
+    next_cursor: Optional[str] = None
+
+def _decode(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+def _page(rows: list, limit: int):
+    # Rows are fetched with one extra to tell whether another page follows
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+def _content_item(content):
+    return {
+        "id": content.id,
+        "title": content.title,
+        "type": content.type,
+        "created_at": content.created_at.isoformat()
+    }
+
+def _space_contents(db: Session, space_id: str, limit: int):
+    rows, next_cursor = _page(get_contents_page(db, space_id=space_id, limit=limit), limit)
+    return [_content_item(content) for content in rows], next_cursor
 
 @router.post("", response_model=SpaceResponse)
 async def create_new_space(
     space_data: SpaceCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    space = create_space(
-        db, 
+    space = await run_db(
+        db,
+        create_space,
         name=space_data.name,
         description=space_data.description,
         user_id=current_user.id
@@ -55,40 +96,77 @@ async def create_new_space(
 
 @router.get("", response_model=List[SpaceResponse])
 async def get_user_spaces(
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    contents_limit: int = Query(20, ge=0, le=200),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    spaces = get_spaces_by_user(db, user_id=current_user.id)
+    # Two queries whatever the number of spaces: one page of spaces, then the
+    # first contents_limit content summaries of each. The next page of spaces
+    # is linked through the X-Next-Cursor header.
+    after = _decode(cursor)
+    spaces, next_cursor = _page(await run_db(db, get_spaces_page, user_id=current_user.id, limit=limit, after=after), limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    contents_by_space = {space.id: [] for space in spaces}
+    if spaces and contents_limit:
+        summaries = await run_db(db, get_content_summaries, space_ids=list(contents_by_space), limit_per_space=contents_limit)
+        for content in summaries:
+            contents_by_space[content.space_id].append(content)
     
     result = []
     for space in spaces:
-        contents = get_contents_by_space(db, space_id=space.id)
-        content_list = [
-            {
-                "id": content.id,
-                "title": content.title,
-                "type": content.type,
-                "created_at": content.created_at.isoformat()
-            }
-            for content in contents
-        ]
-        
+        contents, next_contents_cursor = _page(contents_by_space[space.id], contents_limit)
         result.append({
             "id": space.id,
             "name": space.name,
             "description": space.description,
-            "contents": content_list
+            "contents": [_content_item(content) for content in contents],
+            "next_contents_cursor": next_contents_cursor
         })
     
     return result
 
+@router.get("/{space_id}/contents", response_model=ContentPage)
+async def get_space_contents(
+    space_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    space = await run_db(db, get_space_by_id, space_id=space_id)
+    
+    if not space:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Space not found"
+        )
+    
+    if space.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this space"
+        )
+    
+    after = _decode(cursor)
+    rows, next_cursor = _page(await run_db(db, get_contents_page, space_id=space.id, limit=limit, after=after), limit)
+    
+    return {
+        "contents": [_content_item(content) for content in rows],
+        "next_cursor": next_cursor
+    }
+
 @router.get("/{space_id}", response_model=SpaceResponse)
 async def get_space(
     space_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    space = get_space_by_id(db, space_id=space_id)
+    space = await run_db(db, get_space_by_id, space_id=space_id)
     
     if not space:
         raise HTTPException(
@@ -102,32 +180,24 @@ async def get_space(
             detail="Not authorized to access this space"
         )
     
-    contents = get_contents_by_space(db, space_id=space.id)
-    content_list = [
-        {
-            "id": content.id,
-            "title": content.title,
-            "type": content.type,
-            "created_at": content.created_at.isoformat()
-        }
-        for content in contents
-    ]
+    content_list, next_contents_cursor = await run_db(db, _space_contents, space.id, limit=SPACE_CONTENTS_PAGE_SIZE)
     
     return {
         "id": space.id,
         "name": space.name,
         "description": space.description,
-        "contents": content_list
+        "contents": content_list,
+        "next_contents_cursor": next_contents_cursor
     }
 
 @router.put("/{space_id}", response_model=SpaceResponse)
 async def update_space_details(
     space_id: str,
     space_data: SpaceUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    space = get_space_by_id(db, space_id=space_id)
+    space = await run_db(db, get_space_by_id, space_id=space_id)
     
     if not space:
         raise HTTPException(
@@ -141,38 +211,31 @@ async def update_space_details(
             detail="Not authorized to update this space"
         )
     
-    updated_space = update_space(
+    updated_space = await run_db(
         db,
+        update_space,
         space_id=space_id,
         name=space_data.name,
         description=space_data.description
     )
     
-    contents = get_contents_by_space(db, space_id=space.id)
-    content_list = [
-        {
-            "id": content.id,
-            "title": content.title,
-            "type": content.type,
-            "created_at": content.created_at.isoformat()
-        }
-        for content in contents
-    ]
+    content_list, next_contents_cursor = await run_db(db, _space_contents, space.id, limit=SPACE_CONTENTS_PAGE_SIZE)
     
     return {
         "id": updated_space.id,
         "name": updated_space.name,
         "description": updated_space.description,
-        "contents": content_list
+        "contents": content_list,
+        "next_contents_cursor": next_contents_cursor
     }
 
 @router.delete("/{space_id}")
 async def delete_user_space(
     space_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    space = get_space_by_id(db, space_id=space_id)
+    space = await run_db(db, get_space_by_id, space_id=space_id)
     
     if not space:
         raise HTTPException(
@@ -186,6 +249,6 @@ async def delete_user_space(
             detail="Not authorized to delete this space"
         )
     
-    delete_space(db, space_id=space_id)
+    await run_db(db, delete_space, space_id=space_id)
     
     return {"message": "Space deleted successfully"}
\ No newline at end of file
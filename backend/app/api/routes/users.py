@@ -3,11 +3,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Optional
 from pydantic import BaseModel, EmailStr
-from app.db.database import get_db
-from app.db.crud import create_user, get_user_by_email
-from app.auth.security import verify_password, get_current_user
+from app.db.database import get_db, run_db, release_db
+from app.db.crud import create_user, get_user_by_email, delete_user
+from app.auth.security import (
+    get_current_user, hash_password_async, verify_password_async, HasherBusyError
+)
 from app.auth.jwt import create_access_token
-from app.db.models import User
+from app.auth.user_cache import CurrentUser, user_cache
 
 router = APIRouter()
 
@@ -29,18 +31,33 @@ class TokenResponse(BaseModel):
     token: str
     user: UserResponse
 
+def _busy(e: HasherBusyError):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/signup", response_model=TokenResponse)
 async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     # Check if user exists
-    db_user = get_user_by_email(db, email=user_data.email)
+    db_user = await run_db(db, get_user_by_email, email=user_data.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
+    # Hashing runs on the password hasher pool, off the event loop. Give the
+    # DB connection back first so waiting sign-ups do not exhaust the pool.
+    await release_db(db)
+    try:
+        hashed_password = await hash_password_async(user_data.password)
+    except HasherBusyError as e:
+        raise _busy(e)
+    
     # Create new user
-    user = create_user(db, name=user_data.name, email=user_data.email, password=user_data.password)
+    user = await run_db(db, create_user, name=user_data.name, email=user_data.email, hashed_password=hashed_password)
     
     # Generate token
     token = create_access_token(data={"id": user.id, "email": user.email})
@@ -56,7 +73,7 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
 
 @router.post("/signin", response_model=TokenResponse)
 async def signin(data: SignInRequest, db: Session = Depends(get_db)):
-    user = get_user_by_email(db, email=data.email)
+    user = await run_db(db, get_user_by_email, email=data.email)
     
     if not user:
         raise HTTPException(
@@ -64,7 +81,14 @@ async def signin(data: SignInRequest, db: Session = Depends(get_db)):
             detail="Incorrect email or password"
         )
     
-    if not verify_password(data.password, user.password):
+    # Give the DB connection back while bcrypt runs
+    await release_db(db)
+    try:
+        valid = await verify_password_async(data.password, user.password)
+    except HasherBusyError as e:
+        raise _busy(e)
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -82,7 +106,7 @@ async def signin(data: SignInRequest, db: Session = Depends(get_db)):
     }
 
 @router.get("/validate", response_model=UserResponse)
-async def validate_token(current_user: User = Depends(get_current_user)):
+async def validate_token(current_user: CurrentUser = Depends(get_current_user)):
     return {
         "id": current_user.id,
         "name": current_user.name,
@@ -91,9 +115,11 @@ async def validate_token(current_user: User = Depends(get_current_user)):
 
 @router.post("/deactivate-account")
 async def deactivate_account(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db.delete(current_user)
-    db.commit()
+    await run_db(db, delete_user, user_id=current_user.id)
+    
+    # Tokens of a deleted user must stop working right away
+    await user_cache.invalidate(current_user.id)
     return {"message": "Account deactivated successfully"}
\ No newline at end of file
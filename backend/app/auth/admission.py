@@ -0,0 +1,395 @@
+# backend/app/auth/admission.py
+# Admission control for the expensive routes, so one user cannot use up the
+# LLM for everyone. Each user has a token bucket measured in prompt tokens:
+# a request pays a flat fee at the door and is turned away with 429 and
+# Retry-After when the bucket cannot cover it; once the route knows how big
+# its prompt is, charge_prompt_tokens() (or a prompt_charge() callback, for
+# generations that may not call the LLM at all) takes the rest, which may
+# leave the bucket in debt. Generation requests also need one of a global number of
+# in-flight slots; waiting requests are queued and served round-robin by user.
+import asyncio
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from fastapi import Depends, HTTPException, status
+from dotenv import load_dotenv
+from app.auth.security import get_current_user
+from app.auth.user_cache import CurrentUser, REDIS_URL
+from app.utils.cache import TTLCache
+
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# "memory" limits each worker on its own; "redis" shares the buckets and the
+# in-flight cap between workers
+ADMISSION_BACKEND = os.getenv("ADMISSION_BACKEND", "memory")
+ADMISSION_USER_TOKENS_PER_MINUTE = float(os.getenv("ADMISSION_USER_TOKENS_PER_MINUTE", 200000))
+ADMISSION_USER_BURST_TOKENS = float(os.getenv("ADMISSION_USER_BURST_TOKENS", 400000))
+# Paid by every admitted request, before its prompt size is known
+ADMISSION_REQUEST_TOKENS = float(os.getenv("ADMISSION_REQUEST_TOKENS", 1000))
+# Paid per ingestion; its transcript is not known until the job has run
+ADMISSION_INGEST_TOKENS = float(os.getenv("ADMISSION_INGEST_TOKENS", 20000))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 32))
+ADMISSION_MAX_QUEUED_PER_USER = int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER", 4))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 10))
+# A slot held longer than this is assumed lost with its worker
+ADMISSION_LEASE_SECONDS = float(os.getenv("ADMISSION_LEASE_SECONDS", 900))
+ADMISSION_POLL_SECONDS = float(os.getenv("ADMISSION_POLL_SECONDS", 0.05))
+ADMISSION_MAX_USERS = int(os.getenv("ADMISSION_MAX_USERS", 100000))
+
+# kind -> (tokens paid at the door, whether it needs an in-flight slot)
+ADMISSION_KINDS = {
+    "generate": (ADMISSION_REQUEST_TOKENS, True),
+    "ingest": (ADMISSION_INGEST_TOKENS, False),
+}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MemoryAdmissionState:
+    # Buckets and slots of this process only
+    def __init__(self, max_users: int = ADMISSION_MAX_USERS):
+        # An idle bucket is full again, even from the deepest debt, after
+        # 2 * burst / rate seconds; forgetting it then changes nothing
+        self._buckets = TTLCache(
+            max_entries=max_users,
+            ttl=120 * ADMISSION_USER_BURST_TOKENS / ADMISSION_USER_TOKENS_PER_MINUTE,
+        )
+        self._slots = set()
+        self._lock = threading.Lock()
+
+    async def take(self, user_id: str, cost: float, capacity: float, rate: float, gate: bool):
+        # Returns 0 once cost is paid, or the seconds until the bucket could
+        # pay it. Without gate the cost is always paid, down to -capacity.
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(user_id) or (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = (cost - tokens) / rate if gate and tokens < cost else 0.0
+            if not wait:
+                tokens = min(capacity, max(-capacity, tokens - cost))
+            self._buckets.set(user_id, (tokens, now))
+        return wait
+
+    async def acquire_slot(self, lease: str, limit: int):
+        with self._lock:
+            if len(self._slots) >= limit:
+                return False
+            self._slots.add(lease)
+            return True
+
+    async def release_slot(self, lease: str):
+        with self._lock:
+            self._slots.discard(lease)
+
+    def stats(self):
+        return {"backend": "memory", "in_flight": len(self._slots), "users": len(self._buckets)}
+
+
+_TAKE_SCRIPT = """
+local capacity, rate, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if ARGV[4] == '1' and tokens < cost then
+    wait = (cost - tokens) / rate
+else
+    tokens = math.min(capacity, math.max(-capacity, tokens - cost))
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(2 * capacity / rate) + 1)
+return tostring(wait)
+"""
+
+_ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+return 1
+"""
+
+
+class RedisAdmissionState:
+    # Shared between workers; slots are leases in a sorted set scored by
+    # expiry. Redis being down lets requests through rather than failing them.
+    prefix = "admission:"
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis
+
+        self._errors = redis.RedisError
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._acquire = self._redis.register_script(_ACQUIRE_SCRIPT)
+
+    async def take(self, user_id: str, cost: float, capacity: float, rate: float, gate: bool):
+        try:
+            wait = await self._take(keys=[f"{self.prefix}bucket:{user_id}"], args=[capacity, rate, cost, int(gate)])
+        except self._errors:
+            return 0.0
+        return float(wait)
+
+    async def acquire_slot(self, lease: str, limit: int):
+        try:
+            return bool(await self._acquire(keys=[f"{self.prefix}slots"], args=[limit, ADMISSION_LEASE_SECONDS, lease]))
+        except self._errors:
+            return True
+
+    async def release_slot(self, lease: str):
+        try:
+            await self._redis.zrem(f"{self.prefix}slots", lease)
+        except self._errors:
+            pass
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+ADMISSION_BACKENDS = {"memory": MemoryAdmissionState, "redis": RedisAdmissionState}
+
+
+class FairQueue:
+    # Hands out in-flight slots, at most limit at a time across whatever the
+    # state is shared with. Requests that have to wait are served one user at
+    # a time in turn, so a user with a backlog cannot hold up the others, and
+    # each user may only have max_queued waiting.
+    def __init__(
+        self,
+        state,
+        limit: int = ADMISSION_MAX_IN_FLIGHT,
+        max_queued: int = ADMISSION_MAX_QUEUED_PER_USER,
+        timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.state = state
+        self.limit = limit
+        self.max_queued = max_queued
+        self.timeout = timeout
+        # user id -> deque of (lease, future), in serving order
+        self._waiters = OrderedDict()
+        self._loop = None
+        self._wake = None
+        self._pump_task = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _bind(self):
+        # Futures and events belong to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._waiters.clear()
+            self._pump_task = None
+        return loop
+
+    def waiting(self):
+        return sum(len(queue) for queue in self._waiters.values())
+
+    async def acquire(self, user_id: str):
+        # Returns a lease to pass to release()
+        loop = self._bind()
+        lease = uuid.uuid4().hex
+        if not self._waiters and await self.state.acquire_slot(lease, self.limit):
+            self.admitted += 1
+            return lease
+
+        queue = self._waiters.setdefault(user_id, deque())
+        if len(queue) >= self.max_queued:
+            if not queue:
+                del self._waiters[user_id]
+            self.rejected += 1
+            raise AdmissionRejected("Too many requests waiting, try again shortly", retry_after=self.timeout)
+
+        future = loop.create_future()
+        queue.append((lease, future))
+        self.queued += 1
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = loop.create_task(self._pump())
+        try:
+            lease = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted just as we gave up
+                await self.release(future.result())
+            future.cancel()
+            self._discard(user_id, future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise AdmissionRejected("Server busy, try again shortly", retry_after=self.timeout)
+        self.admitted += 1
+        return lease
+
+    def _discard(self, user_id: str, future):
+        queue = self._waiters.get(user_id)
+        if queue is None:
+            return
+        for entry in list(queue):
+            if entry[1] is future:
+                queue.remove(entry)
+        if not queue:
+            del self._waiters[user_id]
+
+    async def release(self, lease: str):
+        await self.state.release_slot(lease)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _pump(self):
+        # Grants slots to the head of each user's queue in turn. Slots freed
+        # by other workers are noticed by polling.
+        while self._waiters:
+            user_id, queue = next(iter(self._waiters.items()))
+            lease, future = queue[0]
+            if not future.done() and await self.state.acquire_slot(lease, self.limit):
+                if future.done():
+                    # Gave up while the slot was being acquired
+                    await self.state.release_slot(lease)
+                else:
+                    future.set_result(lease)
+            elif not future.done():
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), ADMISSION_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Next user's turn
+            self._discard(user_id, future)
+            if user_id in self._waiters:
+                self._waiters.move_to_end(user_id)
+
+
+class AdmissionController:
+    def __init__(self, backend: str = ADMISSION_BACKEND):
+        self.state = ADMISSION_BACKENDS[backend]()
+        self.queue = FairQueue(self.state)
+        self.capacity = ADMISSION_USER_BURST_TOKENS
+        self.rate = ADMISSION_USER_TOKENS_PER_MINUTE / 60
+        self.rate_limited = 0
+
+    async def take(self, user_id: str, cost: float):
+        # Never asks for more than a full bucket, which would wait forever
+        wait = await self.state.take(user_id, min(cost, self.capacity), self.capacity, self.rate, gate=True)
+        if wait:
+            self.rate_limited += 1
+            raise AdmissionRejected("Rate limit exceeded, try again later", retry_after=wait)
+
+    async def charge(self, user_id: str, tokens: float):
+        # Paid whether or not the bucket covers it; negative refunds
+        await self.state.take(user_id, tokens, self.capacity, self.rate, gate=False)
+
+    def stats(self):
+        return {
+            **self.state.stats(),
+            "max_in_flight": self.queue.limit,
+            "waiting": self.queue.waiting(),
+            "admitted": self.queue.admitted,
+            "queued": self.queue.queued,
+            "rejected": self.queue.rejected,
+            "rate_limited": self.rate_limited,
+        }
+
+
+admission_controller = AdmissionController()
+
+
+def _too_many_requests(error: AdmissionRejected):
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
+
+
+def admission(kind: str):
+    # Route dependency, e.g. dependencies=[Depends(admission("generate"))].
+    # The slot is held until the response, streamed or not, has been sent.
+    cost, needs_slot = ADMISSION_KINDS[kind]
+
+    async def admit(current_user: CurrentUser = Depends(get_current_user)):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+
+        lease = None
+        try:
+            await admission_controller.take(current_user.id, cost)
+            if needs_slot:
+                try:
+                    lease = await admission_controller.queue.acquire(current_user.id)
+                except AdmissionRejected:
+                    # Turned away; the fee is given back
+                    await admission_controller.charge(current_user.id, -cost)
+                    raise
+        except AdmissionRejected as e:
+            raise _too_many_requests(e)
+
+        try:
+            yield
+        finally:
+            if lease is not None:
+                await admission_controller.queue.release(lease)
+
+    return admit
+
+
+async def charge_prompt_tokens(user_id: str, tokens: float):
+    # The rest of a generation request's cost, once its prompt size is known
+    if ADMISSION_ENABLED:
+        await admission_controller.charge(user_id, max(0.0, tokens - ADMISSION_REQUEST_TOKENS))
+
+
+def prompt_charge(user_id: str, tokens: float):
+    # A callback that generation code awaits just before each LLM call with a
+    # prompt of this size, so results found stored, cached or made by another
+    # request cost only the fee paid at the door. That fee counts towards the
+    # first call.
+    credit = {"tokens": ADMISSION_REQUEST_TOKENS}
+
+    async def charge():
+        if not ADMISSION_ENABLED:
+            return
+        covered = min(credit["tokens"], tokens)
+        credit["tokens"] -= covered
+        await admission_controller.charge(user_id, tokens - covered)
+
+    return charge
+
+
+def ingestion_limit(limit: int):
+    # The most ingestions one request may ask for. A batch has to fit in a
+    # full bucket, or it could never be admitted.
+    if ADMISSION_ENABLED and ADMISSION_INGEST_TOKENS > 0:
+        return min(limit, max(1, int(ADMISSION_USER_BURST_TOKENS // ADMISSION_INGEST_TOKENS)))
+    return limit
+
+
+async def admit_ingestions(user_id: str, count: int):
+    # Bulk ingestion pays for each item past the first, which admission took,
+    # and is turned away with 429 when the bucket cannot pay for all of them
+    if not ADMISSION_ENABLED or count <= 1:
+        return
+    try:
+        await admission_controller.take(user_id, ADMISSION_INGEST_TOKENS * (count - 1))
+    except AdmissionRejected as e:
+        # Turned away; the first item's fee is given back
+        await admission_controller.charge(user_id, -ADMISSION_INGEST_TOKENS)
+        raise _too_many_requests(e)
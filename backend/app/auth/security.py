@@ -1,11 +1,25 @@
 # backend/app/auth/security.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import User
+from app.db.database import get_db, run_db
+from app.db.crud import get_user_by_id
 from app.auth.jwt import verify_token
+from app.auth.user_cache import CurrentUser, user_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# bcrypt releases the GIL, so each worker thread hashes on its own core
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+# Hashes waiting or running before new sign-ins are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 256))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/signin")
@@ -16,6 +30,75 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class HasherBusyError(Exception):
+    pass
+
+class PasswordHasher:
+    # Runs bcrypt on a dedicated thread pool so a burst of sign-ins cannot
+    # stall the event loop, and tracks how deep the backlog gets
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+    
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HasherBusyError("Too many sign-in requests in progress, try again shortly")
+            self._pending += 1
+        submitted = time.monotonic()
+        
+        def task():
+            wait = time.monotonic() - submitted
+            with self._lock:
+                self._running += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+        
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, task)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queued": self._pending - self._running,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(1000 * self._wait_total / self._completed, 2) if self._completed else 0.0,
+                "max_wait_ms": round(1000 * self._wait_max, 2),
+            }
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher()
+
+async def hash_password_async(password):
+    return await password_hasher.run(get_password_hash, password)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -31,8 +114,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    # Most requests are answered from the user cache without a query
+    user = await user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    db_user = await run_db(db, get_user_by_id, user_id=user_id)
+    if db_user is None:
         raise credentials_exception
     
+    user = CurrentUser(id=db_user.id, name=db_user.name, email=db_user.email)
+    await user_cache.set(user)
     return user
\ No newline at end of file
@@ -0,0 +1,81 @@
+# backend/app/auth/user_cache.py
+# Authenticated users by id, so a request with a valid token does not need a
+# users query. Entries hold no password hash and expire after a short TTL;
+# anything that changes or removes a user must call invalidate().
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Optional
+from dotenv import load_dotenv
+from app.utils.cache import TTLCache
+
+load_dotenv()
+
+# "memory" is per process; use "redis" when running several workers so an
+# invalidation reaches all of them
+USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", "memory")
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: str
+    name: Optional[str]
+    email: str
+
+
+class MemoryUserCache:
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES, ttl: float = USER_CACHE_TTL_SECONDS):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    async def get(self, user_id: str):
+        return self._cache.get(user_id)
+
+    async def set(self, user: CurrentUser):
+        self._cache.set(user.id, user)
+
+    async def invalidate(self, user_id: str):
+        self._cache.delete(user_id)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class RedisUserCache:
+    # Shared between workers. Redis being down only costs the DB query.
+    prefix = "user:"
+
+    def __init__(self, url: str = REDIS_URL, ttl: float = USER_CACHE_TTL_SECONDS):
+        import redis.asyncio as redis
+
+        self._errors = redis.RedisError
+        self._redis = redis.from_url(url)
+        self.ttl = max(1, int(ttl))
+
+    async def get(self, user_id: str):
+        try:
+            raw = await self._redis.get(self.prefix + user_id)
+        except self._errors:
+            return None
+        return CurrentUser(**json.loads(raw)) if raw else None
+
+    async def set(self, user: CurrentUser):
+        try:
+            await self._redis.set(self.prefix + user.id, json.dumps(asdict(user)), ex=self.ttl)
+        except self._errors:
+            pass
+
+    async def invalidate(self, user_id: str):
+        # Unlike get/set this must not fail silently, or a removed user
+        # would stay signed in on other workers until the TTL runs out
+        await self._redis.delete(self.prefix + user_id)
+
+    def stats(self):
+        return {"backend": "redis", "ttl": self.ttl}
+
+
+USER_CACHE_BACKENDS = {"memory": MemoryUserCache, "redis": RedisUserCache}
+
+user_cache = USER_CACHE_BACKENDS[USER_CACHE_BACKEND]()
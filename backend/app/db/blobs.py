@@ -0,0 +1,53 @@
+# backend/app/db/blobs.py
+# Compressed storage for the large parts of a content payload (transcript,
+# timed segments, page offsets). They live in content_blobs and are only
+# read by the endpoints that need the text.
+import json
+import os
+import zlib
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+# Keys of Content.data that are moved into the blob
+LARGE_KEYS = ("transcript", "segments", "pages")
+
+BLOB_CODEC = os.getenv("BLOB_CODEC", "zstd" if zstandard else "zlib")
+BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", 6))
+BLOB_ZLIB_LEVEL = int(os.getenv("BLOB_ZLIB_LEVEL", 6))
+
+
+def split_payload(data: dict):
+    # Returns (small fields kept on the content row, large fields for the blob)
+    small = {key: value for key, value in data.items() if key not in LARGE_KEYS}
+    large = {key: value for key, value in data.items() if key in LARGE_KEYS}
+    return small, large
+
+
+def compress_payload(data: dict, codec: str = BLOB_CODEC):
+    # Returns (codec, compressed bytes, uncompressed size)
+    raw = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("BLOB_CODEC is zstd but the zstandard package is not installed")
+        return codec, zstandard.ZstdCompressor(level=BLOB_ZSTD_LEVEL).compress(raw), len(raw)
+    if codec == "zlib":
+        return codec, zlib.compress(raw, BLOB_ZLIB_LEVEL), len(raw)
+    raise ValueError(f"Unknown blob codec: {codec}")
+
+
+def decompress_payload(codec: str, payload: bytes):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Content is zstd-compressed but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == "zlib":
+        raw = zlib.decompress(payload)
+    else:
+        raise ValueError(f"Unknown blob codec: {codec}")
+    return json.loads(raw)
@@ -1,11 +1,16 @@
 # backend/app/db/crud.py
-from sqlalchemy.orm import Session
-from app.db.models import User, Space, Content, Generation
-from app.auth.security import get_password_hash
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select, insert, and_, or_, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.types import DateTime
+from app.db.models import User, Space, Content, ContentBlob, Video, Generation, ChatSession, ChatMessage, SearchDocument, JobState
+from app.db.blobs import split_payload, compress_payload
+from app.db.search import content_documents, generation_documents
 
 # User CRUD operations
-def create_user(db: Session, name: str, email: str, password: str):
-    hashed_password = get_password_hash(password)
+def create_user(db: Session, name: str, email: str, hashed_password: str):
+    # Hash with security.hash_password_async first; bcrypt is too slow to run here
     db_user = User(name=name, email=email, password=hashed_password)
     db.add(db_user)
     db.commit()
@@ -18,6 +23,17 @@ def get_user_by_email(db: Session, email: str):
 def get_user_by_id(db: Session, user_id: str):
     return db.query(User).filter(User.id == user_id).first()
 
+def delete_user(db: Session, user_id: str):
+    # Callers must also invalidate the user cache
+    db_user = get_user_by_id(db, user_id)
+    if db_user:
+        db.query(SearchDocument).filter(SearchDocument.user_id == user_id).delete(synchronize_session=False)
+        db.query(JobState).filter(JobState.user_id == user_id).delete(synchronize_session=False)
+        db.delete(db_user)
+        db.commit()
+        return True
+    return False
+
 # Space CRUD operations
 def create_space(db: Session, name: str, description: str, user_id: str):
     db_space = Space(name=name, description=description, user_id=user_id)
@@ -29,6 +45,25 @@ def create_space(db: Session, name: str, description: str, user_id: str):
 def get_spaces_by_user(db: Session, user_id: str):
     return db.query(Space).filter(Space.user_id == user_id).all()
 
+def _after(query, model, after: tuple):
+    # Keyset condition for rows after (created_at, id). The cursor row's own
+    # stored timestamp is compared where it still exists, so the comparison is
+    # exact whatever precision the backend stores; the cursor's copy covers a
+    # row deleted between pages.
+    created_at, id = after
+    anchor = func.coalesce(
+        select(model.created_at).where(model.id == id).scalar_subquery(),
+        literal(created_at, DateTime(timezone=True))
+    )
+    return query.filter(or_(model.created_at > anchor, and_(model.created_at == anchor, model.id > id)))
+
+def get_spaces_page(db: Session, user_id: str, limit: int, after: tuple = None):
+    # Returns up to limit + 1 spaces so the caller can tell if more follow
+    query = db.query(Space).filter(Space.user_id == user_id)
+    if after:
+        query = _after(query, Space, after)
+    return query.order_by(Space.created_at, Space.id).limit(limit + 1).all()
+
 def get_space_by_id(db: Session, space_id: str):
     return db.query(Space).filter(Space.id == space_id).first()
 
@@ -46,43 +81,296 @@ def update_space(db: Session, space_id: str, name: str = None, description: str
 def delete_space(db: Session, space_id: str):
     db_space = get_space_by_id(db, space_id)
     if db_space:
+        db.query(SearchDocument).filter(SearchDocument.space_id == space_id).delete(synchronize_session=False)
         db.delete(db_space)
         db.commit()
         return True
     return False
 
+# Search index operations; rows are written in the same transaction as
+# what they index
+def _space_owners(db: Session, space_ids):
+    return dict(db.query(Space.id, Space.user_id).filter(Space.id.in_(list(space_ids))).all())
+
+def _add_search_documents(db: Session, owners: dict, sources: list):
+    # sources is a list of (content, full data, generation or None)
+    rows = []
+    for db_content, data, db_generation in sources:
+        if db_generation is None:
+            documents = content_documents(db_content.title, data)
+        else:
+            documents = generation_documents(db_generation.type, db_generation.data)
+        for document in documents:
+            rows.append({
+                **document,
+                "user_id": owners[db_content.space_id],
+                "space_id": db_content.space_id,
+                "content_id": db_content.id,
+                "generation_id": db_generation.id if db_generation is not None else None,
+            })
+    if rows:
+        db.execute(insert(SearchDocument), rows)
+
+def _index_generations(db: Session, db_generations: list):
+    contents = {
+        content.id: content
+        for content in db.query(Content.id, Content.title, Content.space_id).filter(
+            Content.id.in_({generation.content_id for generation in db_generations})
+        )
+    }
+    owners = _space_owners(db, {content.space_id for content in contents.values()})
+    _add_search_documents(db, owners, [
+        (contents[generation.content_id], None, generation) for generation in db_generations
+    ])
+
+def reindex_content(db: Session, content_id: str):
+    # Rebuilds the search rows of a content and its generations, e.g. for
+    # contents written before the index existed
+    db_content = get_content_by_id(db, content_id)
+    if db_content is None:
+        return False
+    db.query(SearchDocument).filter(SearchDocument.content_id == content_id).delete(synchronize_session=False)
+    owners = {db_content.space_id: db_content.space.user_id}
+    _add_search_documents(db, owners, [(db_content, db_content.payload, None)] + [
+        (db_content, None, db_generation) for db_generation in db_content.generations
+    ])
+    db.commit()
+    return True
+
+def _reindex_video_contents(db: Session, video_id: str, transcript: dict):
+    # Contents of a refreshed video are searched by its new transcript; their
+    # generations keep their rows
+    contents = db.query(Content).filter(Content.video_id == video_id).all()
+    if not contents:
+        return
+    db.query(SearchDocument).filter(
+        SearchDocument.content_id.in_([content.id for content in contents]),
+        SearchDocument.generation_id.is_(None)
+    ).delete(synchronize_session=False)
+    owners = _space_owners(db, {content.space_id for content in contents})
+    _add_search_documents(db, owners, [
+        (content, {**(content.data or {}), **transcript}, None) for content in contents
+    ])
+
 # Content CRUD operations
-def create_content(db: Session, title: str, type: str, data: dict, space_id: str):
-    db_content = Content(title=title, type=type, data=data, space_id=space_id)
+def _new_content(title: str, type: str, data: dict, space_id: str, video_id: str = None, id: str = None):
+    # Large fields are compressed into a separate blob row, unless they are
+    # already stored once for the video
+    data, large = split_payload(data)
+    db_content = Content(id=id, title=title, type=type, data=data, space_id=space_id, video_id=video_id)
+    if large and video_id is None:
+        codec, payload, raw_size = compress_payload(large)
+        db_content.blob = ContentBlob(codec=codec, payload=payload, raw_size=raw_size)
+    return db_content
+
+def create_content(db: Session, title: str, type: str, data: dict, space_id: str, video_id: str = None):
+    db_content = _new_content(title, type, data, space_id, video_id)
     db.add(db_content)
+    db.flush()
+    _add_search_documents(db, _space_owners(db, [space_id]), [(db_content, data, None)])
     db.commit()
     db.refresh(db_content)
     return db_content
 
+def create_contents(db: Session, contents: list, batch_size: int = 100):
+    # contents is a list of dicts of create_content's arguments, plus an id
+    # so callers know the rows without reading them back. All are saved in
+    # one transaction, flushed batch_size rows at a time.
+    owners = _space_owners(db, {content["space_id"] for content in contents})
+    for start in range(0, len(contents), batch_size):
+        batch = contents[start:start + batch_size]
+        db_contents = [_new_content(**content) for content in batch]
+        db.add_all(db_contents)
+        db.flush()
+        _add_search_documents(db, owners, [
+            (db_content, content["data"], None) for db_content, content in zip(db_contents, batch)
+        ])
+    db.commit()
+
 def get_content_by_id(db: Session, content_id: str):
-    return db.query(Content).filter(Content.id == content_id).first()
+    # The space comes along for the ownership check every caller makes
+    return db.query(Content).options(joinedload(Content.space)).filter(Content.id == content_id).first()
+
+def get_content_payload(db: Session, content: Content):
+    # Full data including the blob or the video's transcript, which are only
+    # read here; content must belong to db
+    return content.payload
 
 def get_contents_by_space(db: Session, space_id: str):
     return db.query(Content).filter(Content.space_id == space_id).all()
 
+def get_content_summaries(db: Session, space_ids: list, limit_per_space: int):
+    # First limit_per_space + 1 contents of every space in one query, without
+    # the data column
+    rank = func.row_number().over(
+        partition_by=Content.space_id,
+        order_by=(Content.created_at, Content.id)
+    ).label("rank")
+    ranked = db.query(
+        Content.id, Content.title, Content.type, Content.created_at, Content.space_id, rank
+    ).filter(Content.space_id.in_(space_ids)).subquery()
+    return db.query(ranked).filter(ranked.c.rank <= limit_per_space + 1).order_by(ranked.c.space_id, ranked.c.rank).all()
+
+def get_contents_page(db: Session, space_id: str, limit: int, after: tuple = None):
+    # Content metadata only, up to limit + 1 rows
+    query = db.query(Content.id, Content.title, Content.type, Content.created_at, Content.space_id).filter(
+        Content.space_id == space_id
+    )
+    if after:
+        query = _after(query, Content, after)
+    return query.order_by(Content.created_at, Content.id).limit(limit + 1).all()
+
 def delete_content(db: Session, content_id: str):
     db_content = get_content_by_id(db, content_id)
     if db_content:
+        db.query(SearchDocument).filter(SearchDocument.content_id == content_id).delete(synchronize_session=False)
         db.delete(db_content)
         db.commit()
         return True
     return False
 
+# Video CRUD operations
+def get_video(db: Session, video_id: str):
+    return db.query(Video).filter(Video.id == video_id).first()
+
+def save_video(db: Session, video_id: str, title: str, author: str, thumbnail: str, transcript: dict):
+    # Stores a newly fetched video, or refreshes the stored one in place.
+    # transcript holds the large fields, e.g. transcript and segments.
+    codec, payload, raw_size = compress_payload(transcript)
+    video = get_video(db, video_id)
+    if video is None:
+        video = Video(id=video_id)
+        db.add(video)
+    else:
+        # In the same transaction, so search never sees the old transcript
+        # next to the new one
+        _reindex_video_contents(db, video_id, transcript)
+    video.title = title
+    video.author = author
+    video.thumbnail = thumbnail
+    video.codec = codec
+    video.payload = payload
+    video.raw_size = raw_size
+    video.fetched_at = datetime.now(timezone.utc)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored it first
+        db.rollback()
+        return get_video(db, video_id)
+    db.refresh(video)
+    return video
+
 # Generation CRUD operations
-def create_generation(db: Session, type: str, data: dict, content_id: str):
-    db_generation = Generation(type=type, data=data, content_id=content_id)
+def create_generation(db: Session, type: str, data: dict, content_id: str, cache_key: str = None, source_key: str = None):
+    db_generation = Generation(type=type, data=data, content_id=content_id, cache_key=cache_key, source_key=source_key)
     db.add(db_generation)
+    db.flush()
+    _index_generations(db, [db_generation])
     db.commit()
     db.refresh(db_generation)
     return db_generation
 
+def create_generations(db: Session, generations: list):
+    # generations is a list of dicts of create_generation's arguments, all
+    # saved in one transaction
+    db_generations = [Generation(**generation) for generation in generations]
+    db.add_all(db_generations)
+    db.flush()
+    _index_generations(db, db_generations)
+    db.commit()
+    for db_generation in db_generations:
+        db.refresh(db_generation)
+    return db_generations
+
 def get_generations_by_content(db: Session, content_id: str, generation_type: str = None):
     query = db.query(Generation).filter(Generation.content_id == content_id)
     if generation_type:
         query = query.filter(Generation.type == generation_type)
-    return query.all()
\ No newline at end of file
+    return query.all()
+
+def get_generation_by_cache_key(db: Session, cache_key: str):
+    return db.query(Generation).filter(Generation.cache_key == cache_key).first()
+
+def get_latest_generation_by_source_key(db: Session, source_key: str):
+    return (
+        db.query(Generation)
+        .filter(Generation.source_key == source_key)
+        .order_by(Generation.created_at.desc())
+        .first()
+    )
+
+# Chat session CRUD operations
+def create_chat_session(db: Session, content_id: str, user_id: str, session_id: str = None, messages: list = ()):
+    # A new session is stored together with its first turn, as (role,
+    # content) pairs, so a failed first reply leaves nothing behind
+    db_session = ChatSession(id=session_id, content_id=content_id, user_id=user_id)
+    db.add(db_session)
+    db.add_all([
+        ChatMessage(session=db_session, position=position, role=role, content=content)
+        for position, (role, content) in enumerate(messages)
+    ])
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+def get_chat_session(db: Session, session_id: str):
+    return db.query(ChatSession).filter(ChatSession.id == session_id).first()
+
+def get_chat_messages(db: Session, session_id: str, include_compacted: bool = True):
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if not include_compacted:
+        query = query.filter(ChatMessage.compacted == False)
+    return query.order_by(ChatMessage.position).all()
+
+def add_chat_messages(db: Session, session_id: str, messages: list, attempts: int = 5):
+    # messages is a list of (role, content) pairs, appended in order. The
+    # session row is locked while the next position is read; where the
+    # database has no row locks, the unique (session_id, position)
+    # constraint turns a concurrent append into a retry instead.
+    for attempt in range(attempts):
+        db.query(ChatSession.id).filter(ChatSession.id == session_id).with_for_update().first()
+        last = db.query(func.max(ChatMessage.position)).filter(ChatMessage.session_id == session_id).scalar()
+        position = -1 if last is None else last
+        db_messages = []
+        for role, content in messages:
+            position += 1
+            db_messages.append(ChatMessage(session_id=session_id, position=position, role=role, content=content))
+        db.add_all(db_messages)
+        try:
+            db.commit()
+            return db_messages
+        except IntegrityError:
+            db.rollback()
+            if attempt == attempts - 1:
+                raise
+
+def compact_chat_messages(db: Session, session_id: str, up_to_position: int, summary: str):
+    db.query(ChatMessage).filter(
+        ChatMessage.session_id == session_id,
+        ChatMessage.position <= up_to_position
+    ).update({ChatMessage.compacted: True}, synchronize_session=False)
+    db.query(ChatSession).filter(ChatSession.id == session_id).update(
+        {ChatSession.summary: summary}, synchronize_session=False
+    )
+    db.commit()
+
+# Background job state
+def save_job_state(db: Session, state: dict):
+    # Inserts or updates the job's row; state holds JobState's columns
+    db.merge(JobState(**state))
+    db.commit()
+
+def get_job_state(db: Session, job_id: str):
+    return db.query(JobState).filter(JobState.id == job_id).first()
+
+def touch_job_states(db: Session, job_ids: list, now: datetime):
+    # Marks unfinished jobs as still owned by a live worker
+    db.query(JobState).filter(JobState.id.in_(job_ids), JobState.finished_at.is_(None)).update(
+        {JobState.updated_at: now}, synchronize_session=False
+    )
+    db.commit()
+
+def delete_job_states(db: Session, finished_before: datetime):
+    db.query(JobState).filter(JobState.finished_at < finished_before).delete(synchronize_session=False)
+    db.commit()
@@ -1,22 +1,223 @@
 # backend/app/db/database.py
-from sqlalchemy import create_engine
+import asyncio
+import os
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy import exc
 from dotenv import load_dotenv
+from app.utils.metrics import record_query
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Request handlers use an async engine when enabled; job threads, the legacy
+# Flask app and advisory locks always use the sync engine
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Recycle before server or proxy idle timeouts drop connections
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Async drivers used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+# Query timing for every engine, the async engines' sync side included
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is not None:
+        record_query(statement, time.perf_counter() - started)
+
+
+class PoolMetrics:
+    # Checkout wait is the time from asking the pool for a connection to
+    # getting one, including opening a new one when the pool grows
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(1000 * self.wait_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(1000 * self.wait_max, 3),
+            }
+
+
+class _InstrumentedPool:
+    metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return record
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _async_url(url: str):
+    scheme, rest = url.split("://", 1)
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0])
+    if driver is None:
+        raise ValueError(f"No async driver known for {scheme}; set ASYNC_DATABASE_URL")
+    return f"{driver}://{rest}"
+
+
+def _pool_options(url: str, poolclass):
+    # In-memory SQLite lives in a single connection and cannot be pooled
+    if url.startswith("sqlite") and ":memory:" in url:
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _instrument(engine):
+    if isinstance(engine.pool, _InstrumentedPool):
+        engine.pool.metrics = PoolMetrics()
+    return engine
+
+
+engine = _instrument(create_engine(DATABASE_URL, **_pool_options(DATABASE_URL, InstrumentedQueuePool)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    _url = ASYNC_DATABASE_URL or _async_url(DATABASE_URL)
+    async_engine = create_async_engine(_url, **_pool_options(_url, InstrumentedAsyncQueuePool))
+    _instrument(async_engine.sync_engine)
+    # Objects stay readable after commit without another round trip
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+if DB_ASYNC:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+async def run_db(db, fn, *args, **kwargs):
+    # Runs sync ORM code (crud functions, lazy loads) for a request without
+    # blocking the event loop: through run_sync on an async session, or on a
+    # worker thread for a sync one. fn gets a sync Session as first argument.
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+    return await asyncio.to_thread(fn, db, *args, **kwargs)
+
+
+async def run_in_new_session(fn, *args, **kwargs):
+    # run_db with a session of its own, for work that outlives the request or
+    # runs in the background
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            return await run_db(db, fn, *args, **kwargs)
+
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return await asyncio.to_thread(call)
+
+
+async def release_db(db):
+    # Hands the session's connection back to the pool before a long wait;
+    # the session reconnects if it is used again
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        db.close()
+
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+
+
+def _pool_stats(engine):
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    # Every QueuePool here is built by _pool_options with DB_MAX_OVERFLOW;
+    # a negative setting means unbounded overflow
+    capacity = pool.size() + max(DB_MAX_OVERFLOW, 0)
+    stats = {
+        "size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "saturation": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+    }
+    if isinstance(pool, _InstrumentedPool):
+        stats.update(pool.metrics.stats())
+    return stats
+
+
+def pool_stats():
+    stats = {"sync": _pool_stats(engine)}
+    if async_engine is not None:
+        stats["async"] = _pool_stats(async_engine.sync_engine)
+    return stats
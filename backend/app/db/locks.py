@@ -0,0 +1,81 @@
+# backend/app/db/locks.py
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from dotenv import load_dotenv
+from app.db.database import engine
+
+load_dotenv()
+
+ADVISORY_LOCKS_ENABLED = os.getenv("ADVISORY_LOCKS_ENABLED", "false").lower() == "true"
+ADVISORY_LOCK_POLL_SECONDS = float(os.getenv("ADVISORY_LOCK_POLL_SECONDS", 0.1))
+ADVISORY_LOCK_TIMEOUT_SECONDS = float(os.getenv("ADVISORY_LOCK_TIMEOUT_SECONDS", 10))
+
+# Lock holders keep a connection for as long as they hold the lock, which
+# may be a whole LLM call, so they get their own unpooled ones rather than
+# taking the request pool's
+_lock_engine = None
+_lock_engine_guard = threading.Lock()
+
+
+def _get_lock_engine():
+    global _lock_engine
+    with _lock_engine_guard:
+        if _lock_engine is None:
+            _lock_engine = create_engine(engine.url, poolclass=NullPool)
+    return _lock_engine
+
+
+def _lock_id(key: str):
+    # pg advisory locks take a signed 64-bit key
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+def _try_lock(conn, lock_id: int):
+    return conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id}).scalar()
+
+
+def _unlock(conn, lock_id: int):
+    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+
+
+@asynccontextmanager
+async def advisory_lock(key: str, timeout: float = ADVISORY_LOCK_TIMEOUT_SECONDS, on_wait=None):
+    # Cross-worker mutual exclusion on Postgres. A no-op on other databases or
+    # when disabled, in which case in-process coalescing is all we get. Runs
+    # on worker threads so neither connecting nor polling blocks the event
+    # loop, on a connection outside the request pool. Waits up to timeout
+    # seconds; on_wait, if given, is called once if the lock is taken.
+    if not ADVISORY_LOCKS_ENABLED or engine.dialect.name != "postgresql":
+        yield
+        return
+
+    lock_id = _lock_id(key)
+    # Session-level locks belong to a connection, so hold a dedicated one
+    conn = await asyncio.to_thread(_get_lock_engine().connect)
+    try:
+        acquired = False
+        deadline = time.monotonic() + timeout
+        # Poll instead of pg_advisory_lock so a waiter does not tie up a thread
+        while True:
+            acquired = await asyncio.to_thread(_try_lock, conn, lock_id)
+            if acquired or time.monotonic() >= deadline:
+                break
+            if on_wait is not None:
+                on_wait()
+                on_wait = None
+            await asyncio.sleep(ADVISORY_LOCK_POLL_SECONDS)
+
+        # On timeout carry on unlocked; duplicate work beats a failed request
+        try:
+            yield
+        finally:
+            if acquired:
+                await asyncio.to_thread(_unlock, conn, lock_id)
+    finally:
+        await asyncio.to_thread(conn.close)
@@ -0,0 +1,54 @@
+# backend/app/db/migrations.py
+# Brings an existing database up to the current models. create_all adds
+# missing tables but never changes existing ones, so columns and indexes
+# added to tables since the first release are added here. Each step checks
+# the live schema first, so running it again is harmless. Run it once
+# before starting a new version:
+#     python -m app.db.migrations
+from sqlalchemy import inspect, text
+from app.db.database import Base, engine
+from app.db import models  # registers the tables on Base
+
+# (table, column) added to tables that existed before; their indexes and
+# foreign keys come from the models. Missing indexes are created on every
+# table.
+ADDED_COLUMNS = [
+    ("generations", "cache_key"),
+    ("generations", "source_key"),
+    ("contents", "video_id"),
+]
+
+
+def _add_column(conn, table: str, name: str):
+    column = Base.metadata.tables[table].c[name]
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+    for foreign_key in column.foreign_keys:
+        ddl += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+    conn.execute(text(ddl))
+
+
+def upgrade_schema(bind=engine):
+    # Returns the columns and indexes it added
+    Base.metadata.create_all(bind)
+    added = []
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for table, name in ADDED_COLUMNS:
+            if name not in {column["name"] for column in inspector.get_columns(table)}:
+                _add_column(conn, table, name)
+                added.append(f"{table}.{name}")
+
+        # Indexes added to existing tables, the added columns' included
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    added.append(index.name)
+    return added
+
+
+if __name__ == "__main__":
+    added = upgrade_schema()
+    print("Added " + ", ".join(added) if added else "Schema is up to date")
@@ -1,10 +1,12 @@
 # backend/app/db/models.py
-from sqlalchemy import Column, ForeignKey, String, DateTime, Integer, JSON, Boolean, Text
+from sqlalchemy import Column, ForeignKey, String, DateTime, Integer, Float, JSON, Boolean, Text, Index, LargeBinary, UniqueConstraint, DDL, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 from app.db.database import Base
+from app.db.blobs import decompress_payload
+from app.db.search import SEARCH_DDL, SEARCH_DROP_DDL
 
 class User(Base):
     __tablename__ = "users"
@@ -20,6 +22,10 @@ class User(Base):
 
 class Space(Base):
     __tablename__ = "spaces"
+    __table_args__ = (
+        # Keyset pagination of a user's spaces
+        Index("ix_spaces_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
@@ -33,17 +39,65 @@ class Space(Base):
 
 class Content(Base):
     __tablename__ = "contents"
+    __table_args__ = (
+        # Keyset pagination of a space's contents
+        Index("ix_contents_space_created", "space_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=False)
-    type = Column(String, nullable=False)  # "youtube", "document", "audio"
-    data = Column(JSON, nullable=False)
+    type = Column(String, nullable=False)  # "youtube", "document", "audio", "images"
+    data = Column(JSON, nullable=False)  # small fields; transcript and friends live in blob or video
     space_id = Column(String, ForeignKey("spaces.id", ondelete="CASCADE"), nullable=False)
+    video_id = Column(String, ForeignKey("videos.id"), nullable=True, index=True)  # YouTube contents share their video's transcript
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     space = relationship("Space", back_populates="contents")
+    video = relationship("Video", lazy="select")
     generations = relationship("Generation", back_populates="content", cascade="all, delete-orphan")
+    chat_sessions = relationship("ChatSession", back_populates="content", cascade="all, delete-orphan")
+    # Loaded on first access only
+    blob = relationship("ContentBlob", back_populates="content", uselist=False, cascade="all, delete-orphan", lazy="select")
+    
+    @property
+    def payload(self):
+        # Full data: the row's small fields plus the video's transcript or the
+        # decompressed blob. Rows written before blobs existed keep
+        # everything in data.
+        if self.video_id is not None:
+            return {**self.data, **self.video.transcript}
+        if self.blob is None:
+            return self.data
+        return {**self.data, **decompress_payload(self.blob.codec, self.blob.payload)}
+
+class ContentBlob(Base):
+    __tablename__ = "content_blobs"
+    
+    content_id = Column(String, ForeignKey("contents.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String, nullable=False)  # "zstd", "zlib"
+    raw_size = Column(Integer, nullable=False)  # bytes of JSON before compression
+    payload = Column(LargeBinary, nullable=False)
+    
+    content = relationship("Content", back_populates="blob")
+
+class Video(Base):
+    # One row per YouTube video, fetched once and shared by every content
+    # made from it
+    __tablename__ = "videos"
+    
+    id = Column(String, primary_key=True)  # YouTube video id
+    title = Column(String, nullable=False)
+    author = Column(String, nullable=True)
+    thumbnail = Column(String, nullable=True)
+    codec = Column(String, nullable=False)  # "zstd", "zlib"
+    raw_size = Column(Integer, nullable=False)  # bytes of JSON before compression
+    payload = Column(LargeBinary, nullable=False)  # transcript and segments
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+    
+    @property
+    def transcript(self):
+        return decompress_payload(self.codec, self.payload)
 
 class Generation(Base):
     __tablename__ = "generations"
@@ -52,6 +106,81 @@ class Generation(Base):
     type = Column(String, nullable=False)  # "chat", "summary", "flashcard", "mindmap", "quiz"
     data = Column(JSON, nullable=False)
     content_id = Column(String, ForeignKey("contents.id", ondelete="CASCADE"), nullable=False)
+    cache_key = Column(String, nullable=True, index=True)  # hash of transcript, type and prompt/model version
+    source_key = Column(String, nullable=True, index=True)  # hash of transcript and type only, across versions
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    content = relationship("Content", back_populates="generations")
\ No newline at end of file
+    content = relationship("Content", back_populates="generations")
+
+class ChatSession(Base):
+    __tablename__ = "chat_sessions"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    content_id = Column(String, ForeignKey("contents.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    summary = Column(Text, nullable=True)  # rolling summary of compacted messages
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    content = relationship("Content", back_populates="chat_sessions")
+    messages = relationship(
+        "ChatMessage",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="ChatMessage.position"
+    )
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Concurrent turns in one session cannot take the same position
+        UniqueConstraint("session_id", "position", name="uq_chat_messages_session_position"),
+    )
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    session_id = Column(String, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # order within the session
+    role = Column(String, nullable=False)  # "user", "model"
+    content = Column(Text, nullable=False)
+    compacted = Column(Boolean, nullable=False, default=False)  # folded into the session summary
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    session = relationship("ChatSession", back_populates="messages")
+
+class JobState(Base):
+    # A background job's status, so any worker can answer for it, see
+    # app/services/jobs.py
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # "youtube", "youtube-bulk", "media", "document", "images"
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    status = Column(String, nullable=False)  # "queued", "running", "completed", "failed"
+    stage = Column(String, nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)  # refreshed while the job's worker is alive
+    finished_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+class SearchDocument(Base):
+    # One searchable passage of a content or generation, see app/db/search.py
+    __tablename__ = "search_documents"
+    
+    id = Column(Integer, primary_key=True)  # integer so SQLite's FTS5 table can use it as rowid
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    space_id = Column(String, ForeignKey("spaces.id", ondelete="CASCADE"), nullable=False, index=True)
+    content_id = Column(String, ForeignKey("contents.id", ondelete="CASCADE"), nullable=False, index=True)
+    generation_id = Column(String, ForeignKey("generations.id", ondelete="CASCADE"), nullable=True)
+    kind = Column(String, nullable=False)  # "title", "transcript" or the generation type
+    start = Column(Float, nullable=True)  # seconds into the recording, for timed transcripts
+    page = Column(Integer, nullable=True)  # page or image number, for documents
+    text = Column(Text, nullable=False)
+
+for _dialect, _statements in SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(SearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+for _dialect, _statements in SEARCH_DROP_DDL.items():
+    for _statement in _statements:
+        event.listen(SearchDocument.__table__, "before_drop", DDL(_statement).execute_if(dialect=_dialect))
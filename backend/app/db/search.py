@@ -0,0 +1,118 @@
+# backend/app/db/search.py
+# Full-text search index. Contents and their generations are split into
+# short passages when they are written, each stored with its owner so a
+# search only ever reads one user's material. Postgres matches passages
+# through a generated tsvector column with a GIN index, SQLite through an
+# FTS5 table kept in step by triggers; both are created with the table.
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Postgres text search configuration: stemming and stop words
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")
+if not re.match(r"^\w+$", SEARCH_LANGUAGE):
+    raise ValueError(f"Invalid SEARCH_LANGUAGE: {SEARCH_LANGUAGE}")
+# Words per transcript passage; a hit points at where its passage starts
+SEARCH_PASSAGE_WORDS = int(os.getenv("SEARCH_PASSAGE_WORDS", 60))
+
+# Run after search_documents is created, per dialect. user_id and space_id
+# are FTS5 columns too, so SQLite narrows to the owner inside the index.
+SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+        "user_id, space_id, text, content='search_documents', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER IF NOT EXISTS search_documents_insert AFTER INSERT ON search_documents BEGIN "
+        "INSERT INTO search_fts(rowid, user_id, space_id, text) VALUES (new.id, new.user_id, new.space_id, new.text); END",
+        "CREATE TRIGGER IF NOT EXISTS search_documents_delete AFTER DELETE ON search_documents BEGIN "
+        "INSERT INTO search_fts(search_fts, rowid, user_id, space_id, text) "
+        "VALUES ('delete', old.id, old.user_id, old.space_id, old.text); END",
+    ],
+    "postgresql": [
+        "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_LANGUAGE}'::regconfig, text)) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_search_documents_vector ON search_documents USING gin (search_vector)",
+    ],
+}
+
+# Run before search_documents is dropped
+SEARCH_DROP_DDL = {
+    "sqlite": ["DROP TABLE IF EXISTS search_fts"],
+}
+
+
+def _document(kind: str, text: str, start: float = None, page: int = None):
+    # Every row has the same keys, so a list of them inserts as one batch
+    return {"kind": kind, "text": text, "start": start, "page": page}
+
+
+def _passages(text: str):
+    words = (text or "").split()
+    for offset in range(0, len(words), SEARCH_PASSAGE_WORDS):
+        yield " ".join(words[offset:offset + SEARCH_PASSAGE_WORDS])
+
+
+def _timed_passages(segments: list):
+    # Consecutive caption segments joined into passages of about
+    # SEARCH_PASSAGE_WORDS words, each starting where its first segment does
+    parts, start, count = [], None, 0
+    for segment in segments:
+        text = " ".join((segment.get("text") or "").split())
+        if not text:
+            continue
+        if start is None:
+            start = segment.get("start")
+        parts.append(text)
+        count += len(text.split())
+        if count >= SEARCH_PASSAGE_WORDS:
+            yield start, " ".join(parts)
+            parts, start, count = [], None, 0
+    if parts:
+        yield start, " ".join(parts)
+
+
+def content_documents(title: str, data: dict):
+    # The title, then the transcript with segment start times or page
+    # numbers where the source has them; data is the full payload
+    documents = [_document("title", title)]
+    text = data.get("transcript") or ""
+    if data.get("segments"):
+        documents += [_document("transcript", passage, start=start) for start, passage in _timed_passages(data["segments"])]
+    elif data.get("pages"):
+        for page in data["pages"]:
+            documents += [
+                _document("transcript", passage, page=page["page"])
+                for passage in _passages(text[page["start"]:page["end"]])
+            ]
+    else:
+        documents += [_document("transcript", passage) for passage in _passages(text)]
+    return [document for document in documents if document["text"]]
+
+
+def _labels(node: dict):
+    yield str(node.get("label") or "")
+    for child in node.get("children") or []:
+        if isinstance(child, dict):
+            yield from _labels(child)
+
+
+def generation_documents(generation_type: str, data: dict):
+    # Summaries are split like transcripts; each flashcard and quiz question
+    # is a passage of its own. Chat and unknown types are not indexed.
+    texts = []
+    if generation_type == "summary" and isinstance(data.get("summary"), str):
+        texts = list(_passages(data["summary"]))
+    elif generation_type == "flashcard":
+        texts = [
+            f"{card.get('front', '')} {card.get('back', '')}"
+            for card in data.get("flashcards") or [] if isinstance(card, dict)
+        ]
+    elif generation_type == "quiz":
+        texts = [
+            " ".join([str(question.get("question", ""))] + [str(option) for option in question.get("options") or []])
+            for question in data.get("questions") or [] if isinstance(question, dict)
+        ]
+    elif generation_type == "mindmap" and isinstance(data.get("mindmap"), dict):
+        texts = list(_passages(" ".join(_labels(data["mindmap"]))))
+    return [_document(generation_type, text.strip()) for text in texts if text.strip()]
@@ -1,7 +1,15 @@
 # backend/app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import users, spaces, contents, generate
+from app.api.routes import users, spaces, contents, generate, search, metrics
+from app.services.generate.llm import close_llm_client
+from app.auth.security import password_hasher
+from app.db.database import dispose_engines
+from app.services.jobs import job_queue
+from app.services.asr_service import shutdown_asr_pool
+from app.services.pdf_service import shutdown_pdf_pool
+from app.services.ocr_service import shutdown_ocr_pool
+from app.utils.metrics import MetricsMiddleware
 
 app = FastAPI(
     title="VideoSage API",
@@ -16,13 +24,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Response headers the frontend reads besides the CORS-safelisted ones
+    expose_headers=["X-Next-Cursor", "Retry-After", "X-Transcript-Tokens", "X-Transcript-Tokens-Saved"],
 )
 
+# Request latency and per-request DB time, scraped from /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(spaces.router, prefix="/api/spaces", tags=["spaces"])
 app.include_router(contents.router, prefix="/api/contents", tags=["contents"])
 app.include_router(generate.router, prefix="/api/generate", tags=["generate"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_llm_client()
+    job_queue.shutdown()
+    shutdown_asr_pool()
+    shutdown_pdf_pool()
+    shutdown_ocr_pool()
+    password_hasher.shutdown()
+    await dispose_engines()
 
 @app.get("/")
 async def root():
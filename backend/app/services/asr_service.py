@@ -0,0 +1,143 @@
+# backend/app/services/asr_service.py
+# Whisper transcription on a pool of worker processes, each holding a loaded
+# model. Audio is split on silence so one file is transcribed in parallel
+# and segment timestamps are shifted back into place afterwards.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASR_MODEL = os.getenv("ASR_MODEL", "base")
+ASR_DEVICE = os.getenv("ASR_DEVICE", "cpu")
+ASR_WORKERS = int(os.getenv("ASR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Torch threads per worker; workers * threads should not exceed the cores
+ASR_THREADS_PER_WORKER = int(os.getenv("ASR_THREADS_PER_WORKER", 1))
+ASR_MAX_SEGMENT_SECONDS = float(os.getenv("ASR_MAX_SEGMENT_SECONDS", 120))
+ASR_MIN_SEGMENT_SECONDS = float(os.getenv("ASR_MIN_SEGMENT_SECONDS", 20))
+ASR_SILENCE_DB = float(os.getenv("ASR_SILENCE_DB", -40))
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Set in each worker process by _init_worker
+_model = None
+
+
+def _init_worker(model_name: str, device: str, threads: int):
+    global _model
+    import torch
+    import whisper
+
+    torch.set_num_threads(threads)
+    _model = whisper.load_model(model_name, device=device)
+
+
+def _transcribe_segment(audio: np.ndarray, offset: float, language: str = None):
+    result = _model.transcribe(audio, fp16=False, language=language)
+    segments = [
+        {
+            "text": segment["text"].strip(),
+            "start": round(offset + segment["start"], 2),
+            "duration": round(segment["end"] - segment["start"], 2),
+        }
+        for segment in result.get("segments", [])
+        if segment["text"].strip()
+    ]
+    return {"segments": segments, "language": result.get("language")}
+
+
+def get_asr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: torch does not survive fork with threads already running
+            _pool = ProcessPoolExecutor(
+                max_workers=ASR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(ASR_MODEL, ASR_DEVICE, ASR_THREADS_PER_WORKER),
+            )
+        return _pool
+
+
+def shutdown_asr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def split_on_silence(audio: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    # Returns (start, end) sample ranges no longer than ASR_MAX_SEGMENT_SECONDS,
+    # cut in the middle of the longest quiet stretch where possible
+    frame = int(sample_rate * FRAME_SECONDS)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    db = 20 * np.log10(np.maximum(rms, 1e-10))
+    silent = db < ASR_SILENCE_DB
+
+    # Length of the silent run ending at each frame, to prefer long pauses
+    index = np.arange(n_frames)
+    last_loud = np.maximum.accumulate(np.where(silent, -1, index))
+    run = np.where(silent, index - last_loud, 0)
+
+    max_frames = int(ASR_MAX_SEGMENT_SECONDS / FRAME_SECONDS)
+    min_frames = int(ASR_MIN_SEGMENT_SECONDS / FRAME_SECONDS)
+
+    ranges, start = [], 0
+    while n_frames - start > max_frames:
+        window = run[start + min_frames:start + max_frames]
+        if window.any():
+            best_end = start + min_frames + int(np.argmax(window))
+            cut = int(best_end - run[best_end] // 2)
+        else:
+            cut = start + max_frames
+        ranges.append((start * frame, cut * frame))
+        start = cut
+    ranges.append((start * frame, len(audio)))
+
+    # Drop ranges that are silence from end to end
+    return [(s, e) for s, e in ranges if not silent[s // frame:max(s // frame + 1, e // frame)].all()]
+
+
+def transcribe_file(file_path: str, language: str = None, progress=None):
+    # Blocking: call from a job worker. progress(fraction) is called as
+    # segments finish.
+    import whisper
+
+    audio = whisper.load_audio(file_path, sr=SAMPLE_RATE)
+    ranges = split_on_silence(audio)
+    if not ranges:
+        return {"transcript": "", "segments": [], "language": language, "duration": len(audio) / SAMPLE_RATE}
+
+    pool = get_asr_pool()
+    futures = {
+        pool.submit(_transcribe_segment, audio[start:end], start / SAMPLE_RATE, language): i
+        for i, (start, end) in enumerate(ranges)
+    }
+
+    results = [None] * len(ranges)
+    for done, future in enumerate(as_completed(futures), start=1):
+        results[futures[future]] = future.result()
+        if progress:
+            progress(done / len(ranges))
+
+    segments = [segment for result in results for segment in result["segments"]]
+    return {
+        "transcript": " ".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language or next((r["language"] for r in results if r["language"]), None),
+        "duration": len(audio) / SAMPLE_RATE,
+    }
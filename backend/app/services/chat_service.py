@@ -0,0 +1,68 @@
+# backend/app/services/chat_service.py
+# Server-side chat history. Each turn sends the rolling summary plus the
+# recent uncompacted messages; once those pass a token budget the older ones
+# are folded into the summary in the background.
+import asyncio
+import os
+from dotenv import load_dotenv
+from app.db.database import run_in_new_session
+from app.db.crud import get_chat_session, get_chat_messages, compact_chat_messages
+from app.services.generate.chat import summarize_conversation
+from app.services.generate.chunking import estimate_tokens
+from app.services.generate.llm import LLMError
+from app.utils.singleflight import SingleFlight
+
+load_dotenv()
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 1500))
+# Messages always kept verbatim after a compaction
+CHAT_KEEP_RECENT_MESSAGES = max(0, int(os.getenv("CHAT_KEEP_RECENT_MESSAGES", 4)))
+
+_compactions = SingleFlight()
+_background = set()
+
+
+def history_for_prompt(messages):
+    return [{"role": message.role, "content": message.content} for message in messages]
+
+
+def needs_compaction(history):
+    return (
+        len(history) > CHAT_KEEP_RECENT_MESSAGES
+        and sum(estimate_tokens(m["content"]) for m in history) > CHAT_HISTORY_TOKEN_BUDGET
+    )
+
+
+def _load_uncompacted(db, session_id: str):
+    session = get_chat_session(db, session_id=session_id)
+    messages = get_chat_messages(db, session_id=session_id, include_compacted=False)
+    return session, messages
+
+
+async def _compact(session_id: str):
+    # No connection is held during the summary call
+    session, messages = await run_in_new_session(_load_uncompacted, session_id)
+    if not session or not needs_compaction(history_for_prompt(messages)):
+        return
+
+    # Spelled out rather than [:-keep], which is empty when keep is 0
+    older = messages[:len(messages) - CHAT_KEEP_RECENT_MESSAGES]
+    if not older:
+        return
+    summary = await summarize_conversation(session.summary, history_for_prompt(older))
+    await run_in_new_session(compact_chat_messages, session_id=session_id, up_to_position=older[-1].position, summary=summary)
+
+
+async def compact_chat_session(session_id: str):
+    try:
+        await _compactions.do(session_id, lambda: _compact(session_id))
+    except LLMError:
+        # Compaction is an optimization; the next turn retries it
+        pass
+
+
+def schedule_compaction(session_id: str):
+    # Runs after the response so the turn doesn't wait for the summary call
+    task = asyncio.get_running_loop().create_task(compact_chat_session(session_id))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
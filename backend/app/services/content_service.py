@@ -0,0 +1,301 @@
+# backend/app/services/content_service.py
+# Ingestion work that runs on the job queue, off the request path.
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Tuple
+from app.db.database import SessionLocal
+from app.db.crud import create_content, create_contents, get_video, save_video
+from app.db.blobs import split_payload
+from app.services.jobs import Job
+from app.services.youtube_service import (
+    extract_video_id, extract_youtube_info, YOUTUBE_TRANSCRIPT_MAX_AGE_SECONDS, YOUTUBE_BULK_CONCURRENCY
+)
+from app.services.retrieval import build_index
+from app.services.asr_service import transcribe_file
+from app.services.pdf_service import extract_pdf
+from app.services.ocr_service import ocr_files
+from app.services.generate.normalize import prepare_transcript
+from app.utils.metrics import Counter
+
+youtube_transcripts_total = Counter(
+    "youtube_transcripts_total", "YouTube ingestions by where the transcript came from", ("source",)
+)
+
+# Rows per flush when a bulk import is saved
+CONTENT_INSERT_BATCH_SIZE = 100
+
+# video id -> (lock, holders), so concurrent ingestions of one video fetch it once
+_video_locks = {}
+_video_locks_guard = threading.Lock()
+
+
+def content_source(data: dict):
+    # Every ingestion path stores its extracted text as "transcript", with
+    # timed "segments" or page offsets ("pages") where the source has them.
+    # Returns (text, segments) for the generators and the retrieval index.
+    text = data.get("transcript", "")
+    if data.get("segments"):
+        return text, data["segments"]
+    if data.get("pages"):
+        return text, [
+            {"text": text[page["start"]:page["end"]], "page": page["page"]}
+            for page in data["pages"]
+        ]
+    return text, None
+
+
+def llm_source(data: dict):
+    # content_source as sent to the LLM: cleaned and within the token budget.
+    # Returns (text, segments, token stats).
+    return prepare_transcript(*content_source(data))
+
+
+def _index(text: str, segments):
+    # Chat retrieves from the cleaned text, so the index is built from it
+    build_index(*prepare_transcript(text, segments)[:2])
+
+
+def _store_content(title: str, type: str, data: dict, space_id: str, video_id: str = None):
+    db = SessionLocal()
+    try:
+        content = create_content(db, title=title, type=type, data=data, space_id=space_id, video_id=video_id)
+        return {"content_id": content.id, "title": content.title, "type": content.type}
+    finally:
+        db.close()
+
+
+@contextmanager
+def _video_lock(video_id: str):
+    with _video_locks_guard:
+        lock, holders = _video_locks.get(video_id) or (threading.Lock(), 0)
+        _video_locks[video_id] = (lock, holders + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _video_locks_guard:
+            lock, holders = _video_locks[video_id]
+            if holders == 1:
+                del _video_locks[video_id]
+            else:
+                _video_locks[video_id] = (lock, holders - 1)
+
+
+def _is_fresh(video):
+    if YOUTUBE_TRANSCRIPT_MAX_AGE_SECONDS <= 0:
+        return True
+    fetched_at = video.fetched_at
+    # SQLite hands back naive datetimes
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - fetched_at).total_seconds() < YOUTUBE_TRANSCRIPT_MAX_AGE_SECONDS
+
+
+def _video_info(video):
+    return {
+        "video_id": video.id,
+        "url": f"https://www.youtube.com/watch?v={video.id}",
+        "title": video.title,
+        "author": video.author,
+        "thumbnail": video.thumbnail,
+        **video.transcript,
+    }
+
+
+def _youtube_data(video_id: str):
+    # The shared copy of the video while it is fresh. Otherwise it is fetched
+    # and stored for everyone; if a refresh fails, the old copy is used.
+    with _video_lock(video_id):
+        db = SessionLocal()
+        try:
+            video = get_video(db, video_id)
+            if video is not None and _is_fresh(video):
+                youtube_transcripts_total.inc(source="stored")
+                return _video_info(video)
+
+            try:
+                youtube_data = extract_youtube_info(video_id)
+            except Exception:
+                if video is None:
+                    raise
+                youtube_transcripts_total.inc(source="stale")
+                return _video_info(video)
+
+            youtube_transcripts_total.inc(source="fetched" if video is None else "refreshed")
+            _, large = split_payload(youtube_data)
+            save_video(
+                db,
+                video_id=video_id,
+                title=youtube_data["title"],
+                author=youtube_data["author"],
+                thumbnail=youtube_data["thumbnail"],
+                transcript=large
+            )
+            return youtube_data
+        finally:
+            db.close()
+
+
+def ingest_youtube(job: Job, url: str, space_id: str):
+    job.update(stage="fetch", progress=0.1)
+    video_id = extract_video_id(url)
+    youtube_data = _youtube_data(video_id)
+
+    # Build the chat retrieval index now rather than on the first message
+    job.update(stage="index", progress=0.7)
+    _index(youtube_data["transcript"], youtube_data["segments"])
+
+    # The content keeps the small fields and points at the shared transcript
+    job.update(stage="store", progress=0.9)
+    return _store_content(youtube_data["title"], "youtube", youtube_data, space_id, video_id=video_id)
+
+
+def _fetch_bulk_item(url: str):
+    video_id = extract_video_id(url)
+    youtube_data = _youtube_data(video_id)
+    _index(youtube_data["transcript"], youtube_data["segments"])
+    return video_id, youtube_data
+
+
+def ingest_youtube_bulk(job: Job, urls: List[str], space_id: str):
+    # Videos are fetched a few at a time; the ones that worked are saved
+    # together in one transaction, so a failed video only fails its own item
+    items = [{"url": url, "status": "failed"} for url in urls]
+    job.update(stage="fetch", progress=0.05)
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(YOUTUBE_BULK_CONCURRENCY, len(urls)))) as pool:
+        futures = {pool.submit(_fetch_bulk_item, url): index for index, url in enumerate(urls)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                fetched[index] = future.result()
+            except Exception as e:
+                items[index]["error"] = str(e)
+            job.update(progress=0.05 + 0.85 * done / len(urls))
+
+    job.update(stage="store", progress=0.9)
+    contents = []
+    for index in sorted(fetched):
+        video_id, youtube_data = fetched[index]
+        content_id = str(uuid.uuid4())
+        contents.append({
+            "id": content_id,
+            "title": youtube_data["title"],
+            "type": "youtube",
+            "data": youtube_data,
+            "space_id": space_id,
+            "video_id": video_id,
+        })
+        items[index].update(status="created", video_id=video_id, content_id=content_id, title=youtube_data["title"])
+
+    if contents:
+        db = SessionLocal()
+        try:
+            create_contents(db, contents, batch_size=CONTENT_INSERT_BATCH_SIZE)
+        finally:
+            db.close()
+
+    return {
+        "space_id": space_id,
+        "created": len(contents),
+        "failed": len(urls) - len(contents),
+        "items": items,
+    }
+
+
+def ingest_media(job: Job, file_path: str, title: str, space_id: str):
+    # Owns file_path and removes it when done
+    try:
+        job.update(stage="transcribe", progress=0.05)
+        result = transcribe_file(
+            file_path,
+            progress=lambda fraction: job.update(progress=0.05 + 0.75 * fraction)
+        )
+    finally:
+        os.remove(file_path)
+
+    job.update(stage="index", progress=0.85)
+    _index(result["transcript"], result["segments"])
+
+    job.update(stage="store", progress=0.95)
+    data = {
+        "filename": title,
+        "transcript": result["transcript"],
+        "segments": result["segments"],
+        "language": result["language"],
+        "duration": result["duration"],
+    }
+    return _store_content(title, "audio", data, space_id)
+
+
+def ingest_pdf(job: Job, file_path: str, title: str, space_id: str):
+    # Owns file_path and removes it when done
+    try:
+        job.update(stage="extract", progress=0.05)
+        result = extract_pdf(
+            file_path,
+            progress=lambda fraction: job.update(progress=0.05 + 0.75 * fraction)
+        )
+    finally:
+        os.remove(file_path)
+
+    if not result["transcript"]:
+        raise ValueError("No text could be extracted from this PDF")
+
+    data = {
+        "filename": title,
+        "transcript": result["transcript"],
+        "pages": result["pages"],
+        "page_count": result["page_count"],
+    }
+
+    job.update(stage="index", progress=0.85)
+    _index(*content_source(data))
+
+    job.update(stage="store", progress=0.95)
+    return _store_content(title, "document", data, space_id)
+
+
+def ingest_images(job: Job, files: List[Tuple[str, str]], title: str, space_id: str):
+    # files is [(path, original filename)] in upload order; owns the paths
+    try:
+        job.update(stage="ocr", progress=0.05)
+        texts = ocr_files(
+            [path for path, _ in files],
+            progress=lambda fraction: job.update(progress=0.05 + 0.75 * fraction)
+        )
+    finally:
+        for path, _ in files:
+            os.remove(path)
+
+    # One document with each image as a page, laid out like a PDF
+    parts, pages, offset = [], [], 0
+    for number, ((_, filename), text) in enumerate(zip(files, texts), start=1):
+        if not text:
+            continue
+        if parts:
+            offset += 2
+        parts.append(text)
+        pages.append({"page": number, "start": offset, "end": offset + len(text), "filename": filename})
+        offset += len(text)
+
+    if not parts:
+        raise ValueError("No text could be recognized in these images")
+
+    data = {
+        "filename": title,
+        "filenames": [filename for _, filename in files],
+        "transcript": "\n\n".join(parts),
+        "pages": pages,
+        "page_count": len(files),
+    }
+
+    job.update(stage="index", progress=0.85)
+    _index(*content_source(data))
+
+    job.update(stage="store", progress=0.95)
+    return _store_content(title, "images", data, space_id)
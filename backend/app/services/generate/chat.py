@@ -0,0 +1,64 @@
+# backend/app/services/generate/chat.py
+from typing import List, Optional
+from app.services.generate.llm import get_llm_client
+
+CHAT_SYSTEM_PROMPT = """You are a helpful study assistant. Answer the student's questions using the content below, which may be the excerpts most relevant to the question labelled with [start - end] timestamps or [pp.] page ranges. Mention them when pointing the student to a part of the content. If the answer is not in the content, say so and answer from general knowledge, making clear which is which. Keep answers clear and concise.
+
+Content:
+"""
+
+CONVERSATION_SUMMARY_PROMPT = """
+
+Summary of the earlier conversation with this student:
+"""
+
+COMPACT_PROMPT = """Update the running summary of a tutoring conversation about some study material. Fold the new messages into the existing summary. Keep what the student asked, what they understood or struggled with, and any facts, definitions or decisions the answers established. Stay under 200 words and write plain sentences.
+
+Existing summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+
+def _system_prompt(content_text: str, conversation_summary: Optional[str]):
+    system = CHAT_SYSTEM_PROMPT + content_text
+    if conversation_summary:
+        system += CONVERSATION_SUMMARY_PROMPT + conversation_summary
+    return system
+
+
+async def generate_chat_response(
+    content_text: str,
+    message: str,
+    history: Optional[List[dict]] = None,
+    conversation_summary: Optional[str] = None,
+):
+    return await get_llm_client().generate(
+        message,
+        history=history,
+        system=_system_prompt(content_text, conversation_summary),
+        operation="chat",
+    )
+
+
+async def stream_chat_response(
+    content_text: str,
+    message: str,
+    history: Optional[List[dict]] = None,
+    conversation_summary: Optional[str] = None,
+):
+    async for chunk in get_llm_client().stream(
+        message,
+        history=history,
+        system=_system_prompt(content_text, conversation_summary),
+        operation="chat",
+    ):
+        yield chunk
+
+
+async def summarize_conversation(summary: Optional[str], messages: List[dict]):
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = COMPACT_PROMPT.format(summary=summary or "(none)", messages=transcript)
+    return (await get_llm_client().generate(prompt, operation="compact")).strip()
@@ -0,0 +1,124 @@
+# backend/app/services/generate/chunking.py
+import re
+from typing import List, Optional
+
+# Gemini tokens average roughly four characters of English text
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str):
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def format_timestamp(seconds: float):
+    seconds = int(seconds or 0)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_location(chunk: dict):
+    # "[12:00 - 13:30]" for timed media, "[pp. 3-5]" for documents
+    if chunk.get("start") is not None:
+        return f"[{format_timestamp(chunk['start'])} - {format_timestamp(chunk['end'])}]"
+    if chunk.get("page_start") is not None:
+        if chunk["page_start"] == chunk["page_end"]:
+            return f"[p. {chunk['page_start']}]"
+        return f"[pp. {chunk['page_start']}-{chunk['page_end']}]"
+    return ""
+
+
+def _close(current: dict):
+    chunk = {"text": " ".join(current["texts"]), "start": current["start"], "end": current["end"]}
+    if current["page_start"] is not None:
+        chunk["page_start"] = current["page_start"]
+        chunk["page_end"] = current["page_end"]
+    return chunk
+
+
+def _chunk_segments(segments: List[dict], max_tokens: int, max_seconds: float):
+    # Segments are timed captions ({"text", "start", "duration"}) or document
+    # pages ({"text", "page"}); chunks only ever break between them
+    chunks = []
+    current = None
+
+    for segment in segments:
+        text = (segment.get("text") or "").strip()
+        if not text:
+            continue
+        start = segment.get("start")
+        start = None if start is None else float(start)
+        end = None if start is None else start + float(segment.get("duration") or 0)
+        page = segment.get("page")
+
+        # A single page can be longer than a chunk; split it on sentences
+        pieces = [text]
+        if estimate_tokens(text) > max_tokens:
+            pieces = [piece["text"] for piece in _chunk_text(text, max_tokens)]
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece) + 1
+
+            # Close the chunk once it is full or spans too long
+            if current and (
+                current["tokens"] + piece_tokens > max_tokens
+                or (end is not None and current["start"] is not None and end - current["start"] > max_seconds)
+            ):
+                chunks.append(_close(current))
+                current = None
+
+            if current is None:
+                current = {"texts": [], "tokens": 0, "start": start, "end": end, "page_start": page, "page_end": page}
+            current["texts"].append(piece)
+            current["tokens"] += piece_tokens
+            if end is not None:
+                current["end"] = max(current["end"] or end, end)
+            if page is not None:
+                current["page_end"] = page
+
+    if current:
+        chunks.append(_close(current))
+    return chunks
+
+
+def _chunk_text(text: str, max_tokens: int):
+    # No timing information: split on sentence boundaries, and hard-split
+    # anything that has no punctuation at all
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) + 1 > max_chars:
+            chunks.append({"text": " ".join(current), "start": None, "end": None})
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append({"text": " ".join(current), "start": None, "end": None})
+    return chunks
+
+
+def chunk_transcript(
+    raw_text: str,
+    segments: Optional[List[dict]] = None,
+    max_tokens: int = 3000,
+    max_seconds: float = 600,
+):
+    # Returns [{"text", "start", "end"}]; start/end are seconds, or None when
+    # the transcript carries no timing. Page segments add page_start/page_end.
+    if segments:
+        return _chunk_segments(segments, max_tokens, max_seconds)
+    return _chunk_text(raw_text or "", max_tokens)
@@ -0,0 +1,24 @@
+# backend/app/services/generate/flashcard.py
+from typing import List, Optional
+from app.services.generate.llm import get_llm_client, parse_json_response, LLMError
+from app.services.generate.summary import condense_transcript
+
+FLASHCARD_PROMPT = """Create 10-15 study flashcards from the content below. Each flashcard tests one key concept, definition or fact. Respond with only a JSON array, no other text, in this format:
+[{"front": "question or term", "back": "answer or definition"}]
+
+Content:
+"""
+
+
+async def generate_flashcards(raw_text: str, segments: Optional[List[dict]] = None):
+    # Long transcripts are condensed first so the prompt fits the model
+    raw_text = await condense_transcript(raw_text, segments)
+    response = await get_llm_client().generate(FLASHCARD_PROMPT + raw_text, operation="flashcard")
+    cards = parse_json_response(response)
+    if not isinstance(cards, list):
+        raise LLMError("LLM returned flashcards in an unexpected format")
+    return [
+        {"front": str(card.get("front", "")), "back": str(card.get("back", ""))}
+        for card in cards
+        if isinstance(card, dict)
+    ]
@@ -0,0 +1,478 @@
+# backend/app/services/generate/llm.py
+# Shared Gemini client used by every generator. One pooled HTTP client per
+# event loop, a concurrency cap on in-flight calls, a timeout per attempt and
+# a deadline per call. Transient failures are retried with jittered backoff,
+# slow calls are hedged with a duplicate request, and a circuit breaker fails
+# calls fast while the API is down (see resilience.py).
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+import httpx
+from dotenv import load_dotenv
+from app.utils.metrics import Counter, Histogram, span
+from app.services.generate.resilience import (
+    CircuitBreaker, HedgeBudget, LatencyTracker, backoff, is_retryable, retry_after,
+    LLM_DEADLINE_SECONDS, LLM_MAX_RETRIES, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY_SECONDS
+)
+
+load_dotenv()
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+LLM_API_BASE = os.getenv("LLM_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-pro")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 64))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+
+
+llm_request_seconds = Histogram(
+    "llm_request_seconds", "LLM call latency, excluding the wait for a concurrency slot",
+    ("operation", "method", "outcome")
+)
+llm_tokens_total = Counter(
+    "llm_tokens_total", "Tokens reported by the LLM API", ("operation", "kind")
+)
+llm_retries_total = Counter(
+    "llm_retries_total", "LLM attempts retried after a transient failure", ("operation", "method")
+)
+llm_hedges_total = Counter(
+    "llm_hedges_total", "Duplicate LLM requests sent for slow calls, and how many of them won", ("operation", "outcome")
+)
+llm_rejected_total = Counter(
+    "llm_rejected_total", "LLM calls refused by the open circuit breaker", ("operation",)
+)
+llm_deadline_exceeded_total = Counter(
+    "llm_deadline_exceeded_total", "LLM calls that ran out of time, retries included", ("operation",)
+)
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    # The circuit breaker is open. retry_after is the number of seconds until
+    # calls are let through again.
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMClient:
+    def __init__(
+        self,
+        api_key: Optional[str] = GOOGLE_API_KEY,
+        model: str = LLM_MODEL,
+        base_url: str = LLM_API_BASE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        deadline: float = LLM_DEADLINE_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.hedge_percentile = hedge_percentile
+
+        # Shared by sync and async callers: they reach the same API
+        self.breaker = CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self.hedge_budget = HedgeBudget()
+
+        # Async resources are bound to the loop that created them
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+
+        # Sync resources for callers outside an event loop (legacy Flask app)
+        self._sync_lock = threading.Lock()
+        self._sync_client = None
+        self._sync_semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+
+    def _async_resources(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(limits=self._limits(), timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client, self._semaphore
+
+    def _sync_resources(self):
+        with self._sync_lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(limits=self._limits(), timeout=self.timeout)
+        return self._sync_client
+
+    def _url(self, method: str):
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def _payload(self, prompt: str, history: Optional[List[dict]] = None, system: Optional[str] = None):
+        contents = []
+        for message in history or []:
+            role = "model" if message.get("role") in ("model", "assistant", "bot") else "user"
+            text = message.get("content") or message.get("text") or ""
+            if text:
+                contents.append({"role": role, "parts": [{"text": text}]})
+        contents.append({"role": "user", "parts": [{"text": prompt}]})
+
+        payload = {"contents": contents}
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": system}]}
+        return payload
+
+    def _decode(self, raw):
+        # A response body or one streamed chunk. A 200 that is not a JSON
+        # object (a proxy's error page, a cut-off chunk) fails the attempt
+        # like any other bad response.
+        try:
+            body = json.loads(raw)
+        except ValueError as e:
+            raise LLMError(f"LLM returned a malformed response: {e}") from e
+        if not isinstance(body, dict):
+            raise LLMError("LLM returned a malformed response: not a JSON object")
+        return body
+
+    def _parse(self, body: dict):
+        candidates = body.get("candidates") or []
+        if not candidates:
+            reason = (body.get("promptFeedback") or {}).get("blockReason", "no candidates returned")
+            raise LLMError(f"LLM returned no output: {reason}")
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+    @contextmanager
+    def _measure(self, operation: str, method: str):
+        # Records latency, outcome and token usage of one attempt, and its
+        # outcome with the circuit breaker. Callers put the response body (or
+        # the last streamed chunk) in call["body"].
+        call = {"body": None}
+        outcome = "error"
+        start = time.perf_counter()
+        with span(f"llm {operation}", model=self.model, method=method) as current:
+            try:
+                yield call
+                outcome = "ok"
+                self._record()
+            except LLMError as e:
+                if isinstance(e.__cause__, httpx.TimeoutException):
+                    outcome = "timeout"
+                self._record(e)
+                raise
+            except (GeneratorExit, asyncio.CancelledError):
+                outcome = "cancelled"
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                llm_request_seconds.observe(elapsed, operation=operation, method=method, outcome=outcome)
+                if outcome == "ok":
+                    self.latencies.observe((operation, method), elapsed)
+                usage = (call["body"] or {}).get("usageMetadata") or {}
+                prompt_tokens = usage.get("promptTokenCount", 0)
+                response_tokens = usage.get("candidatesTokenCount", 0)
+                llm_tokens_total.inc(prompt_tokens, operation=operation, kind="prompt")
+                llm_tokens_total.inc(response_tokens, operation=operation, kind="response")
+                if current is not None:
+                    current.set_attribute("llm.outcome", outcome)
+                    current.set_attribute("llm.prompt_tokens", prompt_tokens)
+                    current.set_attribute("llm.response_tokens", response_tokens)
+
+    def _check_breaker(self, operation: str):
+        wait = self.breaker.allow(probe_seconds=self.timeout)
+        if wait is not None:
+            llm_rejected_total.inc(operation=operation)
+            raise LLMUnavailableError(f"LLM is unavailable, retry in {wait:.0f}s", retry_after=wait)
+
+    def _record(self, error: Optional[LLMError] = None):
+        # Only transient failures count against the breaker; a rejected
+        # request still shows the API is up
+        if error is not None and is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _retry_delay(self, error: LLMError, attempt: int, deadline_at: float):
+        # Seconds to wait before retrying, or None to give up
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            return None
+        delay = max(backoff(attempt), retry_after(error) or 0)
+        if time.monotonic() + delay >= deadline_at:
+            return None
+        return delay
+
+    def _unavailable(self, error: LLMError):
+        # What to raise instead of error if these failures opened the breaker
+        if self.breaker.state == CircuitBreaker.OPEN:
+            return LLMUnavailableError(f"LLM is unavailable: {error}", retry_after=self.breaker.retry_in())
+        return None
+
+    def _attempt_timeout(self, timeout: Optional[float], deadline_at: float):
+        return max(0.001, min(timeout or self.timeout, deadline_at - time.monotonic()))
+
+    def _hedge_delay(self, operation: str):
+        # Seconds after which a slow call gets a duplicate, or None
+        if self.hedge_percentile <= 0:
+            return None
+        percentile = self.latencies.percentile((operation, "generate"), self.hedge_percentile)
+        if percentile is None:
+            return None
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, percentile)
+
+    async def _post(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, payload: dict, timeout: float, operation: str):
+        # One attempt; returns the response body
+        async with semaphore:
+            with self._measure(operation, "generate") as call:
+                try:
+                    response = await client.post(
+                        self._url("generateContent"),
+                        params={"key": self.api_key},
+                        json=payload,
+                        timeout=timeout,
+                    )
+                    response.raise_for_status()
+                except httpx.TimeoutException as e:
+                    raise LLMError(f"LLM call timed out after {timeout:.1f}s") from e
+                except httpx.HTTPError as e:
+                    raise LLMError(f"LLM call failed: {e}") from e
+                call["body"] = self._decode(response.content)
+        return call["body"]
+
+    async def _hedged(self, attempt, semaphore: asyncio.Semaphore, operation: str, deadline_at: float):
+        # Runs attempt(); if it is still going after the hedge delay, starts
+        # a second one and takes whichever succeeds first. Hedges are skipped
+        # when no concurrency slot is free or the hedge budget is spent, so
+        # they never pile load onto an API that is already slow.
+        self.hedge_budget.record_call()
+        delay = self._hedge_delay(operation)
+        first = asyncio.ensure_future(attempt())
+        if delay is None or time.monotonic() + delay >= deadline_at:
+            return await first
+
+        tasks = {first}
+        hedge = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and not semaphore.locked() and self.breaker.state == CircuitBreaker.CLOSED and self.hedge_budget.try_acquire():
+                llm_hedges_total.inc(operation=operation, outcome="sent")
+                hedge = asyncio.ensure_future(attempt())
+                tasks.add(hedge)
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            llm_hedges_total.inc(operation=operation, outcome="won")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # The slower request is not needed any more
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_body(self, payload: dict, timeout: Optional[float], operation: str, deadline_at: float):
+        client, semaphore = self._async_resources()
+        attempt = 0
+        while True:
+            self._check_breaker(operation)
+            try:
+                return await self._hedged(
+                    lambda: self._post(client, semaphore, payload, self._attempt_timeout(timeout, deadline_at), operation),
+                    semaphore, operation, deadline_at
+                )
+            except LLMError as e:
+                delay = self._retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    unavailable = self._unavailable(e)
+                    if unavailable:
+                        raise unavailable from e
+                    raise
+            llm_retries_total.inc(operation=operation, method="generate")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def generate(
+        self,
+        prompt: str,
+        history: Optional[List[dict]] = None,
+        system: Optional[str] = None,
+        timeout: Optional[float] = None,
+        operation: str = "other",
+        deadline: Optional[float] = None,
+    ):
+        # operation labels the call in metrics, e.g. "summary" or "chat".
+        # timeout bounds each attempt, deadline the whole call.
+        deadline = deadline or self.deadline
+        try:
+            body = await asyncio.wait_for(
+                self._generate_body(self._payload(prompt, history, system), timeout, operation, time.monotonic() + deadline),
+                deadline,
+            )
+        except asyncio.TimeoutError as e:
+            llm_deadline_exceeded_total.inc(operation=operation)
+            raise LLMError(f"LLM call missed its {deadline:g}s deadline") from e
+        return self._parse(body)
+
+    async def _stream_once(self, payload: dict, timeout: float, operation: str):
+        client, semaphore = self._async_resources()
+        async with semaphore:
+            with self._measure(operation, "stream") as call:
+                try:
+                    async with client.stream(
+                        "POST",
+                        self._url("streamGenerateContent"),
+                        params={"key": self.api_key, "alt": "sse"},
+                        json=payload,
+                        timeout=timeout,
+                    ) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            # Usage arrives with the last chunk
+                            call["body"] = self._decode(line[len("data:"):])
+                            text = self._parse(call["body"])
+                            if text:
+                                yield text
+                except httpx.TimeoutException as e:
+                    raise LLMError(f"LLM call timed out after {timeout:.1f}s") from e
+                except httpx.HTTPError as e:
+                    raise LLMError(f"LLM call failed: {e}") from e
+
+    async def stream(
+        self,
+        prompt: str,
+        history: Optional[List[dict]] = None,
+        system: Optional[str] = None,
+        timeout: Optional[float] = None,
+        operation: str = "other",
+        deadline: Optional[float] = None,
+    ):
+        # Yields text chunks as the model produces them. Failures are retried
+        # only until the first chunk is out, and streams are never hedged:
+        # the caller already sees progress.
+        payload = self._payload(prompt, history, system)
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            self._check_breaker(operation)
+            started = False
+            try:
+                async for text in self._stream_once(payload, self._attempt_timeout(timeout, deadline_at), operation):
+                    started = True
+                    yield text
+                return
+            except LLMError as e:
+                delay = None if started else self._retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    unavailable = self._unavailable(e)
+                    if unavailable:
+                        raise unavailable from e
+                    raise
+            llm_retries_total.inc(operation=operation, method="stream")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _post_sync(self, payload: dict, timeout: float, operation: str):
+        client = self._sync_resources()
+        with self._sync_semaphore:
+            with self._measure(operation, "generate_sync") as call:
+                try:
+                    response = client.post(
+                        self._url("generateContent"),
+                        params={"key": self.api_key},
+                        json=payload,
+                        timeout=timeout,
+                    )
+                    response.raise_for_status()
+                except httpx.TimeoutException as e:
+                    raise LLMError(f"LLM call timed out after {timeout:.1f}s") from e
+                except httpx.HTTPError as e:
+                    raise LLMError(f"LLM call failed: {e}") from e
+                call["body"] = self._decode(response.content)
+        return call["body"]
+
+    def generate_sync(
+        self,
+        prompt: str,
+        history: Optional[List[dict]] = None,
+        system: Optional[str] = None,
+        timeout: Optional[float] = None,
+        operation: str = "other",
+        deadline: Optional[float] = None,
+    ):
+        # Retries and the breaker as in generate; no hedging, which would
+        # need a second thread per call
+        payload = self._payload(prompt, history, system)
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            self._check_breaker(operation)
+            try:
+                return self._parse(self._post_sync(payload, self._attempt_timeout(timeout, deadline_at), operation))
+            except LLMError as e:
+                delay = self._retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    unavailable = self._unavailable(e)
+                    if unavailable:
+                        raise unavailable from e
+                    raise
+            llm_retries_total.inc(operation=operation, method="generate_sync")
+            time.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+        with self._sync_lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+
+_llm_client = None
+
+
+def get_llm_client():
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
+
+
+async def close_llm_client():
+    if _llm_client is not None:
+        await _llm_client.aclose()
+
+
+def parse_json_response(text: str):
+    # Models like to wrap JSON in markdown fences
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        raise LLMError(f"LLM returned invalid JSON: {e}") from e
@@ -0,0 +1,27 @@
+# backend/app/services/generate/mindmap.py
+from typing import List, Optional
+from app.services.generate.llm import get_llm_client, parse_json_response, LLMError
+from app.services.generate.summary import condense_transcript
+
+MINDMAP_PROMPT = """Build a mind map of the content below. The root is the main topic, its children are the major themes and their children are supporting ideas. Use at most 3 levels below the root and short labels. Respond with only JSON, no other text, in this format:
+{"label": "main topic", "children": [{"label": "theme", "children": [{"label": "idea", "children": []}]}]}
+
+Content:
+"""
+
+
+def _clean_node(node):
+    return {
+        "label": str(node.get("label", "")),
+        "children": [_clean_node(child) for child in node.get("children") or [] if isinstance(child, dict)],
+    }
+
+
+async def generate_mindmap(raw_text: str, segments: Optional[List[dict]] = None):
+    # Long transcripts are condensed first so the prompt fits the model
+    raw_text = await condense_transcript(raw_text, segments)
+    response = await get_llm_client().generate(MINDMAP_PROMPT + raw_text, operation="mindmap")
+    mindmap = parse_json_response(response)
+    if not isinstance(mindmap, dict):
+        raise LLMError("LLM returned a mindmap in an unexpected format")
+    return _clean_node(mindmap)
@@ -0,0 +1,154 @@
+# backend/app/services/generate/normalize.py
+# Cleans transcripts before they are sent to the LLM. Auto-generated
+# captions repeat the tail of the previous line, and carry filler words and
+# markers such as "[Music]"; all of it costs tokens and latency for nothing.
+# A token budget caps what is left, dropping text evenly across the content.
+import hashlib
+import html
+import os
+import re
+import unicodedata
+from typing import List, Optional
+from dotenv import load_dotenv
+from app.services.generate.chunking import estimate_tokens
+from app.utils.cache import TTLCache
+from app.utils.metrics import Counter
+
+load_dotenv()
+
+TRANSCRIPT_NORMALIZE = os.getenv("TRANSCRIPT_NORMALIZE", "true").lower() == "true"
+TRANSCRIPT_STRIP_FILLERS = os.getenv("TRANSCRIPT_STRIP_FILLERS", "true").lower() == "true"
+# Roughly four hours of speech; 0 disables the budget
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", 48000))
+# Longest caption overlap looked for, in words
+MAX_OVERLAP_WORDS = 30
+
+# Cleaning a long transcript takes tens of milliseconds, and chat sends the
+# same one with every message
+_prepared = TTLCache(
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", 64)),
+    ttl=float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", 3600)),
+)
+
+transcript_tokens_total = Counter(
+    "transcript_tokens_total", "Estimated transcript tokens per LLM-bound request, before and after cleaning",
+    ("operation", "stage")
+)
+
+_NOISE = re.compile(
+    r"\[[^\]]{0,40}\]"                      # [Music], [Applause], [inaudible]
+    r"|\((?:music|applause|laughter|laughs|inaudible|silence|crosstalk)\)"
+    r"|<[^>]{1,20}>"                         # <i>, <font ...> left in captions
+    r"|[♪♫]+"
+    r"|^\s*>>\s*",                           # speaker change marker
+    re.IGNORECASE | re.MULTILINE,
+)
+# With the commas around them: "it's, uh, important" -> "it's important"
+_FILLERS = re.compile(r"(?:,\s*)?\b(?:u+m+|u+h+m*|e+r+m+|h+m+|a+h+)\b(?:\s*,)?", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+(?=[,.!?;:])")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[^\w']+")
+
+
+def normalize_text(text: str):
+    # Unicode and whitespace normalized, for keys derived from a transcript
+    text = unicodedata.normalize("NFC", text or "")
+    return _SPACES.sub(" ", text).strip()
+
+
+def clean_caption(text: str):
+    text = _NOISE.sub(" ", html.unescape(text or ""))
+    if TRANSCRIPT_STRIP_FILLERS:
+        text = _FILLERS.sub(" ", text)
+    return _SPACE_BEFORE_PUNCTUATION.sub("", _SPACES.sub(" ", text)).strip(" ,")
+
+
+def _key(word: str):
+    return _WORD.sub("", word.lower())
+
+
+def _overlap(previous: List[str], current: List[str]):
+    # Words at the start of current that repeat the end of previous. Single
+    # word overlaps only count when they are the whole caption, since one
+    # repeated word is usually just speech.
+    limit = min(len(previous), len(current), MAX_OVERLAP_WORDS)
+    for size in range(limit, 0, -1):
+        if previous[-size:] == current[:size] and (size > 1 or size == len(current)):
+            return size
+    return 0
+
+
+def _dedupe(segments: List[dict]):
+    kept, previous = [], []
+    for segment in segments:
+        words = segment["text"].split()
+        keys = [_key(word) for word in words]
+        skip = _overlap(previous, keys)
+        if skip == len(words):
+            continue
+        kept.append({**segment, "text": " ".join(words[skip:])})
+        previous = keys
+    return kept
+
+
+def _fit_budget(segments: List[dict], budget: int):
+    # Keeps an even share of every part of the content rather than cutting
+    # off the end: a segment is kept while the kept fraction so far stays
+    # under budget / total
+    sizes = [estimate_tokens(segment["text"]) for segment in segments]
+    total = sum(sizes)
+    if budget <= 0 or total <= budget:
+        return segments
+
+    ratio = budget / total
+    kept, seen, kept_tokens = [], 0, 0
+    for segment, size in zip(segments, sizes):
+        seen += size
+        if kept_tokens + size <= ratio * seen:
+            kept.append(segment)
+            kept_tokens += size
+    return kept
+
+
+def prepare_transcript(raw_text: str, segments: Optional[List[dict]] = None, budget: int = TRANSCRIPT_TOKEN_BUDGET):
+    # Returns (text, segments, stats) where stats counts the estimated tokens
+    # before and after. Captions and plain transcripts are cleaned and
+    # deduplicated; document pages only get whitespace cleanup, since their
+    # brackets are usually citations. Segment timings and pages are kept.
+    tokens_before = estimate_tokens(raw_text)
+    if not TRANSCRIPT_NORMALIZE:
+        return raw_text, segments, {"tokens_before": tokens_before, "tokens_after": tokens_before, "tokens_saved": 0}
+
+    # Segments are derived from the same payload as the text
+    key = hashlib.sha256(f"{budget}\0{len(segments or [])}\0{raw_text}".encode("utf-8")).hexdigest()
+    cached = _prepared.get(key)
+    if cached is None:
+        cached = _prepare(raw_text, segments, budget, tokens_before)
+        _prepared.set(key, cached)
+    return cached
+
+
+def _prepare(raw_text: str, segments: Optional[List[dict]], budget: int, tokens_before: int):
+    is_document = bool(segments) and segments[0].get("page") is not None
+    if is_document:
+        pieces = [{**segment, "text": _SPACES.sub(" ", segment.get("text") or "").strip()} for segment in segments]
+    else:
+        # Without timings, sentences stand in for caption lines
+        pieces = segments or [{"text": sentence} for sentence in _SENTENCES.split(raw_text or "")]
+        pieces = _dedupe([
+            {**segment, "text": cleaned}
+            for segment in pieces
+            if (cleaned := clean_caption(segment.get("text")))
+        ])
+
+    pieces = _fit_budget([piece for piece in pieces if piece["text"]], budget)
+    text = " ".join(piece["text"] for piece in pieces)
+    tokens_after = estimate_tokens(text)
+    stats = {"tokens_before": tokens_before, "tokens_after": tokens_after, "tokens_saved": tokens_before - tokens_after}
+    return text, (pieces if segments else None), stats
+
+
+def record_savings(stats: dict, operation: str):
+    transcript_tokens_total.inc(stats["tokens_before"], operation=operation, stage="raw")
+    transcript_tokens_total.inc(stats["tokens_after"], operation=operation, stage="sent")
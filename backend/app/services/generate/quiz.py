@@ -0,0 +1,31 @@
+# backend/app/services/generate/quiz.py
+from typing import List, Optional
+from app.services.generate.llm import get_llm_client, parse_json_response, LLMError
+from app.services.generate.summary import condense_transcript
+
+QUIZ_PROMPT = """Generate 7 multiple-choice questions that test comprehension of the key points of the content below. Mix factual, conceptual and application questions of varying difficulty and cover the whole content. Each question has exactly four options and one correct answer. Respond with only a JSON array, no other text, in this format:
+[{"question": "text", "options": ["A", "B", "C", "D"], "answer": 0}]
+where "answer" is the index of the correct option.
+
+Content:
+"""
+
+
+async def generate_quiz(raw_text: str, segments: Optional[List[dict]] = None):
+    # Long transcripts are condensed first so the prompt fits the model
+    raw_text = await condense_transcript(raw_text, segments)
+    response = await get_llm_client().generate(QUIZ_PROMPT + raw_text, operation="quiz")
+    questions = parse_json_response(response)
+    if not isinstance(questions, list):
+        raise LLMError("LLM returned a quiz in an unexpected format")
+
+    quiz = []
+    for item in questions:
+        if not isinstance(item, dict):
+            continue
+        options = [str(option) for option in item.get("options") or []]
+        answer = item.get("answer")
+        if len(options) < 2 or not isinstance(answer, int) or not 0 <= answer < len(options):
+            continue
+        quiz.append({"question": str(item.get("question", "")), "options": options, "answer": answer})
+    return quiz
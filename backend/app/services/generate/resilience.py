@@ -0,0 +1,180 @@
+# backend/app/services/generate/resilience.py
+# Building blocks LLMClient uses to keep one slow or failing upstream call
+# from setting our tail latency: jittered retry backoff, rolling latency
+# percentiles to decide when to hedge, and a circuit breaker that fails fast
+# while the API is down. Thread safe, since the legacy Flask app calls the
+# LLM from worker threads.
+import os
+import random
+import threading
+import time
+from collections import deque
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Total time for one call, retries and hedges included
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", 90))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 0.5))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", 8))
+# A duplicate request is sent once a call runs longer than this percentile
+# of recent latencies for its operation; 0 disables hedging
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", 1))
+# Hedges may add at most this fraction of extra calls
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", 0.1))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", 30))
+
+LATENCY_WINDOW = 200
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception):
+    # Timeouts, dropped connections, rate limits and server errors are worth
+    # another attempt; bad requests and blocked prompts are not
+    cause = error.__cause__
+    if isinstance(cause, httpx.HTTPStatusError):
+        return cause.response.status_code in RETRYABLE_STATUS
+    return isinstance(cause, httpx.TransportError)
+
+
+def retry_after(error: Exception):
+    # Seconds the API asked us to wait, if it said
+    cause = error.__cause__
+    if isinstance(cause, httpx.HTTPStatusError):
+        try:
+            return float(cause.response.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
+    return None
+
+
+def backoff(attempt: int, base: float = LLM_RETRY_BASE_SECONDS, cap: float = LLM_RETRY_MAX_SECONDS):
+    # Full jitter, so retries from calls that failed together spread out
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LatencyTracker:
+    # Recent successful call latencies per key, for hedge delays
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key, q: float, min_samples: int = LLM_HEDGE_MIN_SAMPLES):
+        # None until there are enough samples to trust
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+class HedgeBudget:
+    # Caps hedged calls at a fraction of all calls
+    def __init__(self, ratio: float = LLM_HEDGE_MAX_RATIO):
+        self.ratio = ratio
+        self.calls = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def try_acquire(self):
+        with self._lock:
+            if self.hedges + 1 > self.ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+
+class CircuitBreaker:
+    # Closed: calls go through. After `failures` retryable failures in a row
+    # it opens and calls are refused for `cooldown` seconds. Then it is half
+    # open: one probe call goes through, and its outcome closes or reopens it.
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        # Set while a half-open probe is out; expires so a probe that was
+        # cancelled does not keep the breaker shut
+        self._probe_until = 0.0
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    def _refresh(self, now: float):
+        if self._state == self.OPEN and now - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._probe_until = 0.0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def allow(self, probe_seconds: float):
+        # Returns None if the call may go ahead, otherwise the seconds until
+        # it is worth trying again
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            if self._state == self.CLOSED:
+                return None
+            if self._state == self.HALF_OPEN and now >= self._probe_until:
+                self._probe_until = now + probe_seconds
+                return None
+            self.rejected += 1
+            if self._state == self.OPEN:
+                return max(0.0, self.cooldown - (now - self._opened_at))
+            return max(0.0, self._probe_until - now)
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive = 0
+
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            self._consecutive += 1
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._consecutive >= self.failures):
+                self._state = self.OPEN
+                self._opened_at = now
+                self.opened += 1
+
+    def retry_in(self):
+        # Seconds until the breaker lets a call through again
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            if self._state == self.OPEN:
+                return max(0.0, self.cooldown - (now - self._opened_at))
+            return 0.0
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                "open": int(state == self.OPEN),
+                "half_open": int(state == self.HALF_OPEN),
+                "consecutive_failures": self._consecutive,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,134 @@
+# backend/app/services/generate/summary.py
+import asyncio
+import hashlib
+import os
+from typing import List, Optional
+from dotenv import load_dotenv
+from app.services.generate.llm import get_llm_client
+from app.services.generate.chunking import chunk_transcript, estimate_tokens, format_location
+from app.utils.cache import TTLCache
+
+load_dotenv()
+
+# Transcripts above this size are summarized chunk by chunk, then reduced
+SUMMARY_SINGLE_PASS_TOKENS = int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", 8000))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+SUMMARY_CHUNK_SECONDS = float(os.getenv("SUMMARY_CHUNK_SECONDS", 600))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 8))
+SUMMARY_REDUCE_FAN_IN = int(os.getenv("SUMMARY_REDUCE_FAN_IN", 8))
+SUMMARY_MAX_REDUCE_ROUNDS = 4
+
+SUMMARY_PROMPT = """You are a summarizer. Create a detailed and concise summary of the provided transcript for display on a website. Capture the key points, main ideas and essential takeaways, well structured and easy to read. Include the following sections, each starting on a new line:
+
+Introduction: Briefly introduce the topic.
+Main Points: Highlight the primary arguments, themes or sections discussed.
+Key Takeaways: Summarize the most important insights and conclusions.
+Supporting Details: Include relevant examples, data or quotes.
+Conclusion: Provide a brief wrap-up.
+
+Aim for approximately 150-300 words depending on the depth of the content. Do not use markdown stars and do not refer to "this transcript"; explain the material directly.
+
+Transcript:
+"""
+
+CHUNK_PROMPT = """Summarize this section of a longer lecture transcript as dense notes. Keep every key concept, definition, example, figure and conclusion; drop filler and repetition. Write plain sentences, no headings.
+
+Section:
+"""
+
+REDUCE_PROMPT = """Merge these consecutive section notes from one lecture into a single set of dense notes. Keep every key concept, definition, example and conclusion and keep the original order; remove overlap. Keep the time or page ranges in brackets where they help. Write plain sentences, no headings.
+
+Notes:
+"""
+
+# Everything besides a generator's own prompt that shapes the text
+# condense_transcript gives it, for generation cache keys
+CONDENSE_VERSION = hashlib.sha256("\0".join([
+    CHUNK_PROMPT,
+    REDUCE_PROMPT,
+    str(SUMMARY_SINGLE_PASS_TOKENS),
+    str(SUMMARY_CHUNK_TOKENS),
+    str(SUMMARY_CHUNK_SECONDS),
+    str(SUMMARY_REDUCE_FAN_IN),
+    str(SUMMARY_MAX_REDUCE_ROUNDS),
+]).encode("utf-8")).hexdigest()[:16]
+
+# Partial summaries keyed by prompt, model and chunk text, so a re-run after
+# an eviction, a prompt change of the final pass or a failed chunk only pays
+# for the chunks it has not seen
+chunk_summary_cache = TTLCache(
+    max_entries=int(os.getenv("SUMMARY_CHUNK_CACHE_MAX_ENTRIES", 8192)),
+    ttl=float(os.getenv("SUMMARY_CHUNK_CACHE_TTL_SECONDS", 86400)),
+)
+
+
+def _label(chunk: dict):
+    location = format_location(chunk)
+    return f"{location} " if location else ""
+
+
+async def _summarize_piece(prompt: str, text: str, semaphore: asyncio.Semaphore):
+    client = get_llm_client()
+    key = hashlib.sha256(f"{client.model}\0{prompt}\0{text}".encode("utf-8")).hexdigest()
+    cached = chunk_summary_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async with semaphore:
+        result = (await client.generate(prompt + text, operation="condense")).strip()
+    chunk_summary_cache.set(key, result)
+    return result
+
+
+def _group(parts: List[str]):
+    # Consecutive groups of at most SUMMARY_REDUCE_FAN_IN notes that fit a chunk
+    groups, current, tokens = [], [], 0
+    for part in parts:
+        part_tokens = estimate_tokens(part)
+        if current and (len(current) >= SUMMARY_REDUCE_FAN_IN or tokens + part_tokens > SUMMARY_CHUNK_TOKENS):
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(part)
+        tokens += part_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def condense_transcript(raw_text: str, segments: Optional[List[dict]] = None):
+    # Returns text that fits one prompt: the transcript itself when it is
+    # short enough, otherwise map-reduced notes. Latency grows with
+    # chunks / SUMMARY_MAP_CONCURRENCY per round, not with transcript length.
+    if estimate_tokens(raw_text) <= SUMMARY_SINGLE_PASS_TOKENS:
+        return raw_text
+
+    semaphore = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+    chunks = chunk_transcript(raw_text, segments, SUMMARY_CHUNK_TOKENS, SUMMARY_CHUNK_SECONDS)
+
+    # Map: every chunk concurrently, bounded by the semaphore
+    summaries = await asyncio.gather(*[
+        _summarize_piece(CHUNK_PROMPT, chunk["text"], semaphore) for chunk in chunks
+    ])
+    parts = [_label(chunk) + summary for chunk, summary in zip(chunks, summaries)]
+
+    # Reduce: merge neighbouring notes level by level until they fit
+    for _ in range(SUMMARY_MAX_REDUCE_ROUNDS):
+        if estimate_tokens("\n".join(parts)) <= SUMMARY_SINGLE_PASS_TOKENS or len(parts) == 1:
+            break
+        groups = _group(parts)
+        parts = await asyncio.gather(*[
+            _summarize_piece(REDUCE_PROMPT, "\n".join(group), semaphore) for group in groups
+        ])
+
+    return "\n".join(parts)
+
+
+async def generate_summary(raw_text: str, segments: Optional[List[dict]] = None):
+    text = await condense_transcript(raw_text, segments)
+    return await get_llm_client().generate(SUMMARY_PROMPT + text, operation="summary")
+
+
+async def stream_summary(raw_text: str, segments: Optional[List[dict]] = None):
+    text = await condense_transcript(raw_text, segments)
+    async for chunk in get_llm_client().stream(SUMMARY_PROMPT + text, operation="summary"):
+        yield chunk
@@ -0,0 +1,427 @@
+# backend/app/services/generation_service.py
+# Content-addressed reuse of generations. Two contents with the same
+# transcript share one LLM call per generation type and prompt/model version.
+# While the LLM circuit breaker is open, the last good generation for the
+# transcript from any version is served, marked stale, instead of an error.
+import asyncio
+import hashlib
+import os
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from app.db.crud import (
+    create_generation, create_generations, get_generations_by_content, get_generation_by_cache_key,
+    get_latest_generation_by_source_key
+)
+from app.db.locks import advisory_lock
+from app.db.database import run_db, release_db, run_in_new_session
+from app.services.generate.llm import get_llm_client, LLMError, LLMUnavailableError
+from app.services.generate.resilience import LLM_DEADLINE_SECONDS
+from app.services.generate.summary import generate_summary, stream_summary, SUMMARY_PROMPT, CONDENSE_VERSION
+from app.services.generate.flashcard import generate_flashcards, FLASHCARD_PROMPT
+from app.services.generate.mindmap import generate_mindmap, MINDMAP_PROMPT
+from app.services.generate.quiz import generate_quiz, QUIZ_PROMPT
+from app.services.generate.normalize import normalize_text
+from app.utils.cache import TTLCache
+from app.utils.singleflight import SingleFlight
+
+load_dotenv()
+
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", 2048))
+GENERATION_CACHE_TTL_SECONDS = float(os.getenv("GENERATION_CACHE_TTL_SECONDS", 86400))
+# How long a worker waits for another worker's generation of the same
+# content and type before making its own; long summaries take a few calls
+GENERATION_LOCK_TIMEOUT_SECONDS = float(os.getenv("GENERATION_LOCK_TIMEOUT_SECONDS", 2 * LLM_DEADLINE_SECONDS))
+
+# generation type -> (key in Generation.data, generator, prompt the output depends on)
+GENERATORS = {
+    "summary": ("summary", generate_summary, SUMMARY_PROMPT),
+    "flashcard": ("flashcards", generate_flashcards, FLASHCARD_PROMPT),
+    "mindmap": ("mindmap", generate_mindmap, MINDMAP_PROMPT),
+    "quiz": ("questions", generate_quiz, QUIZ_PROMPT),
+}
+
+generation_cache = TTLCache(
+    max_entries=GENERATION_CACHE_MAX_ENTRIES,
+    ttl=GENERATION_CACHE_TTL_SECONDS,
+)
+
+# One generation per (content, type) at a time within this process
+generation_flights = SingleFlight()
+
+_counters = {"db_hits": 0, "llm_calls": 0, "coalesced": 0, "stale_served": 0}
+
+
+def generation_cache_key(source_text: str, generation_type: str):
+    # Long transcripts reach every generator through condense_transcript, so
+    # its prompts and chunk settings are part of the version
+    _, _, prompt = GENERATORS[generation_type]
+    prompt_version = hashlib.sha256(f"{prompt}\0{CONDENSE_VERSION}".encode("utf-8")).hexdigest()[:16]
+
+    digest = hashlib.sha256()
+    for part in (generation_type, prompt_version, get_llm_client().model, normalize_text(source_text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def generation_source_key(source_text: str, generation_type: str):
+    # Same transcript and type under any prompt or model version
+    digest = hashlib.sha256()
+    for part in (generation_type, normalize_text(source_text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _serialize(generation, stale: bool = False):
+    return {
+        "id": generation.id,
+        "type": generation.type,
+        "data": generation.data,
+        "stale": stale
+    }
+
+
+def get_existing_generation(db: Session, content_id: str, generation_type: str):
+    # This content's own generation; needs neither the transcript nor the LLM
+    existing = get_generations_by_content(db, content_id=content_id, generation_type=generation_type)
+    return _serialize(existing[0]) if existing else None
+
+
+async def get_or_create_generation(
+    db: Session,
+    content_id: str,
+    generation_type: str,
+    source_text: str,
+    segments: Optional[List[dict]] = None,
+    charge=None
+):
+    # charge, if given, is awaited just before the LLM is called; a request
+    # that joins another's flight or finds a stored result never calls it
+    existing = await run_db(db, get_existing_generation, content_id, generation_type)
+    if existing:
+        return existing
+
+    flight_key = (content_id, generation_type)
+    if generation_flights.is_running(flight_key):
+        _counters["coalesced"] += 1
+    return await generation_flights.do(
+        flight_key,
+        lambda: _create_generation(db, content_id, generation_type, source_text, segments, charge)
+    )
+
+
+def _cached_data(db: Session, generation_type: str, source_text: str):
+    # Output of an earlier generation from the same transcript, memory first
+    # then DB, or None
+    key = generation_cache_key(source_text, generation_type)
+    data = generation_cache.get(key)
+    if data is None:
+        cached = get_generation_by_cache_key(db, cache_key=key)
+        if cached:
+            _counters["db_hits"] += 1
+            data = cached.data
+            generation_cache.set(key, data)
+    return data
+
+
+def find_generation(db: Session, content_id: str, generation_type: str, source_text: str):
+    # This content's own generation, or a copy of one made from the same
+    # transcript. None means the LLM has to run.
+    existing = get_existing_generation(db, content_id, generation_type)
+    if existing:
+        return existing
+
+    data = _cached_data(db, generation_type, source_text)
+    if data is None:
+        return None
+    return store_generation(db, content_id, generation_type, source_text, data)
+
+
+def store_generation(db: Session, content_id: str, generation_type: str, source_text: str, data: dict):
+    key = generation_cache_key(source_text, generation_type)
+    generation_cache.set(key, data)
+    generation = create_generation(
+        db,
+        type=generation_type,
+        data=data,
+        content_id=content_id,
+        cache_key=key,
+        source_key=generation_source_key(source_text, generation_type)
+    )
+    return _serialize(generation)
+
+
+def find_stale_generation(db: Session, generation_type: str, source_text: str):
+    # Newest generation from this transcript under any prompt/model version,
+    # for when the LLM is unavailable. It is returned, not stored, so the
+    # content gets a fresh one once the LLM is back.
+    generation = get_latest_generation_by_source_key(db, source_key=generation_source_key(source_text, generation_type))
+    if generation is None:
+        return None
+    _counters["stale_served"] += 1
+    return _serialize(generation, stale=True)
+
+
+def generation_lock_key(content_id: str, generation_type: str):
+    return f"generation:{content_id}:{generation_type}"
+
+
+def generation_lock(content_id: str, generation_type: str, on_wait=None):
+    # One generation per (content, type) at a time across workers. It is
+    # held through the LLM call; whoever waited for it then finds the stored
+    # row instead of generating again.
+    return advisory_lock(
+        generation_lock_key(content_id, generation_type),
+        timeout=GENERATION_LOCK_TIMEOUT_SECONDS,
+        on_wait=on_wait
+    )
+
+
+def store_generation_once(db: Session, content_id: str, generation_type: str, source_text: str, data: dict):
+    # Keeps the content's generation if another request stored one first,
+    # e.g. after a lock wait timed out. Call under generation_lock.
+    existing = get_existing_generation(db, content_id, generation_type)
+    if existing:
+        return existing
+    return store_generation(db, content_id, generation_type, source_text, data)
+
+
+async def _generate_data(generation_type: str, source_text: str, segments: Optional[List[dict]], charge=None):
+    data_key, generate, _ = GENERATORS[generation_type]
+    if charge is not None:
+        await charge()
+    _counters["llm_calls"] += 1
+    return {data_key: await generate(source_text, segments)}
+
+
+async def _create_generation(
+    db: Session,
+    content_id: str,
+    generation_type: str,
+    source_text: str,
+    segments: Optional[List[dict]] = None,
+    charge=None
+):
+    async with generation_lock(content_id, generation_type):
+        found = await run_db(db, find_generation, content_id, generation_type, source_text)
+        if found:
+            return found
+
+        # The lock has a connection of its own; the request's goes back to
+        # the pool for the LLM call
+        await release_db(db)
+        try:
+            data = await _generate_data(generation_type, source_text, segments, charge)
+        except LLMUnavailableError:
+            stale = await run_db(db, find_stale_generation, generation_type, source_text)
+            if stale is None:
+                raise
+            return stale
+        return await run_db(db, store_generation_once, content_id, generation_type, source_text, data)
+
+
+async def _stream_new_summary(content_id: str, source_text: str, segments: Optional[List[dict]], on_chunk, charge=None):
+    # The request's session may be closed by the time this stores, so it
+    # uses sessions of its own
+    async with generation_lock(content_id, "summary"):
+        found = await run_in_new_session(find_generation, content_id, "summary", source_text)
+        if found:
+            return found
+
+        if charge is not None:
+            await charge()
+        parts = []
+        _counters["llm_calls"] += 1
+        async for chunk in stream_summary(source_text, segments):
+            parts.append(chunk)
+            on_chunk(chunk)
+        return await run_in_new_session(
+            store_generation_once, content_id, "summary", source_text, {"summary": "".join(parts)}
+        )
+
+
+async def stream_or_join_summary(
+    content_id: str,
+    source_text: str,
+    segments: Optional[List[dict]],
+    on_chunk,
+    charge=None
+):
+    # Streams a new summary through on_chunk and stores it. If one is
+    # already being made for this content, streamed or not, joins it
+    # instead: on_chunk is never called and its generation is returned.
+    flight_key = (content_id, "summary")
+    if generation_flights.is_running(flight_key):
+        _counters["coalesced"] += 1
+    return await generation_flights.do(
+        flight_key,
+        lambda: _stream_new_summary(content_id, source_text, segments, on_chunk, charge)
+    )
+
+
+def get_existing_generations(db: Session, content_id: str, generation_types: List[str]):
+    # {type: generation} for the types this content already has, in one query
+    found = {}
+    for generation in get_generations_by_content(db, content_id=content_id):
+        if generation.type in generation_types and generation.type not in found:
+            found[generation.type] = _serialize(generation)
+    return found
+
+
+def _find_own_or_cached(db: Session, content_id: str, generation_type: str, source_text: str):
+    # (generation, None) if the content has one, else (None, cached output
+    # or None); unlike find_generation, nothing is stored
+    existing = get_existing_generation(db, content_id, generation_type)
+    if existing:
+        return existing, None
+    return None, _cached_data(db, generation_type, source_text)
+
+
+def _store_generations(db: Session, content_id: str, source_text: str, outputs: dict):
+    # outputs is {type: data}. Types another request stored in the meantime
+    # keep that row; the rest are saved together in one transaction.
+    existing = get_existing_generations(db, content_id, list(outputs))
+    rows = []
+    for generation_type, data in outputs.items():
+        if generation_type in existing:
+            continue
+        key = generation_cache_key(source_text, generation_type)
+        generation_cache.set(key, data)
+        rows.append({
+            "type": generation_type,
+            "data": data,
+            "content_id": content_id,
+            "cache_key": key,
+            "source_key": generation_source_key(source_text, generation_type)
+        })
+    created = {generation.type: _serialize(generation) for generation in create_generations(db, rows)} if rows else {}
+    return {**existing, **created}
+
+
+async def _find_or_generate(content_id: str, generation_type: str, source_text: str, segments: Optional[List[dict]], charge=None):
+    # The check of _create_generation, then the LLM. Returns (generation,
+    # None) when one is found, else (None, data) to store. Runs inside a
+    # flight, next to the batch's other types, so it needs a session of its
+    # own. Call under generation_lock.
+    generation, data = await run_in_new_session(_find_own_or_cached, content_id, generation_type, source_text)
+    if generation is not None or data is not None:
+        return generation, data
+    try:
+        return None, await _generate_data(generation_type, source_text, segments, charge)
+    except LLMUnavailableError:
+        stale = await run_in_new_session(find_stale_generation, generation_type, source_text)
+        if stale is None:
+            raise
+        return stale, None
+
+
+async def get_or_create_generations(
+    db: Session,
+    content_id: str,
+    generation_types: List[str],
+    source_text: str,
+    segments: Optional[List[dict]] = None,
+    existing: Optional[dict] = None,
+    charge=None
+):
+    # Several generation types for one content at once. Types the content
+    # already has (existing, if the caller looked them up) are reused. Each
+    # missing type runs as the same (content, type) flight, under the same
+    # lock, as a single generation request would, so the two join each
+    # other instead of duplicating work. The outputs the batch makes are
+    # saved together in one transaction, with each type's lock held until
+    # then. Returns ({type: generation}, {type: error}) so one failed
+    # generator does not discard the others; while the LLM is unavailable,
+    # stale generations stand in where there are any. charge is awaited
+    # before each LLM call, as for get_or_create_generation.
+    found = dict(existing if existing is not None else await run_db(db, get_existing_generations, content_id, generation_types))
+    missing = [generation_type for generation_type in generation_types if generation_type not in found]
+    if not missing:
+        return found, {}
+
+    # Don't hold a pooled connection through the LLM calls
+    await release_db(db)
+
+    # State of each type this batch leads: "locking" until its lock is taken
+    # ("running") or found held by another worker ("waiting"), then "done"
+    # once its output is known. The batch is stored once nothing is locking
+    # or running. Waiting types are not waited for, so a batch never holds
+    # its locks while it waits on another worker's; a type that gets its
+    # lock after the batch was stored saves its own row.
+    states = {}
+    outputs = {}
+    batch = {"closed": False}
+    changed = asyncio.Event()
+    stored = asyncio.get_running_loop().create_future()
+
+    def set_state(generation_type: str, state: str):
+        states[generation_type] = state
+        changed.set()
+
+    async def lead(generation_type: str):
+        async with generation_lock(content_id, generation_type, on_wait=lambda: set_state(generation_type, "waiting")):
+            set_state(generation_type, "running")
+            try:
+                generation, data = await _find_or_generate(content_id, generation_type, source_text, segments, charge)
+            finally:
+                set_state(generation_type, "done")
+            if generation is not None:
+                return generation
+            if batch["closed"]:
+                return await run_in_new_session(store_generation_once, content_id, generation_type, source_text, data)
+            outputs[generation_type] = data
+            return (await asyncio.shield(stored))[generation_type]
+
+    flights = {}
+    for generation_type in missing:
+        flights[generation_type], leads = generation_flights.start(
+            (content_id, generation_type),
+            lambda generation_type=generation_type: lead(generation_type)
+        )
+        if leads:
+            states[generation_type] = "locking"
+            # Also if it failed before taking its lock
+            flights[generation_type].add_done_callback(
+                lambda _, generation_type=generation_type: set_state(generation_type, "done")
+            )
+        else:
+            _counters["coalesced"] += 1
+
+    wake = None
+    try:
+        while any(state in ("locking", "running") for state in states.values()):
+            changed.clear()
+            wake = asyncio.ensure_future(changed.wait())
+            await wake
+
+        batch["closed"] = True
+        try:
+            stored.set_result(await run_db(db, _store_generations, content_id, source_text, outputs) if outputs else {})
+        except Exception as e:
+            # Everyone waiting on these flights gets the error
+            stored.set_exception(e)
+        results = await asyncio.gather(*flights.values(), return_exceptions=True)
+    finally:
+        # If this request goes away, its flights end with it
+        if wake is not None:
+            wake.cancel()
+        if not stored.done():
+            stored.cancel()
+        for flight in flights.values():
+            flight.cancel()
+
+    errors = {}
+    for generation_type, result in zip(flights, results):
+        if isinstance(result, LLMError):
+            errors[generation_type] = result
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            found[generation_type] = result
+    return found, errors
+
+
+def generation_cache_stats():
+    return {**generation_cache.stats(), **_counters}
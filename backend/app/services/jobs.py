@@ -0,0 +1,331 @@
+# backend/app/services/jobs.py
+# Local background job queue. Long-running ingestion work is handed to a
+# bounded pool of worker threads so HTTP requests return immediately with a
+# job id that clients poll for status and progress. Jobs run in the worker
+# process that accepted them, but with the "database" state backend their
+# state is kept in the jobs table, so any worker can answer a poll. A job
+# whose worker stopped (a restart, a crash) is then reported as failed once
+# its heartbeat goes quiet, rather than disappearing; it has to be submitted
+# again.
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from app.utils.metrics import Histogram, span
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 200))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 3600))
+# "database" shares job state between workers; "memory" keeps it in this
+# process, for the legacy Flask app, which runs without a database
+JOB_STATE_BACKEND = os.getenv("JOB_STATE_BACKEND", "database" if os.getenv("DATABASE_URL") else "memory")
+# Progress is written at most this often; status and stage changes always
+JOB_SAVE_INTERVAL_SECONDS = float(os.getenv("JOB_SAVE_INTERVAL_SECONDS", 1))
+# Unfinished jobs are marked alive this often, and count as lost when their
+# mark is older than JOB_LOST_AFTER_SECONDS
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 15))
+JOB_LOST_AFTER_SECONDS = float(os.getenv("JOB_LOST_AFTER_SECONDS", 4 * JOB_HEARTBEAT_SECONDS))
+
+
+job_stage_seconds = Histogram(
+    "job_stage_seconds", "Duration of each stage of a background job, e.g. fetch, transcribe, store",
+    ("kind", "stage")
+)
+job_queue_wait_seconds = Histogram(
+    "job_queue_wait_seconds", "Time a job waited for a worker", ("kind",)
+)
+job_seconds = Histogram(
+    "job_seconds", "Job run time from start to finish", ("kind", "status")
+)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _timestamp(value: datetime):
+    # SQLite hands back naive datetimes, stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class Job:
+    def __init__(self, kind: str, user_id: str = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.user_id = user_id
+        self.status = "queued"  # "queued", "running", "completed", "failed"
+        self.stage = None
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._stage_started = None
+        # Set by the queue; called with (job, force) when the job changes
+        self._on_change = None
+        self._saved_at = 0.0
+        self._save_lock = threading.Lock()
+
+    @classmethod
+    def from_record(cls, record):
+        # A job run by another worker, as last saved
+        job = cls(record.kind, user_id=record.user_id)
+        job.id = record.id
+        job.status = record.status
+        job.stage = record.stage
+        job.progress = record.progress
+        job.result = record.result
+        job.error = record.error
+        job.created_at = _timestamp(record.created_at)
+        job.finished_at = _timestamp(record.finished_at) if record.finished_at else None
+        if job.status in ("queued", "running") and time.time() - _timestamp(record.updated_at) > JOB_LOST_AFTER_SECONDS:
+            job.status = "failed"
+            job.error = "The server stopped before the job finished; please submit it again"
+        return job
+
+    def to_record(self):
+        now = datetime.now(timezone.utc)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "user_id": self.user_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": datetime.fromtimestamp(self.created_at, timezone.utc),
+            "updated_at": now,
+            "finished_at": datetime.fromtimestamp(self.finished_at, timezone.utc) if self.finished_at else None,
+        }
+
+    def _end_stage(self):
+        if self.stage is not None and self._stage_started is not None:
+            job_stage_seconds.observe(time.perf_counter() - self._stage_started, kind=self.kind, stage=self.stage)
+
+    def update(self, stage: str = None, progress: float = None):
+        new_stage = stage is not None and stage != self.stage
+        if new_stage:
+            self._end_stage()
+            self.stage = stage
+            self._stage_started = time.perf_counter()
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        if self._on_change is not None:
+            self._on_change(self, force=new_stage)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class MemoryJobState:
+    # Nothing leaves the process; a job is known only to its own worker
+    def save(self, record: dict):
+        pass
+
+    def touch(self, job_ids: list, now: datetime):
+        pass
+
+    def delete_finished(self, before: datetime):
+        pass
+
+
+class DatabaseJobState:
+    # The jobs table. Writes are only advisory for other workers: if one
+    # fails the job still runs, and its own worker still answers for it.
+    def __init__(self):
+        from app.db.database import SessionLocal
+        from app.db import crud
+
+        self._sessions = SessionLocal
+        self._crud = crud
+
+    def _run(self, fn, *args):
+        db = self._sessions()
+        try:
+            fn(db, *args)
+        except SQLAlchemyError:
+            db.rollback()
+        finally:
+            db.close()
+
+    def save(self, record: dict):
+        self._run(self._crud.save_job_state, record)
+
+    def touch(self, job_ids: list, now: datetime):
+        self._run(self._crud.touch_job_states, job_ids, now)
+
+    def delete_finished(self, before: datetime):
+        self._run(self._crud.delete_job_states, before)
+
+
+JOB_STATE_BACKENDS = {"memory": MemoryJobState, "database": DatabaseJobState}
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE, backend: str = JOB_STATE_BACKEND):
+        self.workers = workers
+        self.backend = backend
+        self.state = None
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopped = threading.Event()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            if self.state is None:
+                self.state = JOB_STATE_BACKENDS[self.backend]()
+            self._stopped.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _save(self, job: Job, force: bool = True):
+        with job._save_lock:
+            now = time.monotonic()
+            if not force and now - job._saved_at < JOB_SAVE_INTERVAL_SECONDS:
+                return
+            job._saved_at = now
+            self.state.save(job.to_record())
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, fn, args, kwargs = item
+            job.status = "running"
+            self._save(job)
+            job_queue_wait_seconds.observe(time.time() - job.created_at, kind=job.kind)
+            started = time.perf_counter()
+            try:
+                with span(f"job {job.kind}", job_id=job.id):
+                    job.result = fn(job, *args, **kwargs)
+                job.progress = 1.0
+                job.status = "completed"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job._end_stage()
+                job_seconds.observe(time.perf_counter() - started, kind=job.kind, status=job.status)
+                job.finished_at = time.time()
+                self._save(job)
+                self._queue.task_done()
+
+    def _heartbeat(self):
+        # Tells other workers this one's unfinished jobs are still alive, and
+        # drops finished jobs past their retention
+        while not self._stopped.wait(JOB_HEARTBEAT_SECONDS):
+            self._prune()
+            with self._lock:
+                unfinished = [job.id for job in self._jobs.values() if not job.finished_at]
+            if unfinished:
+                self.state.touch(unfinished, datetime.now(timezone.utc))
+            self.state.delete_finished(datetime.fromtimestamp(time.time() - JOB_RETENTION_SECONDS, timezone.utc))
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def submit(self, kind: str, fn, *args, user_id: str = None, **kwargs):
+        # fn is called as fn(job, *args, **kwargs) on a worker thread and its
+        # return value becomes job.result. Writes the job's state, so call it
+        # off the event loop.
+        self._start()
+        self._prune()
+
+        job = Job(kind, user_id=user_id)
+        job._on_change = self._save
+        with self._lock:
+            self._jobs[job.id] = job
+        # Held until the queued state is written, so a worker that picks the
+        # job up straight away cannot have its state overwritten
+        with job._save_lock:
+            try:
+                self._queue.put_nowait((job, fn, args, kwargs))
+            except queue.Full:
+                with self._lock:
+                    del self._jobs[job.id]
+                raise QueueFullError("Too many jobs queued, try again later")
+            job._saved_at = time.monotonic()
+            self.state.save(job.to_record())
+        return job
+
+    def get(self, job_id: str):
+        # Jobs of this worker only; see load_job for the others
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "completed": statuses.count("completed"),
+            "failed": statuses.count("failed"),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stopped.set()
+        # Jobs that never started are lost with this process; say so now
+        # rather than when their heartbeat runs out
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                job = item[0]
+                job.status = "failed"
+                job.error = "The server stopped before the job started; please submit it again"
+                job.finished_at = time.time()
+                self._save(job)
+        # Workers are daemon threads; running jobs die with the process
+        for _ in threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+
+
+def load_job(db: Session, job_id: str):
+    # A job from any worker, as last saved, or None
+    from app.db.crud import get_job_state
+
+    record = get_job_state(db, job_id)
+    return Job.from_record(record) if record is not None else None
+
+
+job_queue = JobQueue()
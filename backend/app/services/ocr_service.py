@@ -0,0 +1,130 @@
+# backend/app/services/ocr_service.py
+# Tesseract OCR with OpenCV preprocessing. Batches of images are recognized
+# on a pool of worker processes so uploads of whiteboard photos do not tie
+# up the API or job threads.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+import cv2
+import numpy as np
+import pytesseract
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TESSERACT_CMD = os.getenv("TESSERACT_CMD")
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+OCR_MAX_BATCH_IMAGES = int(os.getenv("OCR_MAX_BATCH_IMAGES", 50))
+# Phone photos are far larger than Tesseract needs; the long side is capped
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", 2000))
+OCR_DESKEW = os.getenv("OCR_DESKEW", "true").lower() == "true"
+# Larger angles are more likely a diagonal layout than a skewed photo
+OCR_MAX_SKEW_DEGREES = float(os.getenv("OCR_MAX_SKEW_DEGREES", 15))
+
+if TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def decode_image(data: bytes):
+    # Decoding straight to grayscale skips a colour conversion later
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+
+def downscale(image: np.ndarray, max_dimension: int = OCR_MAX_DIMENSION):
+    scale = max_dimension / max(image.shape[:2])
+    if scale >= 1:
+        return image
+    size = (int(image.shape[1] * scale), int(image.shape[0] * scale))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def skew_angle(image: np.ndarray):
+    # Angle of the minimum-area rectangle around all ink pixels, in degrees
+    _, ink = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is None or len(points) < 100:
+        return 0.0
+    angle = cv2.minAreaRect(points)[-1]
+    # The rectangle angle range differs across OpenCV versions; text is
+    # never skewed by more than 45 degrees, so fold into [-45, 45)
+    return float((angle + 45) % 90 - 45)
+
+
+def deskew(image: np.ndarray):
+    angle = skew_angle(image)
+    if abs(angle) < 0.5 or abs(angle) > OCR_MAX_SKEW_DEGREES:
+        return image
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def preprocess(image: np.ndarray):
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    image = downscale(image)
+    if OCR_DESKEW:
+        image = deskew(image)
+    return image
+
+
+def ocr_image(image: np.ndarray):
+    return pytesseract.image_to_string(preprocess(image), lang=OCR_LANGUAGE).strip()
+
+
+def ocr_image_bytes(data: bytes):
+    return ocr_image(decode_image(data))
+
+
+def _ocr_file(file_path: str):
+    # Runs in a worker; reading the file there keeps image bytes off the pipe
+    with open(file_path, "rb") as f:
+        return ocr_image_bytes(f.read())
+
+
+def get_ocr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_ocr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def ocr_files(file_paths: List[str], progress=None):
+    # Blocking: call from a job worker. Returns one text per path, in order;
+    # images that cannot be decoded or recognized come back as "".
+    if not file_paths:
+        return []
+
+    pool = get_ocr_pool()
+    futures = {pool.submit(_ocr_file, path): i for i, path in enumerate(file_paths)}
+
+    texts = [""] * len(file_paths)
+    for done, future in enumerate(as_completed(futures), start=1):
+        try:
+            texts[futures[future]] = future.result()
+        except (ValueError, OSError, pytesseract.TesseractError):
+            pass
+        if progress:
+            progress(done / len(file_paths))
+    return texts
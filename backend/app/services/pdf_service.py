@@ -0,0 +1,113 @@
+# backend/app/services/pdf_service.py
+# Page-parallel PDF text extraction. Page ranges are extracted in worker
+# processes and streamed back in page order; pages without a text layer fall
+# back to OCR of their scanned images.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from PyPDF2 import PdfReader
+
+load_dotenv()
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+PDF_OCR_ENABLED = os.getenv("PDF_OCR_ENABLED", "true").lower() == "true"
+# Pages with fewer extracted characters than this are treated as scans
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", 20))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _ocr_page(page):
+    from app.services.ocr_service import ocr_image_bytes
+
+    texts = []
+    for image in page.images:
+        try:
+            text = ocr_image_bytes(image.data)
+        except Exception:
+            continue
+        if text:
+            texts.append(text)
+    return "\n".join(texts)
+
+
+def _extract_pages(file_path: str, start: int, end: int, ocr: bool):
+    reader = PdfReader(file_path)
+    pages = []
+    for number in range(start, end):
+        page = reader.pages[number]
+        text = (page.extract_text() or "").strip()
+        used_ocr = False
+        if ocr and len(text) < PDF_MIN_TEXT_CHARS:
+            ocr_text = _ocr_page(page)
+            if len(ocr_text) > len(text):
+                text, used_ocr = ocr_text, True
+        pages.append({"page": number + 1, "text": text, "ocr": used_ocr})
+    return pages
+
+
+def get_pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def iter_pdf_pages(file_path: str, ocr: bool = PDF_OCR_ENABLED):
+    # Yields (page dict, page count) in page order as soon as each range is
+    # done; later ranges keep extracting while earlier pages are consumed
+    page_count = len(PdfReader(file_path).pages)
+    if page_count == 0:
+        return
+
+    pool = get_pdf_pool()
+    futures = [
+        pool.submit(_extract_pages, file_path, start, min(start + PDF_PAGES_PER_TASK, page_count), ocr)
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    try:
+        for future in futures:
+            for page in future.result():
+                yield page, page_count
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def extract_pdf(file_path: str, progress=None):
+    # Builds the document text in one join and records where each page sits
+    # in it, so generators can chunk by page
+    parts, pages, offset, total = [], [], 0, 0
+    for page, page_count in iter_pdf_pages(file_path):
+        total = page_count
+        if page["text"]:
+            if parts:
+                offset += 2
+            parts.append(page["text"])
+            pages.append({
+                "page": page["page"],
+                "start": offset,
+                "end": offset + len(page["text"]),
+                "ocr": page["ocr"],
+            })
+            offset += len(page["text"])
+        if progress:
+            progress(page["page"] / page_count)
+
+    return {"transcript": "\n\n".join(parts), "pages": pages, "page_count": total}
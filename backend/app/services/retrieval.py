@@ -0,0 +1,221 @@
+# backend/app/services/retrieval.py
+# Per-transcript chunk indexes for retrieval-backed chat. Indexes are built
+# once (at ingestion or on first use), persisted to disk and kept warm in
+# memory, so a chat turn only pays for a vector lookup.
+import asyncio
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import List, Optional
+from dotenv import load_dotenv
+from sklearn.feature_extraction.text import TfidfVectorizer
+from app.services.generate.chunking import chunk_transcript, estimate_tokens, format_location
+from app.services.generate.normalize import normalize_text
+from app.utils.cache import TTLCache
+
+load_dotenv()
+
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "tfidf")
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "data/indexes")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 6))
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", 300))
+RETRIEVAL_CHUNK_SECONDS = float(os.getenv("RETRIEVAL_CHUNK_SECONDS", 90))
+# Below this size the whole transcript is cheaper than a lookup
+RETRIEVAL_MIN_TOKENS = int(os.getenv("RETRIEVAL_MIN_TOKENS", 2000))
+# Index files unused for this long are deleted, which also clears those of
+# deleted contents; 0 keeps them forever. Checked at most once an interval.
+RETRIEVAL_INDEX_MAX_AGE_SECONDS = float(os.getenv("RETRIEVAL_INDEX_MAX_AGE_SECONDS", 7 * 86400))
+RETRIEVAL_INDEX_PRUNE_INTERVAL_SECONDS = float(os.getenv("RETRIEVAL_INDEX_PRUNE_INTERVAL_SECONDS", 3600))
+
+
+class ChunkIndex:
+    # Backends index a list of {"text", "start", "end"} chunks and return
+    # the best matches for a query as (chunk position, score) pairs
+    name = None
+
+    def __init__(self, chunks: List[dict]):
+        self.chunks = chunks
+
+    def search(self, query: str, k: int):
+        raise NotImplementedError
+
+
+class TfidfIndex(ChunkIndex):
+    name = "tfidf"
+
+    def __init__(self, chunks: List[dict]):
+        super().__init__(chunks)
+        self.vectorizer = TfidfVectorizer(stop_words="english", ngram_range=(1, 2), sublinear_tf=True)
+        self.matrix = self.vectorizer.fit_transform([chunk["text"] for chunk in chunks])
+
+    def search(self, query: str, k: int):
+        scores = (self.matrix @ self.vectorizer.transform([query]).T).toarray().ravel()
+        ranked = scores.argsort()[::-1][:k]
+        return [(int(i), float(scores[i])) for i in ranked if scores[i] > 0]
+
+
+INDEX_BACKENDS = {TfidfIndex.name: TfidfIndex}
+
+
+def register_index_backend(backend):
+    INDEX_BACKENDS[backend.name] = backend
+
+
+_index_cache = TTLCache(
+    max_entries=int(os.getenv("RETRIEVAL_INDEX_CACHE_MAX_ENTRIES", 256)),
+    ttl=float(os.getenv("RETRIEVAL_INDEX_CACHE_TTL_SECONDS", 3600)),
+)
+
+
+_prune_lock = threading.Lock()
+_prune_state = {"last": None, "pruned": 0}
+
+
+def _index_key(raw_text: str):
+    # Keyed by transcript, so contents sharing a transcript share an index
+    params = f"{RETRIEVAL_BACKEND}\0{RETRIEVAL_CHUNK_TOKENS}\0{RETRIEVAL_CHUNK_SECONDS}\0"
+    return hashlib.sha256((params + normalize_text(raw_text)).encode("utf-8")).hexdigest()
+
+
+def _index_path(key: str):
+    return os.path.join(RETRIEVAL_INDEX_DIR, f"{key}.pkl")
+
+
+def _load(key: str):
+    path = _index_path(key)
+    try:
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+        # The modification time marks last use, for pruning
+        os.utime(path)
+        return index
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def _save(key: str, index: ChunkIndex):
+    os.makedirs(RETRIEVAL_INDEX_DIR, exist_ok=True)
+    # Write then rename so a concurrent reader never sees a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=RETRIEVAL_INDEX_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _index_path(key))
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def prune_indexes(max_age: float = RETRIEVAL_INDEX_MAX_AGE_SECONDS):
+    # Deletes index files, and temp files of failed writes, not used within
+    # max_age. A pruned index that is needed again is rebuilt. Returns how
+    # many files were deleted.
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = os.scandir(RETRIEVAL_INDEX_DIR)
+    except FileNotFoundError:
+        return 0
+    with entries:
+        for entry in entries:
+            if not entry.name.endswith((".pkl", ".tmp")):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _maybe_prune():
+    if RETRIEVAL_INDEX_MAX_AGE_SECONDS <= 0:
+        return
+    now = time.monotonic()
+    with _prune_lock:
+        last = _prune_state["last"]
+        if last is not None and now - last < RETRIEVAL_INDEX_PRUNE_INTERVAL_SECONDS:
+            return
+        _prune_state["last"] = now
+    removed = prune_indexes()
+    with _prune_lock:
+        _prune_state["pruned"] += removed
+
+
+def get_index(raw_text: str, segments: Optional[List[dict]] = None):
+    # Memory, then disk, then build. Blocking; call from a worker thread.
+    key = _index_key(raw_text)
+    index = _index_cache.get(key)
+    if index is not None:
+        return index
+
+    index = _load(key)
+    if index is None:
+        chunks = chunk_transcript(raw_text, segments, RETRIEVAL_CHUNK_TOKENS, RETRIEVAL_CHUNK_SECONDS)
+        if not chunks:
+            return None
+        index = INDEX_BACKENDS[RETRIEVAL_BACKEND](chunks)
+        _save(key, index)
+        _maybe_prune()
+
+    _index_cache.set(key, index)
+    return index
+
+
+def build_index(raw_text: str, segments: Optional[List[dict]] = None):
+    if estimate_tokens(raw_text) > RETRIEVAL_MIN_TOKENS:
+        get_index(raw_text, segments)
+
+
+def _format_chunk(chunk: dict):
+    location = format_location(chunk)
+    return f"{location} {chunk['text']}" if location else chunk["text"]
+
+
+async def retrieve_context(
+    raw_text: str,
+    segments: Optional[List[dict]],
+    message: str,
+    history: Optional[List[dict]] = None,
+    k: int = RETRIEVAL_TOP_K,
+):
+    # Returns (context text, sources). Short transcripts are sent whole.
+    if estimate_tokens(raw_text) <= RETRIEVAL_MIN_TOKENS:
+        return raw_text, []
+
+    index = await asyncio.to_thread(get_index, raw_text, segments)
+    if index is None:
+        return raw_text, []
+
+    # Include the previous user turn so follow-ups like "why?" still match
+    previous = [m.get("content") or m.get("text") or "" for m in history or [] if m.get("role") == "user"]
+    query = " ".join(previous[-1:] + [message])
+
+    hits = index.search(query, k)
+    if not hits:
+        # Nothing matched lexically; fall back to the start of the content
+        hits = [(i, 0.0) for i in range(min(k, len(index.chunks)))]
+
+    # Present in transcript order, which reads better than score order
+    context = "\n\n".join(_format_chunk(index.chunks[i]) for i, _ in sorted(hits))
+    sources = [
+        {
+            "start": index.chunks[i].get("start"),
+            "end": index.chunks[i].get("end"),
+            "page_start": index.chunks[i].get("page_start"),
+            "page_end": index.chunks[i].get("page_end"),
+            "score": round(score, 4)
+        }
+        for i, score in hits
+    ]
+    return context, sources
+
+
+def index_cache_stats():
+    with _prune_lock:
+        pruned = _prune_state["pruned"]
+    return {**_index_cache.stats(), "files_pruned": pruned}
@@ -0,0 +1,165 @@
+# backend/app/services/search_service.py
+# Ranked full-text search over one user's contents and generations, on the
+# passages app/db/search.py indexes at write time. Each database gets a
+# query of its own; both rank the user's matching passages and cut them
+# short before snippets are built, so the cost follows the page size rather
+# than the number of matches. Hits are grouped by content.
+import os
+import re
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from app.db.search import SEARCH_LANGUAGE
+from app.db.crud import reindex_content
+from app.db.models import Content
+
+load_dotenv()
+
+# Passages shown per content; the best one decides the content's rank
+SEARCH_HITS_PER_CONTENT = int(os.getenv("SEARCH_HITS_PER_CONTENT", 3))
+SEARCH_MAX_TERMS = 12
+
+_TERM = re.compile(r"[^\W_]+")
+
+_SQLITE_SEARCH = """
+WITH top AS (
+    SELECT rowid AS id, bm25(search_fts, 0.0, 0.0, 1.0) AS rank
+    FROM search_fts
+    WHERE search_fts MATCH :match
+    ORDER BY rank
+    LIMIT :limit
+)
+SELECT d.content_id, d.space_id, d.generation_id, d.kind, d.start, d.page, c.title, c.type,
+       -top.rank AS score, snippet(search_fts, 2, '<mark>', '</mark>', '…', 24) AS snippet
+FROM top
+JOIN search_fts ON search_fts.rowid = top.id
+JOIN search_documents d ON d.id = top.id
+JOIN contents c ON c.id = d.content_id
+WHERE search_fts MATCH :match
+ORDER BY top.rank
+"""
+
+_POSTGRES_SEARCH = """
+WITH q AS (
+    SELECT to_tsquery(CAST(:language AS regconfig), :tsquery) AS query
+), top AS (
+    SELECT d.id, ts_rank_cd(d.search_vector, q.query) AS score
+    FROM search_documents d, q
+    WHERE d.user_id = :user_id {space_filter} AND d.search_vector @@ q.query
+    ORDER BY score DESC
+    LIMIT :limit
+)
+SELECT d.content_id, d.space_id, d.generation_id, d.kind, d.start, d.page, c.title, c.type, top.score,
+       ts_headline(CAST(:language AS regconfig), d.text, q.query,
+                   'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8') AS snippet
+FROM top
+JOIN search_documents d ON d.id = top.id
+JOIN contents c ON c.id = d.content_id
+CROSS JOIN q
+ORDER BY top.score DESC
+"""
+
+
+class SearchUnavailableError(Exception):
+    pass
+
+
+def _terms(query: str):
+    return _TERM.findall(query.lower())[:SEARCH_MAX_TERMS]
+
+
+def _phrase(value: str):
+    # An FTS5 string, with double quotes doubled
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _search_sqlite(db: Session, terms: list, user_id: str, space_id: str, limit: int):
+    # Every term must match; the last one also as a prefix, so results
+    # follow the user's typing. The owner is matched inside the index.
+    match = [f"user_id : {_phrase(user_id)}"]
+    if space_id:
+        match.append(f"space_id : {_phrase(space_id)}")
+    match += [f"text : {_phrase(term)}" for term in terms[:-1]] + [f"text : {_phrase(terms[-1])}*"]
+    return db.execute(text(_SQLITE_SEARCH), {"match": " AND ".join(match), "limit": limit}).mappings().all()
+
+
+def _search_postgresql(db: Session, terms: list, user_id: str, space_id: str, limit: int):
+    tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    params = {"language": SEARCH_LANGUAGE, "tsquery": tsquery, "user_id": user_id, "limit": limit}
+    if space_id:
+        params["space_id"] = space_id
+    statement = _POSTGRES_SEARCH.format(space_filter="AND d.space_id = :space_id" if space_id else "")
+    return db.execute(text(statement), params).mappings().all()
+
+
+# Keyed by SQLAlchemy dialect name
+SEARCH_BACKENDS = {
+    "sqlite": _search_sqlite,
+    "postgresql": _search_postgresql,
+}
+
+
+def _group(rows, limit: int):
+    # Rows arrive best first, so each content's first row is its best hit
+    results = {}
+    for row in rows:
+        result = results.get(row["content_id"])
+        if result is None:
+            if len(results) == limit:
+                continue
+            result = results[row["content_id"]] = {
+                "content_id": row["content_id"],
+                "space_id": row["space_id"],
+                "title": row["title"],
+                "type": row["type"],
+                "score": float(row["score"]),
+                "hits": [],
+            }
+        if len(result["hits"]) < SEARCH_HITS_PER_CONTENT:
+            result["hits"].append({
+                "kind": row["kind"],
+                "generation_id": row["generation_id"],
+                "start": row["start"],
+                "page": row["page"],
+                "snippet": row["snippet"],
+            })
+    return list(results.values())
+
+
+def search_contents(db: Session, user_id: str, query: str, limit: int, space_id: str = None):
+    terms = _terms(query)
+    if not terms:
+        return []
+    backend = SEARCH_BACKENDS.get(db.get_bind().dialect.name)
+    if backend is None:
+        raise SearchUnavailableError(f"Search is not available on {db.get_bind().dialect.name}")
+    # Enough passages that a few strong contents do not crowd out the page
+    return _group(backend(db, terms, user_id, space_id, limit * SEARCH_HITS_PER_CONTENT), limit)
+
+
+def reindex_all(db: Session, batch_size: int = 500):
+    # Indexes every content and its generations again; run once for
+    # contents stored before search existed
+    done, after = 0, ""
+    while True:
+        ids = [
+            content_id for content_id, in db.query(Content.id).filter(Content.id > after)
+            .order_by(Content.id).limit(batch_size)
+        ]
+        if not ids:
+            return done
+        for content_id in ids:
+            reindex_content(db, content_id)
+            db.expunge_all()
+        done += len(ids)
+        after = ids[-1]
+
+
+if __name__ == "__main__":
+    from app.db.database import Base, SessionLocal, engine
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        print(f"Reindexed {reindex_all(session)} contents")
+    finally:
+        session.close()
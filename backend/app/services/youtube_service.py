@@ -0,0 +1,114 @@
+# backend/app/services/youtube_service.py
+import os
+import re
+from urllib.parse import urlparse, parse_qs
+import httpx
+from dotenv import load_dotenv
+from youtube_transcript_api import YouTubeTranscriptApi
+
+load_dotenv()
+
+YOUTUBE_TIMEOUT_SECONDS = float(os.getenv("YOUTUBE_TIMEOUT_SECONDS", 15))
+# Stored transcripts older than this are fetched again on the next
+# ingestion; 0 keeps them until removed
+YOUTUBE_TRANSCRIPT_MAX_AGE_SECONDS = float(os.getenv("YOUTUBE_TRANSCRIPT_MAX_AGE_SECONDS", 30 * 86400))
+# Playlists are listed through the YouTube Data API, which needs a key
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+YOUTUBE_API_BASE = os.getenv("YOUTUBE_API_BASE", "https://www.googleapis.com/youtube/v3")
+# Videos per bulk import, and how many of them are fetched at once
+YOUTUBE_BULK_MAX_ITEMS = int(os.getenv("YOUTUBE_BULK_MAX_ITEMS", 200))
+YOUTUBE_BULK_CONCURRENCY = int(os.getenv("YOUTUBE_BULK_CONCURRENCY", 8))
+
+_VIDEO_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_PLAYLIST_ID = re.compile(r"^[A-Za-z0-9_-]{10,64}$")
+
+
+def extract_video_id(url: str):
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    video_id = None
+
+    if host in ("youtu.be", "www.youtu.be"):
+        video_id = parsed.path.lstrip("/").split("/")[0]
+    elif host.endswith("youtube.com"):
+        if parsed.path == "/watch":
+            video_id = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            match = re.match(r"^/(?:embed|shorts|live|v)/([^/?#]+)", parsed.path)
+            if match:
+                video_id = match.group(1)
+    elif _VIDEO_ID.match(url.strip()):
+        video_id = url.strip()
+
+    if not video_id or not _VIDEO_ID.match(video_id):
+        raise ValueError("Invalid YouTube URL")
+    return video_id
+
+
+def extract_playlist_id(url: str):
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    playlist_id = parse_qs(parsed.query).get("list", [None])[0] if host.endswith("youtube.com") else None
+    if not playlist_id or not _PLAYLIST_ID.match(playlist_id):
+        raise ValueError("Invalid YouTube playlist URL")
+    return playlist_id
+
+
+def fetch_playlist_video_ids(playlist_id: str, max_items: int = YOUTUBE_BULK_MAX_ITEMS):
+    # Video ids in playlist order, at most max_items
+    if not YOUTUBE_API_KEY:
+        raise ValueError("Importing playlists needs YOUTUBE_API_KEY to be set")
+
+    video_ids, page_token = [], None
+    with httpx.Client(timeout=YOUTUBE_TIMEOUT_SECONDS) as client:
+        while len(video_ids) < max_items:
+            params = {"part": "contentDetails", "playlistId": playlist_id, "maxResults": 50, "key": YOUTUBE_API_KEY}
+            if page_token:
+                params["pageToken"] = page_token
+            response = client.get(f"{YOUTUBE_API_BASE}/playlistItems", params=params)
+            response.raise_for_status()
+            body = response.json()
+            video_ids += [item["contentDetails"]["videoId"] for item in body.get("items", [])]
+            page_token = body.get("nextPageToken")
+            if not page_token:
+                break
+    return video_ids[:max_items]
+
+
+def fetch_video_metadata(video_id: str):
+    response = httpx.get(
+        "https://www.youtube.com/oembed",
+        params={"url": f"https://www.youtube.com/watch?v={video_id}", "format": "json"},
+        timeout=YOUTUBE_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    info = response.json()
+    return {
+        "title": info.get("title") or video_id,
+        "author": info.get("author_name"),
+        "thumbnail": info.get("thumbnail_url"),
+    }
+
+
+def fetch_transcript(video_id: str):
+    segments = YouTubeTranscriptApi.get_transcript(video_id)
+    return [
+        {"text": item["text"], "start": item["start"], "duration": item.get("duration", 0)}
+        for item in segments
+    ]
+
+
+def extract_youtube_info(url: str):
+    video_id = extract_video_id(url)
+    metadata = fetch_video_metadata(video_id)
+    segments = fetch_transcript(video_id)
+
+    return {
+        "video_id": video_id,
+        "url": f"https://www.youtube.com/watch?v={video_id}",
+        "title": metadata["title"],
+        "author": metadata["author"],
+        "thumbnail": metadata["thumbnail"],
+        "transcript": " ".join(segment["text"] for segment in segments),
+        "segments": segments,
+    }
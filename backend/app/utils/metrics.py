@@ -0,0 +1,243 @@
+# backend/app/utils/metrics.py
+# In-process metrics rendered in the Prometheus text format, per-request DB
+# accounting and optional OpenTelemetry spans. Metrics are thread safe so job
+# threads and the event loop can share them; each process keeps its own, so
+# scrape every worker.
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Spans go to whatever tracer provider is configured, e.g. by running under
+# opentelemetry-instrument; needs the opentelemetry-api package
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, [("le", _format_value(bound))]), count))
+                samples.append((f"{self.name}_sum", _format_labels(self.labels, key), total))
+                samples.append((f"{self.name}_count", _format_labels(self.labels, key), counts[-1]))
+        return samples
+
+
+def register_collector(fn):
+    # fn() returns (name, help, labels dict, value) tuples that are read at
+    # scrape time and rendered as gauges, for state kept elsewhere such as
+    # pool and cache stats
+    _collectors.append(fn)
+    return fn
+
+
+def stats_gauges(prefix: str, stats: dict, help: str, **labels):
+    # Turns a stats() dict into collector tuples, skipping non-numeric values
+    return [
+        (f"{prefix}_{key}", help, labels, float(value))
+        for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+
+    gauges = {}
+    for collector in _collectors:
+        try:
+            rows = collector()
+        except Exception:
+            # One broken collector must not take the whole scrape down
+            continue
+        for name, help, labels, value in rows:
+            gauges.setdefault(name, (help, []))[1].append((labels, value))
+    for name, (help, rows) in gauges.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in rows:
+            lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def span(name: str, **attributes):
+    # Trace span when tracing is enabled, otherwise does nothing. Yields the
+    # span or None.
+    if not TRACING_ENABLED or trace is None:
+        yield None
+        return
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    with trace.get_tracer("learn-buddy").start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+class RequestStats:
+    __slots__ = ("db_queries", "db_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+# Set by MetricsMiddleware for the duration of a request. run_db copies the
+# context to the thread or greenlet doing the query, so queries made on the
+# request's behalf are counted; job threads have none.
+_request_stats = ContextVar("request_stats", default=None)
+
+db_query_seconds = Histogram(
+    "db_query_seconds", "Database query duration by statement type", ("operation",)
+)
+
+
+def record_query(statement: str, seconds: float):
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    db_query_seconds.observe(seconds, operation=operation)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += seconds
+
+
+http_request_seconds = Histogram(
+    "http_request_seconds", "Request latency by route, until the response body is sent",
+    ("method", "route", "status")
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "Database queries per request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent in database queries per request", ("method", "route")
+)
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware so streamed responses are
+    # timed to their last byte. Adds a Server-Timing header with the DB time
+    # spent before the response started.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                timing = f'db;dur={1000 * stats.db_seconds:.1f};desc="{stats.db_queries} queries"'
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            with span(f"{scope['method']} {scope['path']}") as current:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            # Label by route template, not path, to keep label values bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_seconds.observe(time.perf_counter() - start, method=method, route=route, status=status["code"])
+            http_request_db_queries.observe(stats.db_queries, method=method, route=route)
+            http_request_db_seconds.observe(stats.db_seconds, method=method, route=route)
+            if current is not None:
+                current.update_name(f"{method} {route}")
+                current.set_attribute("http.status_code", status["code"])
+                current.set_attribute("db.queries", stats.db_queries)
+            _request_stats.reset(token)
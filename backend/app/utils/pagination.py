@@ -0,0 +1,18 @@
+# backend/app/utils/pagination.py
+# Opaque keyset cursors over (created_at, id)
+import base64
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, id: str):
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), id
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
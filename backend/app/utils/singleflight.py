@@ -0,0 +1,61 @@
+# backend/app/utils/singleflight.py
+import asyncio
+
+
+class SingleFlight:
+    # Coalesces concurrent calls with the same key: the first caller runs the
+    # function, everyone arriving while it runs awaits the same result.
+    def __init__(self):
+        self._flights = {}
+
+    async def do(self, key, fn):
+        future = self._flights.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        return await self._lead(key, self._register(key), fn)
+
+    def start(self, key, fn):
+        # do() as a task, with the flight joined or registered right away.
+        # Returns (task, whether this call leads the flight and runs fn).
+        future = self._flights.get(key)
+        if future is not None:
+            return asyncio.ensure_future(asyncio.shield(future)), False
+        future = self._register(key)
+        task = asyncio.ensure_future(self._lead(key, future, fn))
+        # A task cancelled before its first step never runs _lead's cleanup
+        task.add_done_callback(lambda _: self._abandon(key, future))
+        return task, True
+
+    def _register(self, key):
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        return future
+
+    def _abandon(self, key, future):
+        if not future.done():
+            future.cancel()
+        if self._flights.get(key) is future:
+            del self._flights[key]
+
+    async def _lead(self, key, future, fn):
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a flight without followers doesn't warn
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._flights.pop(key, None)
+
+    def is_running(self, key):
+        return key in self._flights
+
+    def in_flight(self):
+        return len(self._flights)
@@ -0,0 +1,131 @@
+# backend/benchmarks/fakes.py
+# Deterministic stand-ins for the services the app depends on: a
+# Gemini-compatible HTTP server, and stubs for YouTube transcript fetching and
+# Whisper transcription. Each waits a configurable latency so a benchmark
+# measures the app rather than Google or the CPU cost of a model.
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = (
+    "energy cell membrane protein signal enzyme gradient transport molecule "
+    "structure function model theory evidence experiment result variable "
+    "equation force velocity system network layer process cycle"
+).split()
+
+
+def _text(seed: str, words: int):
+    rng = random.Random(hashlib.sha256(seed.encode("utf-8")).hexdigest())
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _reply(prompt: str):
+    # Answers in the shape each generator parses, keyed off its prompt
+    if "study flashcards" in prompt:
+        return json.dumps([{"front": _text(prompt + str(i), 4), "back": _text(prompt + str(i) + "b", 12)} for i in range(12)])
+    if "multiple-choice" in prompt:
+        return "```json\n" + json.dumps([
+            {"question": _text(prompt + str(i), 8), "options": [_text(prompt + str(i) + o, 3) for o in "abcd"], "answer": i % 4}
+            for i in range(7)
+        ]) + "\n```"
+    if "mind map" in prompt:
+        children = [{"label": _text(prompt + str(i), 2), "children": [{"label": _text(prompt + str(i) + "c", 2), "children": []}]} for i in range(4)]
+        return json.dumps({"label": _text(prompt, 3), "children": children})
+    return _text(prompt, 150)
+
+
+def gemini_app(latency: float = 0.5, stream_chunk_delay: float = 0.01):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/v1beta/models/{model_method}")
+    async def generate(model_method: str, request: Request):
+        app.state.calls += 1
+        body = await request.json()
+        prompt = body["contents"][-1]["parts"][0]["text"]
+        text = _reply(prompt)
+        await asyncio.sleep(latency)
+
+        if model_method.endswith(":streamGenerateContent"):
+            async def events():
+                for i in range(0, len(text), 40):
+                    chunk = {"candidates": [{"content": {"parts": [{"text": text[i:i + 40]}]}}]}
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+                    await asyncio.sleep(stream_chunk_delay)
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4},
+        }
+
+    return app
+
+
+def fake_transcript(video_id: str, segments: int = 240):
+    # About 20 minutes of speech in 5 second segments
+    return [
+        {"text": _text(f"{video_id}-{i}", 12), "start": 5.0 * i, "duration": 5.0}
+        for i in range(segments)
+    ]
+
+
+def install_stubs(youtube_latency: float = 0.3, asr_latency: float = 2.0):
+    # Patches the app's YouTube and Whisper entry points in this process.
+    # The ingestion jobs call them on worker threads, so the stubs block.
+    from app.services import content_service, youtube_service
+
+    def fetch_video_metadata(video_id: str):
+        time.sleep(youtube_latency / 2)
+        return {"title": f"Lecture {video_id}", "author": "Benchmark", "thumbnail": None}
+
+    def fetch_transcript(video_id: str):
+        time.sleep(youtube_latency / 2)
+        return fake_transcript(video_id)
+
+    def transcribe_file(file_path: str, language: str = None, progress=None):
+        steps = 4
+        for step in range(1, steps + 1):
+            time.sleep(asr_latency / steps)
+            if progress:
+                progress(step / steps)
+        segments = fake_transcript(file_path, segments=120)
+        return {
+            "transcript": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": language or "en",
+            "duration": 600.0,
+        }
+
+    youtube_service.fetch_video_metadata = fetch_video_metadata
+    youtube_service.fetch_transcript = fetch_transcript
+    content_service.transcribe_file = transcribe_file
+
+
+class ServerThread:
+    # Runs an ASGI app on a real localhost socket in a background thread
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self, timeout: float = 30):
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Server did not start")
+            time.sleep(0.02)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self, timeout: float = 30):
+        self.server.should_exit = True
+        self.thread.join(timeout)
@@ -0,0 +1,174 @@
+# backend/benchmarks/run.py
+# Offline load test. Starts app.main:app on a local port against a throwaway
+# database (or --database-url), with Gemini replaced by a fake server and
+# YouTube and Whisper by stubs, runs the scripted workloads and reports
+# p50/p95/p99 latency and requests per second per route.
+#
+#   python -m benchmarks.run                               # all workloads
+#   python -m benchmarks.run --workloads auth,spaces --scale 2
+#   python -m benchmarks.run --save-baseline               # record benchmarks/baseline.json
+#   python -m benchmarks.run --baseline benchmarks/baseline.json   # exit 1 on regression
+#
+# A baseline is only comparable with runs on the same machine and settings.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import uuid
+import httpx
+from benchmarks.fakes import ServerThread, gemini_app, install_stubs
+from benchmarks.stats import Recorder, format_table
+from benchmarks.workloads import WORKLOADS, Context
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Settings that change what is measured; a baseline recorded with other
+# values is not compared against
+COMPARED_SETTINGS = ("workloads", "scale", "concurrency", "llm_latency", "youtube_latency", "asr_latency", "database")
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline API benchmark")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help=f"comma separated, from {', '.join(WORKLOADS)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier on each workload's request counts")
+    parser.add_argument("--concurrency", type=int, default=20, help="max requests in flight")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--youtube-latency", type=float, default=0.3, help="seconds per fake YouTube fetch")
+    parser.add_argument("--asr-latency", type=float, default=2.0, help="seconds per fake Whisper transcription")
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL; default is a temporary SQLite file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on regression")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help=f"write the results as the new baseline (default {DEFAULT_BASELINE})")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before a route counts as regressed")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="absolute latency slack, so tiny latencies do not flap")
+    args = parser.parse_args(argv)
+
+    args.workloads = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = [name for name in args.workloads if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)}")
+    return args
+
+
+def _start(args):
+    # The fake Gemini server has to be up before the app is imported, since
+    # the LLM settings are read at import time
+    gemini = ServerThread(gemini_app(latency=args.llm_latency))
+    os.environ["LLM_API_BASE"] = gemini.start() + "/v1beta"
+    os.environ["GOOGLE_API_KEY"] = "benchmark"
+    # Everything the run writes stays in a temporary directory, retrieval
+    # indexes included, never in the app's data directory
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/benchmark.sqlite"
+    os.environ["RETRIEVAL_INDEX_DIR"] = os.path.join(workdir, "indexes")
+    os.environ.setdefault("JWT_SECRET", uuid.uuid4().hex)
+    # Workloads drive a handful of users hard; per-user limits would
+    # measure the limiter rather than the API
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+    from app.db.database import Base, engine
+    from app.db import models  # noqa: F401
+    from app.main import app
+
+    Base.metadata.create_all(engine)
+    install_stubs(youtube_latency=args.youtube_latency, asr_latency=args.asr_latency)
+
+    server = ServerThread(app)
+    return gemini, server, server.start()
+
+
+async def _run_workloads(args, base_url: str):
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        for name in args.workloads:
+            recorder = Recorder()
+            print(f"running {name}...", file=sys.stderr)
+            await WORKLOADS[name](Context(client, recorder, args.concurrency, args.scale, args.seed))
+            results[name] = recorder.summary()
+    return results
+
+
+def _settings(args):
+    from app.db.database import engine
+
+    return {
+        "workloads": args.workloads,
+        "scale": args.scale,
+        "concurrency": args.concurrency,
+        "llm_latency": args.llm_latency,
+        "youtube_latency": args.youtube_latency,
+        "asr_latency": args.asr_latency,
+        "database": engine.dialect.name,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack_ms: float):
+    # Returns one message per regressed metric
+    regressions = []
+    for workload, routes in baseline["results"].items():
+        for route, base in routes.items():
+            current = results.get(workload, {}).get(route)
+            name = f"{workload}: {route}"
+            if current is None:
+                regressions.append(f"{name} was not measured")
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                limit = base[metric] * (1 + tolerance) + slack_ms
+                if current[metric] > limit:
+                    regressions.append(f"{name} {metric} {current[metric]:.1f} > {limit:.1f} (baseline {base[metric]:.1f})")
+            limit = base["rps"] * (1 - tolerance)
+            if current["rps"] < limit:
+                regressions.append(f"{name} rps {current['rps']:.1f} < {limit:.1f} (baseline {base['rps']:.1f})")
+            if current["errors"] > base["errors"]:
+                regressions.append(f"{name} errors {current['errors']} > {base['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    gemini, server, base_url = _start(args)
+    try:
+        results = asyncio.run(_run_workloads(args, base_url))
+    finally:
+        server.stop()
+        gemini.stop()
+
+    report = {"settings": _settings(args), "results": results}
+    for workload, routes in results.items():
+        print(f"\n[{workload}]")
+        print(format_table(routes))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nbaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatched = [
+            key for key in COMPARED_SETTINGS
+            if baseline["settings"].get(key) != report["settings"].get(key)
+        ]
+        if mismatched:
+            print(f"\nbaseline was recorded with different settings ({', '.join(mismatched)}); not comparing")
+            return 2
+        regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\nno regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
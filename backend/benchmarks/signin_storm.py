@@ -0,0 +1,111 @@
+# backend/benchmarks/signin_storm.py
+# Sign-in storm: many concurrent sign-ins while a probe keeps calling a cheap
+# endpoint. If bcrypt runs on the event loop the probe stalls for the whole
+# storm; with the password hasher pool its latency should stay flat.
+#
+#   python -m benchmarks.signin_storm                       # in-process, temp SQLite
+#   python -m benchmarks.signin_storm --url http://localhost:8000
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+import httpx
+from benchmarks.stats import percentile
+
+
+def _summary(name, latencies):
+    ms = [1000 * value for value in latencies]
+    return (
+        f"{name:<18} n={len(ms):<5} p50={percentile(ms, 50):8.1f}ms "
+        f"p95={percentile(ms, 95):8.1f}ms max={max(ms or [0]):8.1f}ms"
+    )
+
+
+async def _probe(client, path, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+async def run(client, signins: int, concurrency: int, probe_path: str):
+    email = f"storm-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/api/users/signup", json={"name": "storm", "email": email, "password": "storm-password"})
+    response.raise_for_status()
+
+    # Probe latency with nothing else going on
+    baseline = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(client, probe_path, stop, baseline))
+    await asyncio.sleep(1)
+    stop.set()
+    await probe
+
+    # Probe latency during the storm
+    during, signin_latencies, statuses = [], [], {}
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(client, probe_path, stop, during))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def signin():
+        async with semaphore:
+            start = time.perf_counter()
+            r = await client.post("/api/users/signin", json={"email": email, "password": "storm-password"})
+            signin_latencies.append(time.perf_counter() - start)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[signin() for _ in range(signins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    print(_summary("probe (idle)", baseline))
+    print(_summary("probe (storm)", during))
+    print(_summary("signin", signin_latencies))
+    print(f"signins: {signins} in {elapsed:.2f}s ({signins / elapsed:.1f}/s), status codes {statuses}")
+    if baseline and during:
+        print(f"probe p95 slowdown during storm: x{percentile(during, 95) / max(percentile(baseline, 95), 1e-6):.1f}")
+    return {"baseline": baseline, "during": during, "signin": signin_latencies, "statuses": statuses}
+
+
+def _in_process_client():
+    # Point the app at a throwaway database before it is imported
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/storm.sqlite")
+    os.environ.setdefault("JWT_SECRET", uuid.uuid4().hex)
+    from app.db.database import Base, engine
+    from app.db import models  # noqa: F401
+    from app.main import app
+
+    Base.metadata.create_all(engine)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=120)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="running server; default runs the app in-process")
+    parser.add_argument("--signins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--probe", default="/", help="cheap endpoint to watch during the storm")
+    args = parser.parse_args()
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        client = _in_process_client()
+    async with client:
+        await run(client, args.signins, args.concurrency, args.probe)
+
+    if not args.url:
+        from app.auth.security import password_hasher
+        from app.db.database import dispose_engines, pool_stats
+        print("password hasher:", password_hasher.stats())
+        print("db pool:", pool_stats())
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
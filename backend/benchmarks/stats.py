@@ -0,0 +1,67 @@
+# backend/benchmarks/stats.py
+# Latency bookkeeping shared by the benchmarks
+import time
+from collections import defaultdict
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Recorder:
+    # Collects (start, duration, ok) per route name, e.g. "GET /api/spaces"
+    def __init__(self):
+        self._samples = defaultdict(list)
+
+    def add(self, route: str, start: float, duration: float, ok: bool):
+        self._samples[route].append((start, duration, ok))
+
+    def timed(self, route: str):
+        return _Timer(self, route)
+
+    def summary(self):
+        results = {}
+        for route, samples in sorted(self._samples.items()):
+            ms = [1000 * duration for _, duration, _ in samples]
+            # Throughput over the span in which the route was being called
+            span = max(start + duration for start, duration, _ in samples) - min(start for start, _, _ in samples)
+            results[route] = {
+                "count": len(samples),
+                "errors": sum(1 for _, _, ok in samples if not ok),
+                "rps": round(len(samples) / span, 2) if span > 0 else 0.0,
+                "p50_ms": round(percentile(ms, 50), 2),
+                "p95_ms": round(percentile(ms, 95), 2),
+                "p99_ms": round(percentile(ms, 99), 2),
+                "max_ms": round(max(ms), 2),
+            }
+        return results
+
+
+class _Timer:
+    # Context manager for timing work that is not a single HTTP call, such
+    # as an ingestion job from submit to completion; set .ok = False on failure
+    def __init__(self, recorder: Recorder, route: str):
+        self.recorder = recorder
+        self.route = route
+        self.ok = True
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.add(self.route, self.start, time.perf_counter() - self.start, self.ok and exc_type is None)
+        return False
+
+
+def format_table(results: dict):
+    lines = [f"{'route':<44} {'n':>6} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for route, row in results.items():
+        lines.append(
+            f"{route:<44} {row['count']:>6} {row['errors']:>5} {row['rps']:>8.1f} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,262 @@
+# backend/benchmarks/workloads.py
+# Scripted workloads for benchmarks.run. Each is an async function taking a
+# Context and driving the API through it; request counts are multiplied by
+# --scale and in-flight requests are capped by --concurrency.
+import asyncio
+import random
+import time
+import uuid
+import httpx
+from benchmarks.stats import Recorder
+
+PASSWORD = "benchmark-password"
+JOB_POLL_SECONDS = 0.05
+JOB_TIMEOUT_SECONDS = 300
+
+
+class Context:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, concurrency: int, scale: float, seed: int = 0):
+        self.client = client
+        self.recorder = recorder
+        self.scale = scale
+        self.random = random.Random(seed)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def count(self, n: int):
+        return max(1, int(round(n * self.scale)))
+
+    async def call(self, route: str, method: str, url: str, record: bool = True, **kwargs):
+        # route names the endpoint with its path template so calls with
+        # different ids are reported together
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                if record:
+                    self.recorder.add(route, start, time.perf_counter() - start, False)
+                raise
+            if record:
+                self.recorder.add(route, start, time.perf_counter() - start, response.is_success)
+        return response
+
+    async def new_user(self, record: bool = True):
+        # Signs up a fresh user and returns their auth headers
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        response = await self.call(
+            "POST /api/users/signup", "POST", "/api/users/signup", record=record,
+            json={"name": "bench", "email": email, "password": PASSWORD}
+        )
+        response.raise_for_status()
+        return email, {"Authorization": f"Bearer {response.json()['token']}"}
+
+    async def new_space(self, headers: dict, record: bool = True):
+        response = await self.call(
+            "POST /api/spaces", "POST", "/api/spaces", record=record,
+            headers=headers, json={"name": f"space-{uuid.uuid4().hex[:8]}", "description": "benchmark"}
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def wait_for_job(self, job_id: str, headers: dict, record: bool = True):
+        deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            response = await self.call(
+                "GET /api/contents/jobs/{id}", "GET", f"/api/contents/jobs/{job_id}", record=record, headers=headers
+            )
+            job = response.json()
+            if job["status"] in ("completed", "failed"):
+                return job
+            await asyncio.sleep(JOB_POLL_SECONDS)
+        raise TimeoutError(f"Job {job_id} did not finish in {JOB_TIMEOUT_SECONDS}s")
+
+
+class _nothing:
+    # Stands in for Recorder.timed when a step is setup, not measurement
+    ok = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _video_id():
+    return uuid.uuid4().hex[:11]
+
+
+async def _ingest_youtube(ctx: Context, headers: dict, space_id: str, record: bool = True):
+    with ctx.recorder.timed("job youtube (submit to done)") if record else _nothing() as timer:
+        response = await ctx.call(
+            "POST /api/contents/youtube", "POST", "/api/contents/youtube", record=record,
+            headers=headers, json={"url": f"https://www.youtube.com/watch?v={_video_id()}", "space_id": space_id}
+        )
+        response.raise_for_status()
+        job = await ctx.wait_for_job(response.json()["id"], headers, record=record)
+        timer.ok = job["status"] == "completed"
+    return (job.get("result") or {}).get("content_id")
+
+
+async def _ingest_media(ctx: Context, headers: dict, space_id: str):
+    with ctx.recorder.timed("job media (submit to done)") as timer:
+        response = await ctx.call(
+            "POST /api/contents/media", "POST", "/api/contents/media",
+            headers=headers, data={"space_id": space_id},
+            files={"file": ("lecture.wav", b"RIFF" + bytes(64 * 1024), "audio/wav")}
+        )
+        response.raise_for_status()
+        job = await ctx.wait_for_job(response.json()["id"], headers)
+        timer.ok = job["status"] == "completed"
+    return (job.get("result") or {}).get("content_id")
+
+
+async def auth(ctx: Context):
+    # Signup burst, then a signin burst over those accounts, then token checks
+    users = await asyncio.gather(*[ctx.new_user() for _ in range(ctx.count(20))])
+
+    async def signin(email):
+        await ctx.call(
+            "POST /api/users/signin", "POST", "/api/users/signin",
+            json={"email": email, "password": PASSWORD}
+        )
+
+    await asyncio.gather(*[signin(ctx.random.choice(users)[0]) for _ in range(ctx.count(60))])
+    await asyncio.gather(*[
+        ctx.call("GET /api/users/validate", "GET", "/api/users/validate", headers=ctx.random.choice(users)[1])
+        for _ in range(ctx.count(200))
+    ])
+
+
+async def spaces(ctx: Context):
+    # One user with many spaces paging through them, plus single-space reads
+    _, headers = await ctx.new_user(record=False)
+    space_ids = await asyncio.gather(*[ctx.new_space(headers) for _ in range(ctx.count(60))])
+
+    async def list_all():
+        cursor = None
+        while True:
+            params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+            response = await ctx.call("GET /api/spaces", "GET", "/api/spaces", headers=headers, params=params)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+    await asyncio.gather(*[list_all() for _ in range(ctx.count(30))])
+    await asyncio.gather(*[
+        ctx.call("GET /api/spaces/{id}", "GET", f"/api/spaces/{ctx.random.choice(space_ids)}", headers=headers)
+        for _ in range(ctx.count(100))
+    ])
+    await asyncio.gather(*[
+        ctx.call("GET /api/spaces/{id}/contents", "GET", f"/api/spaces/{ctx.random.choice(space_ids)}/contents", headers=headers)
+        for _ in range(ctx.count(100))
+    ])
+
+
+async def ingest(ctx: Context):
+    # YouTube and media ingestion end to end, including job polling
+    _, headers = await ctx.new_user(record=False)
+    space_id = await ctx.new_space(headers, record=False)
+    await asyncio.gather(
+        *[_ingest_youtube(ctx, headers, space_id) for _ in range(ctx.count(12))],
+        *[_ingest_media(ctx, headers, space_id) for _ in range(ctx.count(3))],
+    )
+
+
+# Share of each generation route in the generate workload
+GENERATE_MIX = {"summary": 0.25, "flashcard": 0.15, "mindmap": 0.1, "quiz": 0.15, "chat": 0.35}
+
+CHAT_MESSAGES = (
+    "What is the main idea?",
+    "Can you explain the part about the gradient?",
+    "Give me an example of this.",
+    "How does this relate to the model from earlier?",
+)
+
+
+async def generate(ctx: Context):
+    # A mix of generation and chat requests over a few contents; repeats of
+    # the same generation are served from storage, as they are in production
+    _, headers = await ctx.new_user(record=False)
+    space_id = await ctx.new_space(headers, record=False)
+    content_ids = [
+        content_id
+        for content_id in await asyncio.gather(*[_ingest_youtube(ctx, headers, space_id, record=False) for _ in range(ctx.count(4))])
+        if content_id
+    ]
+    if not content_ids:
+        raise RuntimeError("Ingestion failed, nothing to generate from")
+
+    sessions = {}
+
+    async def one(kind: str, content_id: str):
+        if kind != "chat":
+            await ctx.call(f"POST /api/generate/{kind}", "POST", f"/api/generate/{kind}", headers=headers, json={"content_id": content_id})
+            return
+        body = {"content_id": content_id, "message": ctx.random.choice(CHAT_MESSAGES)}
+        if content_id in sessions:
+            body["session_id"] = sessions[content_id]
+        response = await ctx.call("POST /api/generate/chat", "POST", "/api/generate/chat", headers=headers, json=body)
+        if response.is_success:
+            sessions.setdefault(content_id, response.json()["data"]["session_id"])
+
+    # Exact shares rather than random draws, so every route is measured
+    total = ctx.count(80)
+    kinds = [kind for kind, share in GENERATE_MIX.items() for _ in range(max(1, round(share * total)))]
+    ctx.random.shuffle(kinds)
+    await asyncio.gather(*[one(kind, ctx.random.choice(content_ids)) for kind in kinds])
+
+
+ARTIFACT_TYPES = ("summary", "flashcard", "mindmap", "quiz")
+
+
+async def artifacts(ctx: Context):
+    # Batch artifact requests racing single-type requests for the same fresh
+    # contents. Every response for a content and type must carry the same
+    # generation id: a second id means the batch and the single-type path
+    # both called the LLM and stored their own row.
+    _, headers = await ctx.new_user(record=False)
+    space_id = await ctx.new_space(headers, record=False)
+    content_ids = [
+        content_id
+        for content_id in await asyncio.gather(*[_ingest_youtube(ctx, headers, space_id, record=False) for _ in range(ctx.count(3))])
+        if content_id
+    ]
+    if not content_ids:
+        raise RuntimeError("Ingestion failed, nothing to generate from")
+
+    seen = {}
+
+    async def batch(content_id: str):
+        response = await ctx.call(
+            "POST /api/generate/artifacts", "POST", "/api/generate/artifacts",
+            headers=headers, json={"content_id": content_id}
+        )
+        if response.is_success:
+            for kind, generation in response.json()["artifacts"].items():
+                seen.setdefault((content_id, kind), set()).add(generation["id"])
+
+    async def single(kind: str, content_id: str):
+        response = await ctx.call(f"POST /api/generate/{kind}", "POST", f"/api/generate/{kind}", headers=headers, json={"content_id": content_id})
+        if response.is_success:
+            seen.setdefault((content_id, kind), set()).add(response.json()["id"])
+
+    calls = []
+    for content_id in content_ids:
+        calls += [batch(content_id) for _ in range(ctx.count(3))]
+        calls += [single(kind, content_id) for kind in ARTIFACT_TYPES for _ in range(ctx.count(2))]
+    ctx.random.shuffle(calls)
+    await asyncio.gather(*calls)
+
+    duplicated = {key: ids for key, ids in seen.items() if len(ids) > 1}
+    if duplicated:
+        raise AssertionError(
+            "More than one generation stored for "
+            + ", ".join(f"{kind} of {content_id} ({len(ids)})" for (content_id, kind), ids in sorted(duplicated.items()))
+        )
+    missing = [f"{kind} of {content_id}" for content_id in content_ids for kind in ARTIFACT_TYPES if (content_id, kind) not in seen]
+    if missing:
+        raise AssertionError("No generation returned for " + ", ".join(missing))
+
+
+WORKLOADS = {"auth": auth, "spaces": spaces, "ingest": ingest, "generate": generate, "artifacts": artifacts}
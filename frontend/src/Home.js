@@ -2,6 +2,22 @@ import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { FaYoutube, FaFileUpload } from 'react-icons/fa';
 import './App.css';
+
+const API_URL = 'http://127.0.0.1:5000';
+const JOB_POLL_INTERVAL_MS = 1000;
+
+async function waitForJob(job) {
+  while (job.status === 'queued' || job.status === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const response = await fetch(`${API_URL}/jobs/${job.id}`);
+    if (!response.ok) {
+      return { status: 'failed', error: response.statusText };
+    }
+    job = await response.json();
+  }
+  return job;
+}
+
 function Home() {
   const [isLoading, setIsLoading] = useState(false);
   const navigate = useNavigate();
@@ -27,14 +43,19 @@ function Home() {
     formData.append('content_type', file ? file.type.split('/')[0] : 'video');
   
     try {
-      const response = await fetch('http://127.0.0.1:5000/process-content', {
+      const response = await fetch(`${API_URL}/process-content`, {
         method: 'POST',
         body: formData,
       });
   
       if (response.ok) {
-        const data = await response.json();
-        navigate('/summary', { state: { summary: data.summary, questions: data.questions } });
+        // Processing runs as a background job; poll it until it finishes
+        const job = await waitForJob(await response.json());
+        if (job.status === 'completed') {
+          navigate('/summary', { state: { summary: job.result.summary, questions: job.result.questions } });
+        } else {
+          console.error('Error processing content:', job.error);
+        }
       } else {
         console.error('Error processing content:', response.statusText);
       }